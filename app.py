@@ -1,216 +1,101 @@
 import streamlit as st
-import qrcode
-from PIL import Image
 import io
-import re
-from datetime import datetime
-import qrcode.image.svg
-from io import BytesIO
-import pyperclip
-
-# Constants
-ERROR_CORRECT_LEVELS = {
-    "Low": qrcode.constants.ERROR_CORRECT_L,
-    "Medium": qrcode.constants.ERROR_CORRECT_M,
-    "High": qrcode.constants.ERROR_CORRECT_Q,
-    "Highest": qrcode.constants.ERROR_CORRECT_H
-}
+import json
+import os
+import sys
+import tempfile
+import time
 
-# Function to validate inputs
-def validate_inputs(category, inputs):
-    if category == "WiFi Password":
-        if not inputs.get("wifi_ssid"):
-            return "WiFi SSID is required!"
-        if not inputs.get("wifi_password"):
-            return "WiFi Password is required!"
-    elif category == "Link":
-        url = inputs.get("link", "")
-        if not url:
-            return "URL is required!"
-        if not re.match(r'^https?://', url):
-            return "URL should start with http:// or https://"
-    elif category == "WhatsApp":
-        phone = inputs.get("whatsapp_number", "")
-        if not phone:
-            return "Phone number is required!"
-        if not re.match(r'^\+?[\d\s-]+$', phone):
-            return "Invalid phone number format"
-    elif category == "Email":
-        email = inputs.get("email", "")
-        if not email:
-            return "Email address is required!"
-        if not re.match(r'^[^@]+@[^@]+\.[^@]+$', email):
-            return "Invalid email format"
-    elif category == "Event":
-        if not inputs.get("event_title"):
-            return "Event title is required!"
-        try:
-            datetime.strptime(inputs.get("event_start", ""), "%Y-%m-%dT%H:%M")
-        except ValueError:
-            return "Invalid start date/time format (use YYYY-MM-DDTHH:MM)"
-    return None
+from qrgen.batch import count_rows, read_rows, run_batch, run_sheet
+from qrgen.cache import DEFAULT_MAX_BYTES, LayeredCache, RenderCache
+from qrgen.categories import get_category
+from qrgen.executor import DEFAULT_TIMEOUT, RenderExecutor, RenderTimeout, ServerBusy
+from qrgen.history import DEFAULT_MAX_AGE, DEFAULT_MAX_ENTRIES, HistoryStore, PersistentHistory
+from qrgen.metrics import METRICS, OUTPUT_BYTES, STAGE_SECONDS, profile
+from qrgen.preview import DraftPreview
+from qrgen.segmentation import plan_segments
+from qrgen.render import render
+from qrgen.sheet import LAYOUTS as SHEET_LAYOUTS
+from qrgen.structured import render_structured, tile, write_structured
+from qrgen.core import (
+    CATEGORIES,
+    CapacityError,
+    ERROR_CORRECT_LEVELS,
+    MAX_BORDER,
+    MAX_BOX_SIZE,
+    PNG_COMPRESSION_LEVELS,
+    format_qr_data,
+    generate_qr,
+    validate_inputs,
+)
 
-# Function to format data based on category
-def format_qr_data(category, inputs):
-    if category == "Number":
-        value = inputs.get("number", "").strip()
-        if value:
-            return f"number:{value}"
-        return ""
-    elif category == "WiFi Password":
-        ssid = inputs.get("wifi_ssid", "").strip()
-        password = inputs.get("wifi_password", "").strip()
-        encryption = inputs.get("wifi_encryption", "WPA")
-        if ssid and password:
-            return f"WIFI:S:{ssid};T:{encryption};P:{password};;"
-        return ""
-    elif category == "Link":
-        url = inputs.get("link", "").strip()
-        if url:
-            return url
-        return ""
-    elif category == "WhatsApp":
-        phone = inputs.get("whatsapp_number", "").replace(" ", "").replace("-", "")
-        if phone:
-            return f"https://wa.me/{phone}"
-        return ""
-    elif category == "Text":
-        value = inputs.get("text", "").strip()
-        if value:
-            return f"text:{value}"
-        return ""
-    elif category == "Email":
-        email = inputs.get("email", "").strip()
-        subject = inputs.get("email_subject", "").strip()
-        body = inputs.get("email_body", "").strip()
-        if email:
-            formatted = f"mailto:{email}?subject={subject}&body={body}" if subject or body else f"mailto:{email}"
-            return formatted
-        return ""
-    elif category == "Phone":
-        phone = inputs.get("phone_number", "").replace(" ", "").replace("-", "")
-        if phone:
-            return f"tel:{phone}"
-        return ""
-    elif category == "SMS":
-        phone = inputs.get("sms_number", "").replace(" ", "").replace("-", "")
-        message = inputs.get("sms_message", "").strip()
-        if phone:
-            formatted = f"sms:{phone}?body={message}" if message else f"sms:{phone}"
-            return formatted
-        return ""
-    elif category == "Location":
-        location = inputs.get("manual_location", "").strip()
-        if location:
-            return f"location:{location}"
-        return ""
-    elif category == "Event":
-        title = inputs.get("event_title", "").strip()
-        start = inputs.get("event_start", "").strip()
-        end = inputs.get("event_end", "").strip() or start
-        location = inputs.get("event_location", "").strip()
-        description = inputs.get("event_description", "").strip()
-        if title and start:
-            try:
-                start_dt = datetime.strptime(start, "%Y-%m-%dT%H:%M")
-                end_dt = datetime.strptime(end, "%Y-%m-%dT%H:%M")
-                ical = (
-                    f"BEGIN:VCALENDAR\n"
-                    f"VERSION:2.0\n"
-                    f"BEGIN:VEVENT\n"
-                    f"SUMMARY:{title}\n"
-                    f"DTSTART:{start_dt.strftime('%Y%m%dT%H%M%S')}\n"
-                    f"DTEND:{end_dt.strftime('%Y%m%dT%H%M%S')}\n"
-                    f"LOCATION:{location}\n"
-                    f"DESCRIPTION:{description}\n"
-                    f"END:VEVENT\n"
-                    f"END:VCALENDAR"
-                )
-                return ical
-            except ValueError:
-                return ""
-        return ""
-    elif category == "Social Media":
-        platform = inputs.get("social_platform", "twitter")
-        username = inputs.get("social_username", "").strip()
-        if username:
-            base_urls = {
-                "twitter": "https://twitter.com/",
-                "instagram": "https://instagram.com/",
-                "facebook": "https://facebook.com/",
-                "linkedin": "https://linkedin.com/in/",
-                "youtube": "https://youtube.com/@",
-                "tiktok": "https://tiktok.com/@",
-                "snapchat": "https://snapchat.com/add/",
-                "pinterest": "https://pinterest.com/"
-            }
-            return f"{base_urls.get(platform, 'https://')}{username}"
-        return ""
-    elif category == "vCard":
-        name = inputs.get("vcard_name", "").strip()
-        phone = inputs.get("vcard_phone", "").strip()
-        email = inputs.get("vcard_email", "").strip()
-        if name:
-            vcard = [
-                "BEGIN:VCARD",
-                "VERSION:3.0",
-                f"FN:{name}",
-            ]
-            if phone:
-                vcard.append(f"TEL:{phone}")
-            if email:
-                vcard.append(f"EMAIL:{email}")
-            vcard.append("END:VCARD")
-            return "\n".join(vcard)
-        return ""
-    elif category == "Cryptocurrency":
-        crypto_type = inputs.get("crypto_type", "bitcoin")
-        address = inputs.get("crypto_address", "").strip()
-        if address:
-            return f"{crypto_type}:{address}"
-        return ""
-    elif category == "2D Barcode":
-        value = inputs.get("barcode_text", "").strip()
-        if value:
-            return value
-        return ""
-    return ""
-
-# Function to generate QR code with customization
-@st.cache_data(show_spinner="Generating QR code...")
-def generate_qr(data, qr_config):
-    qr = qrcode.QRCode(
-        version=qr_config["version"],
-        box_size=qr_config["box_size"],
-        border=qr_config["border"],
-        error_correction=qr_config["error_correction"]
+# One bounded encode/render cache shared by all sessions on this server
+@st.cache_resource
+def get_render_cache():
+    max_disk_bytes = os.environ.get("QRGEN_CACHE_DISK_BYTES")
+    return LayeredCache(RenderCache(
+        max_bytes=int(os.environ.get("QRGEN_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+        disk_dir=os.environ.get("QRGEN_CACHE_DIR") or None,
+        max_disk_bytes=int(max_disk_bytes) if max_disk_bytes else None
+    ))
+
+# Renders run in a shared process pool so a slow code does not hold the
+# script thread or the GIL for other sessions
+@st.cache_resource
+def get_render_executor():
+    workers = os.environ.get("QRGEN_RENDER_WORKERS")
+    max_pending = os.environ.get("QRGEN_MAX_PENDING")
+    return RenderExecutor(
+        workers=int(workers) if workers else None,
+        max_pending=int(max_pending) if max_pending else None,
+        timeout=float(os.environ.get("QRGEN_RENDER_TIMEOUT", DEFAULT_TIMEOUT)),
+        # Workers are forked: Streamlit runs this script as __main__, so the
+        # spawn start methods would execute it again in every worker
+        prestart=True
     )
-    qr.add_data(data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(
-        fill_color=qr_config["fill_color"],
-        back_color=qr_config["back_color"]
+
+# History kept across restarts is opt-in: set QRGEN_HISTORY_DB to a
+# database path (e.g. qrgen.history.DEFAULT_DB_PATH). It is kept for
+# signed-in users only, each seeing their own entries; logged-out sessions
+# keep theirs in memory. QRGEN_HISTORY_MAX_ENTRIES and QRGEN_HISTORY_DAYS
+# bound how many are kept and for how long
+@st.cache_resource
+def get_history_store():
+    path = os.environ.get("QRGEN_HISTORY_DB")
+    if not path:
+        return None
+    max_entries = os.environ.get("QRGEN_HISTORY_MAX_ENTRIES")
+    days = os.environ.get("QRGEN_HISTORY_DAYS")
+    return PersistentHistory(
+        path,
+        max_entries=int(max_entries) if max_entries else DEFAULT_MAX_ENTRIES,
+        max_age=float(days) * 24 * 3600 if days else DEFAULT_MAX_AGE,
     )
-    
-    # PNG
-    png_buffer = io.BytesIO()
-    img.save(png_buffer, format="PNG")
-    png_bytes = png_buffer.getvalue()
-    
-    # SVG
-    factory = qrcode.image.svg.SvgPathImage
-    svg_img = qrcode.make(data, image_factory=factory)
-    svg_buffer = BytesIO()
-    svg_img.save(svg_buffer)
-    svg_bytes = svg_buffer.getvalue()
-    
-    return png_bytes, svg_bytes
+
+
+def history_owner():
+    """The signed-in user whose history is kept, or ``None`` when logged out.
+
+    A logged-out session has nothing to find its entries by once it ends,
+    so they are not written to the database.
+    """
+    if st.user.get("is_logged_in"):
+        return f"user:{st.user.get('email') or st.user.get('sub')}"
+    return None
+
+render_cache = get_render_cache()
+render_executor = get_render_executor()
+HISTORY_PAGE_SIZE = 5
 
 # Initialize session state
 if "inputs" not in st.session_state:
     st.session_state.inputs = {}
-    st.session_state.qr_history = []
+    history_store = get_history_store()
+    owner = history_owner() if history_store is not None else None
+    st.session_state.qr_history = HistoryStore(maxlen=10) if owner is None else history_store.owned(owner)
+    # Ids of the entries each history page starts after, for paging back
+    st.session_state.history_pages = [None]
+    st.session_state.draft_preview = DraftPreview(cache=render_cache)
 
 # App layout
 st.set_page_config(
@@ -224,28 +109,136 @@ with st.sidebar:
     st.header("QR Code Settings")
     qr_config = {
         "version": st.slider("QR Version", 1, 40, 1),
-        "box_size": st.slider("Box Size", 5, 20, 10),
-        "border": st.slider("Border Size", 1, 10, 4),
+        "fixed_version": st.checkbox(
+            "Fixed version",
+            help="Fail instead of choosing a larger version when the data does not fit"
+        ),
+        "box_size": st.slider("Box Size", 5, MAX_BOX_SIZE, 10),
+        "border": st.slider("Border Size", 1, MAX_BORDER, 4),
         "error_correction": ERROR_CORRECT_LEVELS[st.selectbox(
             "Error Correction",
             list(ERROR_CORRECT_LEVELS.keys()),
             index=1
         )],
         "fill_color": st.color_picker("QR Color", "#000000"),
-        "back_color": st.color_picker("Background Color", "#FFFFFF")
+        "back_color": st.color_picker("Background Color", "#FFFFFF"),
+        "png_compress_level": PNG_COMPRESSION_LEVELS[st.selectbox(
+            "PNG Compression",
+            list(PNG_COMPRESSION_LEVELS.keys()),
+            index=1,
+            help="Fastest renders quickest; Smallest produces the smallest files"
+        )]
     }
+    linked_mode = st.selectbox(
+        "Linked codes",
+        ["When data is too long", "Always", "Off"],
+        help="Split long data across smaller Structured Append codes that scanners join back together"
+    )
+    linked_max = st.slider("Most linked codes", 2, 16, 16, disabled=linked_mode == "Off",
+                           help="Fewer codes means each one is larger")
+    live_preview = st.toggle(
+        "Live preview",
+        value=True,
+        help="Draw a small draft of the code as you edit; full-size images are made on Generate"
+    )
     
     st.divider()
     st.header("History")
-    if st.session_state.qr_history:
-        for i, item in enumerate(st.session_state.qr_history[-5:]):
-            with st.expander(f"QR {i+1}: {item['category']}"):
-                st.image(item["png"], width=100)
-                if st.button(f"Reuse #{i+1}", key=f"reuse_{i}"):
-                    st.session_state.inputs = item["inputs"]
+    history_search = st.text_input("Search history", placeholder="Text in the encoded data")
+    history_category = st.selectbox("History category", ["All"] + CATEGORIES)
+    history_since = st.date_input("Generated since", value=None)
+    history_filters = {
+        "search": history_search or None,
+        "category": None if history_category == "All" else history_category,
+        "since": time.mktime(history_since.timetuple()) if history_since else None,
+    }
+    if st.session_state.get("history_filters") != history_filters:
+        st.session_state.history_filters = history_filters
+        st.session_state.history_pages = [None]
+    history_pages = st.session_state.history_pages
+    # Only this page's entries and thumbnails are loaded; one extra tells if there is a next page
+    history_page = st.session_state.qr_history.page(
+        HISTORY_PAGE_SIZE + 1, before=history_pages[-1], **history_filters
+    )
+    if history_page:
+        for item in history_page[:HISTORY_PAGE_SIZE]:
+            generated = time.strftime("%Y-%m-%d %H:%M", time.localtime(item.timestamp))
+            with st.expander(f"QR {item.id}: {item.category} · {generated}"):
+                st.image(item.thumbnail, width=100)
+                if st.button(f"Reuse #{item.id}", key=f"reuse_{item.id}"):
+                    st.session_state.inputs = dict(item.inputs)
+                    st.session_state.reused_entry = item
                     st.rerun()
+        newer, older = st.columns(2)
+        if len(history_pages) > 1 and newer.button("‹ Newer"):
+            history_pages.pop()
+            st.rerun()
+        if len(history_page) > HISTORY_PAGE_SIZE and older.button("Older ›"):
+            history_pages.append(history_page[HISTORY_PAGE_SIZE - 1].id)
+            st.rerun()
+    elif any(history_filters.values()):
+        st.info("No matching history")
     else:
         st.info("No history yet")
+    session_bytes = st.session_state.qr_history.nbytes() + sum(
+        sys.getsizeof(k) + sys.getsizeof(v) for k, v in st.session_state.inputs.items()
+    )
+    st.caption(f"Session memory: ~{session_bytes / 1024:.1f} KiB")
+
+    st.divider()
+    with st.expander("Render cache"):
+        cache_metrics = render_cache.metrics()
+        st.metric("Hits", cache_metrics["hits"] + cache_metrics["disk_hits"])
+        st.metric("Misses", cache_metrics["misses"])
+        st.metric("Evictions", cache_metrics["evictions"])
+        st.metric("Encodes skipped", cache_metrics["encode_hits"])
+        st.caption(
+            f"{cache_metrics['entries']} entries, "
+            f"{cache_metrics['bytes'] / 1024:.0f} / {cache_metrics['max_bytes'] / 1024:.0f} KiB in memory"
+            + (f", {cache_metrics['disk_bytes'] / 1024:.0f} KiB on disk" if render_cache.disk_dir else "")
+        )
+
+    with st.expander("Render workers"):
+        executor_metrics = render_executor.metrics()
+        st.metric("In flight", f"{executor_metrics['in_flight']} / {executor_metrics['max_pending']}")
+        st.metric("Turned away", executor_metrics["rejected"])
+        st.metric("Timed out", executor_metrics["timeouts"])
+        st.caption(f"{executor_metrics['workers']} worker processes, {executor_metrics['completed']} renders done")
+
+    with st.expander("Diagnostics"):
+        # Instrumentation is process-wide, so this affects every session
+        METRICS.enable(st.toggle("Collect stage timings", value=METRICS.enabled))
+        st.session_state.profile_next = st.checkbox(
+            "Profile next generation",
+            value=st.session_state.get("profile_next", False),
+            help="Run the next generation under cProfile, bypassing the render cache"
+        )
+        snapshot = METRICS.snapshot()
+        for metric, label, unit, scale in (
+            (STAGE_SECONDS, "Stage", "ms", 1000),
+            (OUTPUT_BYTES, "Format", "KiB", 1 / 1024),
+        ):
+            if metric in snapshot:
+                st.dataframe(
+                    [
+                        {
+                            label: name,
+                            "Count": stats["count"],
+                            f"Mean {unit}": round(stats["mean"] * scale, 2),
+                            **{f"{q.upper()} {unit}": round(stats[q] * scale, 2) for q in ("p50", "p95", "p99")},
+                        }
+                        for name, stats in snapshot[metric].items()
+                    ],
+                    hide_index=True
+                )
+        if snapshot:
+            st.download_button("Prometheus metrics", METRICS.prometheus(), "qrgen_metrics.txt", "text/plain")
+            st.download_button("JSON metrics", json.dumps(snapshot, indent=1), "qrgen_metrics.json", "application/json")
+            if st.button("Reset timings"):
+                METRICS.reset()
+                st.rerun()
+        elif not METRICS.enabled:
+            st.caption("Timings are off; set QRGEN_METRICS=1 to collect them from startup.")
 
 # Main content
 st.title("QR Code Generator Pro")
@@ -264,11 +257,7 @@ with st.expander("📚 How to use", expanded=False):
     """)
 
 # Category selection
-categories = [
-    "Number", "WiFi Password", "Link", "WhatsApp", "Text",
-    "Email", "Phone", "SMS", "Location", "Event",
-    "Social Media", "vCard", "Cryptocurrency", "2D Barcode"
-]
+categories = CATEGORIES
 
 category = st.selectbox(
     "Select QR Code Category",
@@ -284,8 +273,29 @@ if st.session_state.current_category != category:
     st.session_state.inputs = {}
     st.session_state.current_category = category
 
-# Dynamic input fields
-with st.form("qr_form"):
+
+def show_draft(previewer, polling):
+    """The latest draft preview; run as a fragment that polls until the edits settle.
+
+    ``run_every`` is only set by a full run, so once a polling fragment has
+    drawn the current draft it reruns the app to stop polling.
+    """
+    draft = previewer.draft()
+    if polling and not previewer.pending:
+        st.rerun(scope="app")
+    if draft is None:
+        if previewer.pending:
+            st.caption("Drawing preview…")
+    elif draft.png is None:
+        st.caption(f"⚠️ {draft.error}")
+    else:
+        updating = " · updating…" if previewer.pending else ""
+        st.image(draft.png, caption=f"Draft preview · version {draft.version}{updating}", width=240)
+
+
+# Dynamic input fields; with live preview every edit reruns to update the draft,
+# otherwise the form holds edits back until it is submitted
+with st.container() if live_preview else st.form("qr_form"):
     cols = st.columns(2)
     
     if category == "Number":
@@ -452,13 +462,35 @@ with st.form("qr_form"):
             height=100
         )
     
+    else:
+        # Categories added with register_category: one text input per field
+        for i, field in enumerate(get_category(category).fields):
+            st.session_state.inputs[field.name] = cols[i % 2].text_input(
+                field.label,
+                value=st.session_state.inputs.get(field.name, field.default)
+            )
+    
     # Preview of what will be encoded
     data_preview = format_qr_data(category, st.session_state.inputs)
     if data_preview:
         with st.expander("Preview encoded data"):
             st.code(data_preview, language="text")
+        plan = plan_segments(data_preview, qr_config["error_correction"], qr_config["version"])
+        if plan.version is None:
+            st.caption(f"⚠️ {plan.bits} data bits: too long for a single QR code at this error correction level")
+        else:
+            segments = " + ".join(f"{mode} {count}" for mode, count in plan.summary())
+            st.caption(f"Version {plan.version} · {plan.bits} data bits · {segments}")
     
-    generate_btn = st.form_submit_button("Generate QR Code")
+    if live_preview:
+        previewer = st.session_state.draft_preview
+        previewer.submit(data_preview, qr_config)
+        # Draw now if the edits have already settled, so only an unsettled draft polls
+        previewer.draft()
+        polling = previewer.pending
+        st.fragment(show_draft, run_every=previewer.debounce if polling else None)(previewer, polling)
+    
+    generate_btn = (st.button if live_preview else st.form_submit_button)("Generate QR Code")
 
 # Generate and display QR code
 if generate_btn:
@@ -467,19 +499,83 @@ if generate_btn:
         st.error(error)
     else:
         data = format_qr_data(category, st.session_state.inputs)
-        if data:
+        # Data beyond one symbol's capacity is split across linked codes
+        split_data = bool(data) and (linked_mode == "Always" or (
+            linked_mode == "When data is too long"
+            and plan_segments(data, qr_config["error_correction"], qr_config["version"]).version is None
+        ))
+        if split_data:
+            with st.spinner("Generating linked QR codes..."):
+                try:
+                    # Parts are encoded, rendered and read back in parallel on the shared workers
+                    linked = render_structured(
+                        data, qr_config, max_symbols=linked_max, executor=render_executor, verify=True
+                    )
+                except ServerBusy:
+                    st.warning("The server is busy generating other QR codes. Please try again in a moment.")
+                    st.stop()
+                except (RenderTimeout, CapacityError) as e:
+                    st.error(str(e))
+                    st.stop()
+                tiled_png = render(tile([matrix for matrix, _, _ in linked], qr_config["border"]), qr_config, "png")
+                linked_zip = io.BytesIO()
+                write_structured(linked_zip, linked, qr_config, tiled={"png": tiled_png})
+                unreadable = [index for index, (_, _, problem) in enumerate(linked, start=1) if problem]
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.image(tiled_png, caption=f"{len(linked)} linked QR codes", use_container_width=True)
+            with col2:
+                largest = max(matrix.version for matrix, _, _ in linked)
+                st.success(f"Split into {len(linked)} linked QR codes, largest version {largest}.")
+                st.info("Scanners that support Structured Append join the codes back together.")
+                if unreadable:
+                    st.warning(f"⚠️ Codes {', '.join(map(str, unreadable))} may not scan; check the colours.")
+                st.download_button(
+                    label="Download ZIP (every code)",
+                    data=linked_zip.getvalue(),
+                    file_name=f"qr_codes_{category.lower().replace(' ', '_')}_linked.zip",
+                    mime="application/zip"
+                )
+                st.download_button(
+                    label="Download tiled PNG",
+                    data=tiled_png,
+                    file_name=f"qr_codes_{category.lower().replace(' ', '_')}_linked.png",
+                    mime="image/png"
+                )
+                st.markdown("**Encoded data:**")
+                st.code(data, language="text")
+        elif data:
             with st.spinner("Generating QR code..."):
-                png_bytes, svg_bytes = generate_qr(data, qr_config)
+                try:
+                    if st.session_state.pop("profile_next", False):
+                        # Profiled in this process, but still counted against the render limit
+                        with render_executor.slot():
+                            (png_bytes, svg_bytes), profile_text = profile(generate_qr, data, qr_config)
+                        st.session_state.last_profile = profile_text
+                    else:
+                        # Colour and size changes restyle cached images instead of re-encoding
+                        png_bytes, svg_bytes = render_executor.render_cached(render_cache, data, qr_config)
+                    # Read the PNG back onto the module grid to catch codes that will not scan
+                    scan_problem = render_executor.verify_cached(render_cache, data, qr_config, png_bytes)
+                except ServerBusy:
+                    st.warning("The server is busy generating other QR codes. Please try again in a moment.")
+                    st.stop()
+                except RenderTimeout as e:
+                    st.error(str(e))
+                    st.stop()
+                except CapacityError as e:
+                    st.error(str(e))
+                    st.stop()
+                
+                if "last_profile" in st.session_state:
+                    with st.expander("cProfile report"):
+                        st.code(st.session_state.pop("last_profile"), language="text")
                 
                 # Save to history
-                if len(st.session_state.qr_history) >= 10:
-                    st.session_state.qr_history.pop(0)
-                st.session_state.qr_history.append({
-                    "category": category,
-                    "inputs": st.session_state.inputs.copy(),
-                    "png": png_bytes,
-                    "timestamp": datetime.now().isoformat()
-                })
+                st.session_state.qr_history.add(
+                    category, st.session_state.inputs, data, qr_config, render_cache, (png_bytes, svg_bytes)
+                )
                 
                 # Display results
                 col1, col2 = st.columns(2)
@@ -489,6 +585,8 @@ if generate_btn:
                     # Copy to Clipboard Button
                     if st.button("📋 Copy QR to Clipboard", help="Copy the QR code image to your clipboard"):
                         try:
+                            import pyperclip
+                            from PIL import Image
                             img = Image.open(io.BytesIO(png_bytes))
                             pyperclip.copy(img)
                             st.success("✅ Copied to clipboard!")
@@ -497,6 +595,8 @@ if generate_btn:
                 
                 with col2:
                     st.success("QR code generated successfully!")
+                    if scan_problem:
+                        st.warning(f"⚠️ This QR code may not scan: {scan_problem}")
                     
                     # Download Buttons
                     st.download_button(
@@ -548,6 +648,123 @@ if generate_btn:
         else:
             st.error("Failed to generate QR code. Please check your inputs.")
 
+# Reused history entry: full-size assets come from the shared cache or are rendered again
+if not generate_btn and "reused_entry" in st.session_state:
+    reused = st.session_state.pop("reused_entry")
+    try:
+        png_bytes, svg_bytes = reused.assets(render_cache, render_executor)
+    except (ServerBusy, RenderTimeout) as e:
+        st.warning(str(e))
+        st.stop()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.image(png_bytes, caption=f"Reused QR Code ({reused.category})", use_container_width=True)
+    with col2:
+        st.download_button(
+            label="Download PNG",
+            data=png_bytes,
+            file_name=f"qr_code_{reused.category.lower().replace(' ', '_')}.png",
+            mime="image/png"
+        )
+        st.download_button(
+            label="Download SVG",
+            data=svg_bytes,
+            file_name=f"qr_code_{reused.category.lower().replace(' ', '_')}.svg",
+            mime="image/svg+xml"
+        )
+
+# Batch generation
+st.divider()
+with st.expander("📦 Batch generation (CSV / JSONL)", expanded=False):
+    st.markdown("""
+    Upload a file with a `category` column plus the input fields for that category
+    (e.g. `link`, `wifi_ssid`, `wifi_password`) and an optional `filename` column.
+    All rows use the settings from the sidebar.
+    """)
+    batch_file = st.file_uploader("Rows file", type=["csv", "jsonl", "ndjson"])
+    batch_output = st.radio("Output", ["ZIP archive", "Print sheet (PDF)"], horizontal=True)
+    if batch_output == "ZIP archive":
+        batch_formats = st.multiselect("Formats", ["png", "svg"], default=["png", "svg"])
+        batch_verify = st.checkbox("Verify every code", value=True,
+                                   help="Read each PNG back and check it matches the code and has enough contrast")
+        batch_reject = batch_verify and st.checkbox("Leave out codes that fail verification")
+    else:
+        batch_formats = ["pdf"]
+        sheet_layout = st.selectbox("Sheet layout", list(SHEET_LAYOUTS))
+        sheet_caption = st.selectbox("Captions", ["data", "name", "none"],
+                                     help="Encoded data, the filename column, or no caption")
+    if batch_file is not None and batch_formats and st.button("Generate Batch"):
+        batch_fmt = "csv" if batch_file.name.lower().endswith(".csv") else "jsonl"
+        batch_text = batch_file.getvalue().decode("utf-8-sig")
+        batch_progress = st.progress(0.0, text="Starting batch...")
+
+        def show_batch_progress(report):
+            eta = f" · ETA {report.eta:.0f}s" if report.eta is not None else ""
+            batch_progress.progress(
+                report.fraction or 0.0,
+                text=f"{report.processed}/{report.expected} rows · {report.codes_per_sec:.0f} codes/sec{eta}"
+            )
+
+        # The archive or sheet is streamed to a temporary file rather than held in memory
+        batch_out = tempfile.TemporaryFile()
+        batch_rows = read_rows(io.StringIO(batch_text), batch_fmt)
+        batch_expected = count_rows(io.StringIO(batch_text), batch_fmt)
+        try:
+            # Batches share the render workers, holding some of their slots so single codes still get through
+            with render_executor.reserve(render_executor.workers) as batch_executor:
+                if batch_output == "ZIP archive":
+                    report = run_batch(
+                        batch_rows,
+                        batch_out,
+                        qr_config=qr_config,
+                        formats=batch_formats,
+                        expected=batch_expected,
+                        executor=batch_executor,
+                        progress=show_batch_progress,
+                        verify=batch_verify,
+                        reject_unreadable=batch_reject,
+                    )
+                else:
+                    report = run_sheet(
+                        batch_rows,
+                        batch_out,
+                        layout=sheet_layout,
+                        qr_config=qr_config,
+                        fmt="pdf",
+                        caption=None if sheet_caption == "none" else sheet_caption,
+                        expected=batch_expected,
+                        executor=batch_executor,
+                        progress=show_batch_progress,
+                    )
+        except ServerBusy:
+            st.warning("The server is busy with other batches. Please try again in a moment.")
+            st.stop()
+        batch_out.seek(0)
+        st.success(report.summary())
+        if report.unreadable:
+            st.warning(f"{report.unreadable} codes failed verification and may not scan; "
+                       + ("they were left out." if batch_reject else "they are listed in errors.csv."))
+        if report.failed and batch_output == "ZIP archive":
+            st.warning(f"{report.failed} rows failed; see errors.csv in the archive.")
+        elif report.failed:
+            st.warning(f"{report.failed} rows were left off the sheet.")
+            for index, category, error in report.errors[:20]:
+                st.caption(f"Row {index} ({category or 'no category'}): {error}")
+        if batch_output == "ZIP archive":
+            st.download_button(
+                label="Download ZIP",
+                data=batch_out,
+                file_name="qr_codes.zip",
+                mime="application/zip"
+            )
+        else:
+            st.download_button(
+                label="Download PDF",
+                data=batch_out,
+                file_name="qr_sheet.pdf",
+                mime="application/pdf"
+            )
+
 # Footer
 st.divider()
 st.markdown("""
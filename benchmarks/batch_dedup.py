@@ -0,0 +1,63 @@
+"""Batch time with and without payload deduplication as the share of repeated rows grows.
+
+Builds --rows Link rows of which a given share repeat one of --distinct
+shared URLs (the rest are unique), runs ``run_batch`` on them with and
+without ``deduplicate``, and prints both times next to the dedup ratio and
+the saving the report estimates. The archives are also compared entry by
+entry.
+
+    python benchmarks/batch_dedup.py [--rows 4000] [--distinct 20] [--workers N]
+"""
+import argparse
+import io
+import random
+import zipfile
+
+from common import timeit
+
+from qrgen.batch import BatchRow, run_batch
+
+SHARES = (0.0, 0.5, 0.9, 0.99)
+
+
+def rows_for(count, share, distinct, rng):
+    rows = []
+    for index in range(1, count + 1):
+        if rng.random() < share:
+            link = f"https://example.com/event/{rng.randrange(distinct)}"
+        else:
+            link = f"https://example.com/ticket/{index:06d}"
+        rows.append(BatchRow(index, "Link", {"link": link}, f"ticket_{index:06d}"))
+    return rows
+
+
+def run(rows, workers, deduplicate):
+    output = io.BytesIO()
+    report = run_batch(rows, output, workers=workers, deduplicate=deduplicate)
+    return report, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4000)
+    parser.add_argument("--distinct", type=int, default=20)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'repeated':>8} {'plain s':>8} {'dedup s':>8} {'ratio':>6} {'estimated':>10}  same")
+    for share in SHARES:
+        rows = rows_for(args.rows, share, args.distinct, rng)
+        plain_ms, (_, plain) = timeit(run, rows, args.workers, False, repeat=args.repeat)
+        dedup_ms, (report, dedup) = timeit(run, rows, args.workers, True, repeat=args.repeat)
+        with zipfile.ZipFile(plain) as a, zipfile.ZipFile(dedup) as b:
+            same = sorted(a.namelist()) == sorted(b.namelist()) and all(
+                a.read(name) == b.read(name) for name in a.namelist()
+            )
+        print(f"{share:>8.0%} {plain_ms / 1000:>8.2f} {dedup_ms / 1000:>8.2f} {report.dedup_ratio:>5.1f}x "
+              f"{report.saved:>9.2f}s  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Row-by-row versus columnar validation and formatting of large input columns.
+
+Times ``validate_inputs``/``format_qr_data`` called once per row against
+``validate_column``/``format_column`` on the same inputs, for a few
+high-volume categories, and checks that both give the same results.
+
+    python benchmarks/bulk_payloads.py [--rows N]
+"""
+import argparse
+import random
+import time
+
+import common  # noqa: F401  (puts the repository root on sys.path)
+
+import numpy as np
+
+from qrgen.core import format_column, format_qr_data, validate_column, validate_inputs
+
+
+def phone_numbers(rows):
+    return [f"+1 555-{random.randrange(10000):04d}-{random.randrange(100):02d}" for _ in range(rows)]
+
+
+def links(rows):
+    return [f"https://example.com/t/{i:08d}" if i % 50 else f"example.com/{i}" for i in range(rows)]
+
+
+def emails(rows):
+    return [f"user{i}@example.com" if i % 40 else f"user{i}.example.com" for i in range(rows)]
+
+
+CASES = (
+    ("Phone", "phone_number", phone_numbers),
+    ("WhatsApp", "whatsapp_number", phone_numbers),
+    ("Link", "link", links),
+    ("Email", "email", emails),
+)
+
+
+def per_row(category, field, values):
+    errors, payloads = [], []
+    for value in values:
+        inputs = {field: value}
+        errors.append(validate_inputs(category, inputs))
+        payloads.append(format_qr_data(category, inputs))
+    return errors, payloads
+
+
+def columnar(category, field, values):
+    columns = {field: values}
+    return validate_column(category, columns, len(values)), format_column(category, columns, len(values))
+
+
+def best_of(func, *args, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'category':<10} {'per-row s':>10} {'columnar s':>11} {'speedup':>8} {'rows/sec':>12}  same")
+    for category, field, make in CASES:
+        values = make(args.rows)
+        before, expected = best_of(per_row, category, field, values, repeat=args.repeat)
+        after, result = best_of(columnar, category, field, np.array(values), repeat=args.repeat)
+        print(f"{category:<10} {before:>10.2f} {after:>11.2f} {before / after:>7.1f}x "
+              f"{args.rows / after:>12,.0f}  {result == expected}")
+
+
+if __name__ == "__main__":
+    main()
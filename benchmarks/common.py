@@ -0,0 +1,25 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def payload_for_version(version, error_correction):
+    """Largest byte-mode payload that still fits ``version``."""
+    from qrcode import util
+
+    bits = util.BIT_LIMIT_TABLE[error_correction][version]
+    count_bits = util.length_in_bits(util.MODE_8BIT_BYTE, version)
+    return "x" * ((bits - 4 - count_bits) // 8)
+
+
+def timeit(func, *args, repeat=5):
+    """Best wall time of ``repeat`` calls in milliseconds, and the last result."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
@@ -0,0 +1,110 @@
+"""Simulate concurrent app sessions rendering through a shared cache and report tail latency.
+
+Each session is a thread that renders --requests codes one after another,
+as a user pressing "Generate" would; --heavy of them are version-40 codes,
+the rest small links, all with payloads not seen before. The same load runs
+twice: inline on the session threads (how the app used to render) and
+through a shared ``RenderExecutor``. Latencies are reported separately for
+small and large codes, along with requests turned away as busy or timed out.
+
+    python benchmarks/concurrent_sessions.py [--sessions 16] [--requests 20] [--heavy 0.1]
+                                             [--workers N] [--max-pending N] [--timeout 30]
+"""
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+
+from common import payload_for_version
+from load_test import percentile
+
+from qrgen.cache import LayeredCache
+from qrgen.core import DEFAULT_QR_CONFIG
+from qrgen.executor import RenderExecutor, RenderTimeout, ServerBusy
+
+
+def workload(sessions, requests, heavy, seed=0):
+    """Per session, a list of ``(kind, data)``; every payload is unique."""
+    rng = random.Random(seed)
+    large = payload_for_version(40, DEFAULT_QR_CONFIG["error_correction"])
+    plans = []
+    for session in range(sessions):
+        plan = []
+        for i in range(requests):
+            tag = f"{session}-{i}"
+            if rng.random() < heavy:
+                plan.append(("large", tag + large[len(tag):]))
+            else:
+                plan.append(("small", f"https://example.com/s/{tag}"))
+        plans.append(plan)
+    return plans
+
+
+def run(plans, render):
+    latencies = {"small": [], "large": []}
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def session(plan):
+        for kind, data in plan:
+            start = time.perf_counter()
+            try:
+                render(data)
+                outcome = "ok"
+            except ServerBusy:
+                outcome = "busy"
+            except RenderTimeout:
+                outcome = "timeout"
+            elapsed = time.perf_counter() - start
+            with lock:
+                outcomes[outcome] += 1
+                if outcome == "ok":
+                    latencies[kind].append(elapsed)
+
+    threads = [threading.Thread(target=session, args=(plan,)) for plan in plans]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, outcomes, time.perf_counter() - start
+
+
+def report(name, latencies, outcomes, wall):
+    print(f"{name}: {sum(outcomes.values())} requests in {wall:.2f}s, {dict(sorted(outcomes.items()))}")
+    for kind, values in latencies.items():
+        values.sort()
+        if values:
+            print(f"  {kind:<5} n={len(values):<5} "
+                  + "  ".join(f"p{q}: {percentile(values, q / 100) * 1000:7.1f} ms" for q in (50, 95, 99))
+                  + f"  max: {values[-1] * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=20, help="renders per session")
+    parser.add_argument("--heavy", type=float, default=0.1, help="fraction of version-40 codes")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--max-pending", type=int)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    plans = workload(args.sessions, args.requests, args.heavy)
+    config = dict(DEFAULT_QR_CONFIG)
+
+    cache = LayeredCache()
+    report("inline", *run(plans, lambda data: cache.generate(data, config)))
+
+    executor = RenderExecutor(args.workers, args.max_pending, args.timeout, prestart=True)
+    try:
+        cache = LayeredCache()
+        report("executor", *run(plans, lambda data: executor.render_cached(cache, data, config)))
+        print("executor:", executor.metrics())
+    finally:
+        executor.close()
+
+
+if __name__ == "__main__":
+    main()
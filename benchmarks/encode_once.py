@@ -0,0 +1,67 @@
+"""Compare the old double-encode generate_qr with the shared module-matrix pipeline.
+
+Run from the repository root:
+
+    python benchmarks/encode_once.py [--repeat N]
+"""
+import argparse
+import io
+
+from common import payload_for_version, timeit
+
+import qrcode
+import qrcode.image.svg
+
+from qrgen.core import DEFAULT_QR_CONFIG, generate_qr
+from qrgen.encoding import encode_for_config
+
+VERSIONS = (1, 10, 25, 40)
+
+
+def old_generate_qr(data, qr_config):
+    qr = qrcode.QRCode(
+        version=qr_config["version"],
+        box_size=qr_config["box_size"],
+        border=qr_config["border"],
+        error_correction=qr_config["error_correction"]
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color=qr_config["fill_color"], back_color=qr_config["back_color"])
+    png_buffer = io.BytesIO()
+    img.save(png_buffer, format="PNG")
+
+    svg_img = qrcode.make(data, image_factory=qrcode.image.svg.SvgPathImage)
+    svg_buffer = io.BytesIO()
+    svg_img.save(svg_buffer)
+    return png_buffer.getvalue(), svg_buffer.getvalue()
+
+
+def old_encode(data, qr_config):
+    qr = qrcode.QRCode(version=qr_config["version"], error_correction=qr_config["error_correction"])
+    qr.add_data(data)
+    qr.make(fit=True)
+    qr = qrcode.QRCode()
+    qr.add_data(data)
+    qr.make(fit=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'version':>7} {'encode x2 ms':>13} {'encode x1 ms':>13} {'old total ms':>13} {'new total ms':>13} {'saving':>7}")
+    for version in VERSIONS:
+        qr_config = {**DEFAULT_QR_CONFIG, "version": version}
+        data = payload_for_version(version, qr_config["error_correction"])
+        enc_old = timeit(old_encode, data, qr_config, repeat=args.repeat)[0]
+        enc_new = timeit(encode_for_config, data, qr_config, repeat=args.repeat)[0]
+        total_old = timeit(old_generate_qr, data, qr_config, repeat=args.repeat)[0]
+        total_new = timeit(generate_qr, data, qr_config, repeat=args.repeat)[0]
+        print(f"{version:>7} {enc_old:>13.2f} {enc_new:>13.2f} {total_old:>13.2f} {total_new:>13.2f} "
+              f"{1 - total_new / total_old:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
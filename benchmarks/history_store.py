@@ -0,0 +1,97 @@
+"""Size and query times of a large persistent history.
+
+Records --entries generations of --distinct codes spread over a year,
+with their PNG and SVG, into a fresh ``PersistentHistory``, then times the
+queries the sidebar makes: the first and a deep page, and pages filtered
+by category, payload substring and date. Also shows how much the
+content-addressed blobs save over storing every generation's images.
+
+    python benchmarks/history_store.py [--entries 100000] [--distinct 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from functools import partial
+
+from common import timeit
+
+from qrgen.cache import LayeredCache
+from qrgen.core import DEFAULT_QR_CONFIG, format_qr_data
+from qrgen.history import PersistentHistory
+
+CATEGORIES = ("Link", "Text", "Phone")
+YEAR = 365 * 24 * 3600
+
+
+def inputs_for(category, i):
+    if category == "Link":
+        return {"link": f"https://example.com/product/{i:06d}"}
+    if category == "Phone":
+        return {"phone_number": f"+1 555 {i:07d}"}
+    return {"text": f"Order {i:06d} ready for pickup"}
+
+
+def populate(history, entries, distinct):
+    rng = random.Random(0)
+    config = dict(DEFAULT_QR_CONFIG)
+    cache = LayeredCache()
+    codes = []
+    for i in range(distinct):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        inputs = inputs_for(category, i)
+        data = format_qr_data(category, inputs)
+        codes.append((category, inputs, data, cache.generate(data, config)))
+    start = time.time() - YEAR
+    image_bytes = 0
+    for n in range(entries):
+        category, inputs, data, assets = codes[rng.randrange(distinct)]
+        history.add(category, inputs, data, config, cache, assets)
+        image_bytes += sum(map(len, assets))
+    # Spread the entries evenly over the year for the date filter
+    with history._db:
+        history._db.execute("UPDATE history SET created = ? + id * ?", (start, YEAR / entries))
+    return image_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.sqlite3")
+        history = PersistentHistory(path, max_entries=None, max_age=None)
+        start = time.perf_counter()
+        image_bytes = populate(history, args.entries, args.distinct)
+        print(f"{args.entries} entries of {args.distinct} codes recorded in {time.perf_counter() - start:.1f}s")
+        metrics = history.metrics()
+        print(f"database {os.path.getsize(path) / 2 ** 20:.1f} MiB, {metrics['blobs']} blobs of "
+              f"{metrics['blob_bytes'] / 2 ** 20:.1f} MiB; the images of every entry are "
+              f"{image_bytes / 2 ** 20:.1f} MiB")
+
+        deep = history.page(1, before=args.entries // 2)[0].id
+        month_ago = time.time() - YEAR / 12
+        queries = {
+            "first page": {},
+            "deep page": {"before": deep},
+            "category": {"category": "Phone"},
+            "substring": {"search": "product/0004"},
+            "short substring": {"search": "42"},
+            "since a month": {"since": month_ago},
+            "no match": {"search": "not in any payload"},
+        }
+        print(f"{'query':<16} {'page ms':>8} {'count ms':>9} {'matches':>8}")
+        for name, filters in queries.items():
+            page_ms = timeit(partial(history.page, 6, **filters), repeat=args.repeat)[0]
+            count_filters = {k: v for k, v in filters.items() if k != "before"}
+            count_ms, matches = timeit(partial(history.count, **count_filters), repeat=args.repeat)
+            print(f"{name:<16} {page_ms:>8.2f} {count_ms:>9.2f} {matches:>8}")
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Cold-start import time of the qrgen entry points.
+
+Each target is imported in a fresh interpreter, as a CLI invocation or a
+batch worker would, and the best wall time over several runs is reported
+together with the heavy modules that ended up loaded.
+
+    python benchmarks/import_time.py [--repeat N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "python (baseline)": "pass",
+    "import qrgen": "import qrgen",
+    "import qrgen.cli": "import qrgen.cli",
+    "import qrgen.batch": "import qrgen.batch",
+    "first generate_qr": (
+        "import qrgen; qrgen.generate_qr('https://example.com', qrgen.DEFAULT_QR_CONFIG)"
+    ),
+}
+
+HEAVY_MODULES = ("streamlit", "numpy", "qrcode", "PIL", "qrcode.image.svg")
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+import json
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(code, repeat):
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(code=code, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(out)
+        if result["ms"] < best:
+            best, loaded = result["ms"], result["loaded"]
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'target':<22} {'ms':>8}  heavy modules loaded")
+    for name, code in TARGETS.items():
+        ms, loaded = measure(code, args.repeat)
+        print(f"{name:<22} {ms:>8.1f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Work done while typing a payload: full renders on every edit versus debounced drafts.
+
+Replays typing a URL one character per --interval milliseconds, with a
+pause every --burst characters, against a simulated clock. Each edit
+either generates the full-size PNG and SVG, as submitting after every
+keystroke would, or is submitted to a ``DraftPreview`` that the page polls
+every debounce interval. Then, for a range of versions, times a full
+generate against drawing a draft from an already encoded matrix, as a
+colour or border change does.
+
+    python benchmarks/live_preview.py [--interval 120] [--burst 8] [--debounce 0.4]
+"""
+import argparse
+import time
+
+from common import payload_for_version, timeit
+
+from qrgen.core import DEFAULT_QR_CONFIG, generate_qr
+from qrgen.encoding import encode_for_config
+from qrgen.preview import DraftPreview, draft_config
+from qrgen.render import render_png
+
+URL = "https://example.com/events/2026/autumn-meetup?utm_source=poster&utm_medium=print"
+VERSIONS = (2, 5, 10, 20, 40)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def keystrokes(text, interval, burst):
+    """``(time, prefix)`` for each edit, with a one second pause every ``burst`` characters."""
+    now = 0.0
+    for count in range(1, len(text) + 1):
+        now += interval + (1.0 if count % burst == 0 else 0.0)
+        yield now, text[:count]
+
+
+def replay_drafts(edits, config, debounce):
+    clock = Clock()
+    preview = DraftPreview(debounce, clock=clock)
+    start = time.perf_counter()
+    edits = list(edits)
+    for (now, data), (following, _) in zip(edits, edits[1:] + [(edits[-1][0] + 2.0, None)]):
+        clock.now = now
+        preview.submit(data, config)
+        preview.draft()
+        # The page polls every debounce interval until the next edit
+        clock.now += debounce
+        while clock.now < following:
+            preview.draft()
+            clock.now += debounce
+    return (time.perf_counter() - start) * 1000, preview
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--interval", type=float, default=120, help="milliseconds between keystrokes")
+    parser.add_argument("--burst", type=int, default=8, help="characters typed between pauses")
+    parser.add_argument("--debounce", type=float, default=0.4)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    config = dict(DEFAULT_QR_CONFIG)
+    edits = list(keystrokes(URL, args.interval / 1000, args.burst))
+    start = time.perf_counter()
+    for _, data in edits:
+        generate_qr(data, config)
+    full_ms = (time.perf_counter() - start) * 1000
+    draft_ms, preview = replay_drafts(edits, config, args.debounce)
+    print(f"{len(edits)} edits: full renders {full_ms:.1f} ms; drafts {draft_ms:.1f} ms "
+          f"({preview.rendered} drawn, {preview.skipped_encodes} without encoding)")
+
+    print()
+    print(f"{'version':>7} {'full ms':>8} {'redraw ms':>9} {'full B':>7} {'draft B':>8}")
+    small = draft_config(config)
+    for version in VERSIONS:
+        data = payload_for_version(version, config["error_correction"])
+        full, (png_bytes, _) = timeit(generate_qr, data, config, repeat=args.repeat)
+        matrix = encode_for_config(data, config)
+        draft, draft_png = timeit(render_png, matrix, small, repeat=args.repeat)
+        print(f"{version:>7} {full:>8.2f} {draft:>9.2f} {len(png_bytes):>7} {len(draft_png):>8}")
+
+
+if __name__ == "__main__":
+    main()
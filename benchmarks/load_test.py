@@ -0,0 +1,110 @@
+"""Load-test the HTTP API on localhost and report latency percentiles and throughput.
+
+Starts its own server unless --port points at one that is already running:
+
+    python benchmarks/load_test.py [--port 8000] [--concurrency 16] [--requests 2000]
+                                   [--unique 0.5] [--revalidate]
+
+--unique is the fraction of requests with a payload nobody asked for
+before (cache misses); --revalidate sends If-None-Match for ETags the
+client has already seen.
+"""
+import argparse
+import http.client
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def start_server(workers):
+    from qrgen.server import QRServer, QRService
+
+    service = QRService(workers=workers)
+    server = QRServer(("127.0.0.1", 0), service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, help="use a server that is already running")
+    parser.add_argument("--workers", type=int, help="render workers for the spawned server")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--unique", type=float, default=0.5, help="fraction of never-seen payloads")
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match for known ETags")
+    parser.add_argument("--format", default="png", choices=["png", "svg"])
+    args = parser.parse_args()
+
+    server = service = None
+    port = args.port
+    if port is None:
+        server, service = start_server(args.workers)
+        port = server.server_port
+
+    rng = random.Random(0)
+    paths = []
+    for i in range(args.requests):
+        link = f"https://example.com/item/{i if rng.random() < args.unique else rng.randrange(20)}"
+        paths.append("/qr?" + urlencode({"category": "Link", "link": link, "format": args.format}))
+
+    local = threading.local()
+    etags = {}
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def fetch(path):
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        headers = {}
+        if args.revalidate and path in etags:
+            headers["If-None-Match"] = etags[path]
+        start = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status] += 1
+            if response.getheader("ETag"):
+                etags[path] = response.getheader("ETag")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(fetch, paths))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{len(latencies)} requests, concurrency {args.concurrency}, {wall:.2f}s")
+    print(f"throughput: {len(latencies) / wall:.1f} req/s")
+    print(f"latency p50: {percentile(latencies, 0.50) * 1000:.1f} ms  "
+          f"p99: {percentile(latencies, 0.99) * 1000:.1f} ms  "
+          f"max: {latencies[-1] * 1000:.1f} ms")
+    print("status codes:", dict(sorted(statuses.items())))
+
+    if server is not None:
+        print("server:", service.metrics())
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Encode timings of stock qrcode versus table-driven fitting and NumPy mask scoring.
+
+Both produce the same symbol; the script checks that while timing them.
+
+    python benchmarks/mask_scoring.py [--repeat N]
+"""
+import argparse
+
+from common import payload_for_version, timeit
+
+import numpy as np
+import qrcode
+
+from qrgen.core import ERROR_CORRECT_LEVELS
+from qrgen.encoding import encode
+
+VERSIONS = (10, 20, 30, 40)
+
+
+def stock_encode(data, error_correction):
+    qr = qrcode.QRCode(error_correction=error_correction, border=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    level = ERROR_CORRECT_LEVELS["Medium"]
+    print(f"{'version':>7} {'qrcode ms':>10} {'qrgen ms':>10} {'speedup':>8}  identical")
+    for version in VERSIONS:
+        data = payload_for_version(version, level)
+        before, qr = timeit(stock_encode, data, level, repeat=args.repeat)
+        after, matrix = timeit(encode, data, None, level, repeat=args.repeat)
+        same = matrix.version == qr.version and np.array_equal(matrix.modules, np.array(qr.modules, dtype=bool))
+        print(f"{version:>7} {before:>10.1f} {after:>10.1f} {before / after:>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Matrix construction with qrcode's layout routines versus per-version templates.
+
+For a full payload of each version, times building the masked symbol from
+the segments once the mask is known: qrcode's ``makeImpl`` (pattern setup,
+Reed-Solomon and ``map_data`` in pure Python) against copying the cached
+``SymbolTemplate`` and scattering the codeword bits in its precomputed
+order. Also shows the whole ``encode`` call and checks both matrices match.
+
+    python benchmarks/matrix_construction.py [--repeat N]
+"""
+import argparse
+
+from common import payload_for_version, timeit
+
+import numpy as np
+import qrcode
+
+from qrgen.core import ERROR_CORRECT_LEVELS
+from qrgen.encoding import _codewords, _type_info, encode, symbol_template
+from qrgen.segmentation import plan_segments
+
+VERSIONS = (1, 5, 10, 20, 30, 40)
+
+
+def stock_construct(segments, version, error_correction, mask_pattern):
+    qr = qrcode.QRCode(version=version, error_correction=error_correction, border=0)
+    for segment in segments:
+        qr.add_data(segment)
+    qr.makeImpl(False, mask_pattern)
+    return np.array(qr.modules, dtype=bool)
+
+
+def template_construct(segments, version, error_correction, mask_pattern):
+    template = symbol_template(version)
+    modules = template.place(_codewords(version, error_correction, segments)) ^ template.masks[mask_pattern]
+    index, values = _type_info(version, error_correction, mask_pattern)
+    modules.ravel()[index] = values
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    level = ERROR_CORRECT_LEVELS["Medium"]
+    print(f"{'version':>7} {'makeImpl ms':>12} {'template ms':>12} {'speedup':>8} {'encode ms':>10}  identical")
+    for version in VERSIONS:
+        data = payload_for_version(version, level)
+        plan = plan_segments(data, level, version)
+        mask_pattern = version % 8
+        symbol_template(version)  # built once per process, not part of the timing
+        arguments = (plan.segments, plan.version, level, mask_pattern)
+        before, expected = timeit(stock_construct, *arguments, repeat=args.repeat)
+        after, modules = timeit(template_construct, *arguments, repeat=args.repeat)
+        total = timeit(encode, data, version, level, repeat=args.repeat)[0]
+        print(f"{version:>7} {before:>12.2f} {after:>12.2f} {before / after:>7.1f}x {total:>10.2f}  "
+              f"{np.array_equal(expected, modules)}")
+
+
+if __name__ == "__main__":
+    main()
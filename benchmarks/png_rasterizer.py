@@ -0,0 +1,62 @@
+"""Compare qrcode's PIL image factory with the NumPy PNG rasterizer.
+
+Run from the repository root:
+
+    python benchmarks/png_rasterizer.py [--version 40] [--box-size 20] [--repeat N]
+"""
+import argparse
+import io
+
+from common import timeit
+
+import numpy as np
+from PIL import Image
+from qrcode.image.pil import PilImage
+
+from qrgen.core import DEFAULT_QR_CONFIG, PNG_COMPRESSION_LEVELS
+from qrgen.encoding import encode
+from qrgen.render import render_png
+
+
+def factory_png(matrix, qr_config):
+    # What generate_qr did before: draw box by box into an RGB image
+    img = PilImage(
+        qr_config["border"], matrix.size, qr_config["box_size"],
+        qrcode_modules=matrix.modules,
+        fill_color=qr_config["fill_color"],
+        back_color=qr_config["back_color"]
+    )
+    for r, c in matrix.dark_modules():
+        img.drawrect(r, c)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--version", type=int, default=40)
+    parser.add_argument("--box-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Coloured output forces the factory onto its RGB path
+    qr_config = {**DEFAULT_QR_CONFIG, "box_size": args.box_size, "fill_color": "#1a237e"}
+    matrix = encode("benchmark", args.version, qr_config["error_correction"])
+
+    base_ms, base_png = timeit(factory_png, matrix, qr_config, repeat=args.repeat)
+    print(f"version {args.version}, box size {args.box_size}")
+    print(f"{'renderer':<22} {'ms':>9} {'bytes':>10} {'speedup':>8}")
+    print(f"{'PIL factory':<22} {base_ms:>9.1f} {len(base_png):>10} {1:>7.1f}x")
+
+    expected = np.asarray(Image.open(io.BytesIO(base_png)).convert("RGB"))
+    for name, level in PNG_COMPRESSION_LEVELS.items():
+        config = {**qr_config, "png_compress_level": level}
+        ms, png = timeit(render_png, matrix, config, repeat=args.repeat)
+        same = np.array_equal(np.asarray(Image.open(io.BytesIO(png)).convert("RGB")), expected)
+        print(f"{'rasterizer ' + name:<22} {ms:>9.1f} {len(png):>10} {base_ms / ms:>7.1f}x"
+              f"{'' if same else '  (pixels differ!)'}")
+
+
+if __name__ == "__main__":
+    main()
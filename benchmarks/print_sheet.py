@@ -0,0 +1,62 @@
+"""Time and peak memory of tiling many labels onto print sheets.
+
+Encodes --distinct link codes once, then draws --labels of them (cycling
+through the distinct ones) with ``render_sheet`` as a PDF and as one PNG,
+with the PNG canvas in memory and memory-mapped. Each case runs in a fresh
+process so its peak resident set size is its own.
+
+    python benchmarks/print_sheet.py [--labels 10000] [--layout avery-l7160] [--dpi 300]
+"""
+import argparse
+import multiprocessing
+import resource
+import tempfile
+import time
+
+import common  # noqa: F401  (puts the repository root on sys.path)
+
+from qrgen.core import DEFAULT_QR_CONFIG
+from qrgen.encoding import encode_for_config
+from qrgen.sheet import render_sheet
+
+
+def run_case(args, fmt, memmap, results):
+    config = dict(DEFAULT_QR_CONFIG)
+    links = [f"https://example.com/asset/{i:08d}" for i in range(args.distinct)]
+    matrices = [encode_for_config(link, config) for link in links]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    items = ((matrices[i % args.distinct], links[i % args.distinct]) for i in range(args.labels))
+    with tempfile.TemporaryFile() as output:
+        start = time.perf_counter()
+        pages = render_sheet(items, output, args.layout, config, fmt, args.dpi, memmap=memmap)
+        elapsed = time.perf_counter() - start
+        size = output.tell()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((pages, elapsed, size, baseline, peak))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=10_000)
+    parser.add_argument("--distinct", type=int, default=500)
+    parser.add_argument("--layout", default="avery-l7160")
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{args.labels} labels on {args.layout} at {args.dpi} dpi")
+    print(f"{'output':<12} {'pages':>6} {'seconds':>8} {'labels/s':>9} {'MiB out':>8} {'peak MiB':>9}")
+    for name, fmt, memmap in (("pdf", "pdf", False), ("png", "png", False), ("png memmap", "png", True)):
+        results = context.Queue()
+        process = context.Process(target=run_case, args=(args, fmt, memmap, results))
+        process.start()
+        pages, elapsed, size, baseline, peak = results.get()
+        process.join()
+        # ru_maxrss is in KiB on Linux; the peak is reported above the
+        # process's footprint after imports and encoding
+        print(f"{name:<12} {pages:>6} {elapsed:>8.2f} {args.labels / elapsed:>9.0f} "
+              f"{size / 2 ** 20:>8.1f} {(peak - baseline) / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Cost of re-styling a code through ``LayeredCache`` versus generating it from scratch.
+
+For each version the cache is warmed with one style, then timed for a
+colour change (palette swap and SVG attribute edit), a size change
+(rasterising the cached matrix) and a change of both. Every restyled
+result is checked against ``generate_qr``.
+
+    python benchmarks/restyle.py [--repeat N]
+"""
+import argparse
+import itertools
+
+from common import payload_for_version, timeit
+
+from qrgen.cache import LayeredCache
+from qrgen.core import DEFAULT_QR_CONFIG, generate_qr
+
+VERSIONS = (1, 10, 25, 40)
+COLORS = itertools.cycle([("#1a237e", "#fffde7"), ("#b71c1c", "#ffffff"), ("#000000", "#e0f2f1")])
+BOX_SIZES = itertools.cycle([6, 8, 12, 16])
+
+
+def restyled(base, recolor, resize):
+    config = dict(base)
+    if recolor:
+        config["fill_color"], config["back_color"] = next(COLORS)
+    if resize:
+        config["box_size"] = next(BOX_SIZES)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'version':>7} {'generate ms':>12} {'recolor ms':>11} {'resize ms':>10} {'both ms':>8}  identical")
+    for version in VERSIONS:
+        base = {**DEFAULT_QR_CONFIG, "version": version}
+        data = payload_for_version(version, base["error_correction"])
+        full = timeit(generate_qr, data, base, repeat=args.repeat)[0]
+
+        timings, identical = [], True
+        for recolor, resize in ((True, False), (False, True), (True, True)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                cache = LayeredCache()
+                cache.generate(data, base)
+                config = restyled(base, recolor, resize)
+                ms, assets = timeit(cache.generate, data, config, repeat=1)
+                best = min(best, ms)
+                identical = identical and assets == generate_qr(data, config)
+            timings.append(best)
+        print(f"{version:>7} {full:>12.2f} {timings[0]:>11.2f} {timings[1]:>10.2f} {timings[2]:>8.2f}  {identical}")
+
+
+if __name__ == "__main__":
+    main()
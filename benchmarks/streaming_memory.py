@@ -0,0 +1,68 @@
+"""Check that streaming batch export keeps parent-process memory flat as the batch grows.
+
+Runs ``run_batch`` over synthetic rows at increasing batch sizes, writing
+to a temporary archive, and records the peak traced memory of the calling
+process. Exits with status 1 when the largest batch peaks more than
+``--threshold`` (a fraction) above the smallest one.
+
+    python benchmarks/streaming_memory.py [--sizes 500,2000,8000] [--archive zip|tar]
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import common  # noqa: F401  (puts the repository root on sys.path)
+
+from qrgen.batch import BatchRow, run_batch
+
+
+def synthetic_rows(count):
+    for index in range(1, count + 1):
+        yield BatchRow(index, "Link", {"link": f"https://example.com/tickets/{index:08d}"})
+
+
+def peak_memory_kib(count, archive, workers):
+    with tempfile.TemporaryFile() as output:
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            report = run_batch(synthetic_rows(count), output, archive=archive, workers=workers)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+        size = output.tell()
+    return peak, elapsed, size, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="500,2000,8000", help="comma-separated batch sizes")
+    parser.add_argument("--archive", choices=["zip", "tar"], default="zip")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed peak growth from the smallest to the largest batch")
+    args = parser.parse_args()
+
+    # Forked workers would inherit tracemalloc and render several times slower
+    multiprocessing.set_start_method("spawn")
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    print(f"{'rows':>7} {'peak KiB':>9} {'archive MiB':>12} {'codes/sec':>10}")
+    peaks = []
+    for count in sizes:
+        peak, elapsed, size, report = peak_memory_kib(count, args.archive, args.workers)
+        peaks.append(peak)
+        print(f"{count:>7} {peak:>9.0f} {size / 2**20:>12.1f} {report.generated / elapsed:>10.0f}")
+
+    growth = peaks[-1] / peaks[0] - 1
+    flat = growth <= args.threshold
+    print(f"peak growth {growth:+.0%} over {sizes[-1] // sizes[0]}x more rows: {'flat' if flat else 'NOT flat'}")
+    return 0 if flat else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""One large symbol versus Structured Append parts for long payloads.
+
+For iCalendar-like text of growing length, times encoding and rendering a
+single code (while one still fits) and splitting the payload into linked
+codes with ``render_structured``, both serially and on a process pool,
+and shows the largest version each way. ``--max-symbols`` trades fewer
+codes for larger ones.
+
+    python benchmarks/structured_append.py [--max-symbols 16] [--workers N] [--repeat N]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from common import timeit
+
+from qrgen.core import DEFAULT_QR_CONFIG, CapacityError, generate_qr
+from qrgen.encoding import encode_for_config
+from qrgen.structured import render_structured
+
+SIZES = (500, 1000, 2000, 2300, 3000, 4000)
+
+
+def payload(size):
+    lines = ["BEGIN:VCALENDAR", "BEGIN:VEVENT", "SUMMARY:Quarterly planning"]
+    number = 0
+    while sum(len(line) + 1 for line in lines) < size:
+        number += 1
+        lines.append(f"DESCRIPTION:Agenda item {number}: review the roadmap and owners")
+    return "\n".join(lines)[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-symbols", type=int, default=16)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    config = dict(DEFAULT_QR_CONFIG)
+    print(f"{'bytes':>6} {'single v':>9} {'ms':>7}   {'parts':>5} {'largest v':>9} {'serial ms':>10} {'pool ms':>8}")
+    with ProcessPoolExecutor(args.workers) as pool:
+        render_structured(payload(100), config, executor=pool)  # start the workers
+        for size in SIZES:
+            data = payload(size)
+            try:
+                single_ms = timeit(generate_qr, data, config, repeat=args.repeat)[0]
+                single = f"{encode_for_config(data, config).version:>9} {single_ms:>7.1f}"
+            except CapacityError:
+                single = f"{'too long':>9} {'-':>7}"
+            serial_ms, parts = timeit(render_structured, data, config, ("png", "svg"), args.max_symbols,
+                                      repeat=args.repeat)
+            pool_ms = timeit(render_structured, data, config, ("png", "svg"), args.max_symbols, pool,
+                             repeat=args.repeat)[0]
+            largest = max(matrix.version for matrix, _, _ in parts)
+            print(f"{size:>6} {single}   {len(parts):>5} {largest:>9} {serial_ms:>10.1f} {pool_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Benchmark suite for formatting, validation and generation, with baseline comparison.
+
+Covers ``format_qr_data``/``validate_inputs`` for every category and
+``generate_qr`` split into its stages (encode, PNG, SVG) across versions,
+error-correction levels and box sizes. Each generation case also records
+peak traced memory and output sizes.
+
+    python benchmarks/suite.py                              # quick grid, print only
+    python benchmarks/suite.py --full --save results.json   # every version and box size
+    python benchmarks/suite.py --compare results.json --threshold 0.15
+
+``--compare`` exits with status 1 when any timing, memory or size metric
+is worse than the baseline by more than ``--threshold`` (a fraction).
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from common import payload_for_version, timeit
+
+from qrgen.core import (
+    CATEGORIES,
+    DEFAULT_QR_CONFIG,
+    ERROR_CORRECT_LEVELS,
+    format_qr_data,
+    generate_qr,
+    validate_inputs,
+)
+from qrgen.encoding import encode_for_config
+from qrgen.render import render_png, render_svg
+
+# One representative, valid input set per category
+SAMPLE_INPUTS = {
+    "Number": {"number": "1234567890"},
+    "WiFi Password": {"wifi_ssid": "Office-5G", "wifi_password": "correct horse battery", "wifi_encryption": "WPA2"},
+    "Link": {"link": "https://example.com/tickets/2025/ABCDEF123456"},
+    "WhatsApp": {"whatsapp_number": "+1 555-010-0199"},
+    "Text": {"text": "Asset tag 0042 - property of the events team"},
+    "Email": {"email": "events@example.com", "email_subject": "Ticket 42", "email_body": "See you there"},
+    "Phone": {"phone_number": "+1 555 010 0199"},
+    "SMS": {"sms_number": "+15550100199", "sms_message": "Reply YES to confirm"},
+    "Location": {"manual_location": "123 Main St, Springfield"},
+    "Event": {
+        "event_title": "Launch party", "event_start": "2025-06-01T18:00", "event_end": "2025-06-01T22:00",
+        "event_location": "Hall B", "event_description": "Drinks and demos",
+    },
+    "Social Media": {"social_platform": "instagram", "social_username": "example"},
+    "vCard": {"vcard_name": "Ada Lovelace", "vcard_phone": "+441234567890", "vcard_email": "ada@example.com"},
+    "Cryptocurrency": {"crypto_type": "bitcoin", "crypto_address": "1BoatSLRHtKNngkdXEeobR76b53LETtpyT"},
+    "2D Barcode": {"barcode_text": "SKU-000123-XL"},
+}
+
+QUICK_VERSIONS = (1, 5, 10, 20, 30, 40)
+QUICK_BOX_SIZES = (5, 10, 20)
+
+# Metrics compared against the baseline; all are "lower is better"
+COMPARED_METRICS = ("ms", "encode_ms", "png_ms", "svg_ms", "peak_kib", "png_bytes", "svg_bytes")
+
+
+def bench_payloads(repeat, loops):
+    results = {}
+    for category in CATEGORIES:
+        inputs = SAMPLE_INPUTS[category]
+
+        def validate():
+            for _ in range(loops):
+                validate_inputs(category, inputs)
+
+        def format_():
+            for _ in range(loops):
+                format_qr_data(category, inputs)
+
+        results[f"validate/{category}"] = {"ms": timeit(validate, repeat=repeat)[0] / loops}
+        results[f"format/{category}"] = {"ms": timeit(format_, repeat=repeat)[0] / loops}
+    return results
+
+
+def peak_memory_kib(data, qr_config):
+    tracemalloc.start()
+    try:
+        generate_qr(data, qr_config)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_generate(versions, levels, box_sizes, repeat):
+    results = {}
+    for version in versions:
+        for level_name in levels:
+            level = ERROR_CORRECT_LEVELS[level_name]
+            data = payload_for_version(version, level)
+            qr_config = {**DEFAULT_QR_CONFIG, "version": version, "error_correction": level}
+            encode_ms, matrix = timeit(encode_for_config, data, qr_config, repeat=repeat)
+            for box_size in box_sizes:
+                config = {**qr_config, "box_size": box_size}
+                png_ms, png = timeit(render_png, matrix, config, repeat=repeat)
+                svg_ms, svg = timeit(render_svg, matrix, config, repeat=repeat)
+                results[f"generate/v{version}/{level_name}/box{box_size}"] = {
+                    "encode_ms": encode_ms,
+                    "png_ms": png_ms,
+                    "svg_ms": svg_ms,
+                    "ms": encode_ms + png_ms + svg_ms,
+                    "peak_kib": peak_memory_kib(data, config),
+                    "png_bytes": len(png),
+                    "svg_bytes": len(svg),
+                }
+            print(f"  v{version:<2} {level_name:<7} encode {encode_ms:8.2f} ms", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for case, metrics in results.items():
+        previous = baseline.get(case)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in metrics or not previous.get(metric):
+                continue
+            change = metrics[metric] / previous[metric] - 1
+            if change > threshold:
+                regressions.append((case, metric, previous[metric], metrics[metric], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="versions 1-40 and box sizes 5-20")
+    parser.add_argument("--levels", default=",".join(ERROR_CORRECT_LEVELS),
+                        help="comma-separated error-correction levels")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--loops", type=int, default=1000, help="calls per payload timing")
+    parser.add_argument("--save", metavar="PATH", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown/growth before a metric counts as a regression")
+    args = parser.parse_args()
+
+    versions = range(1, 41) if args.full else QUICK_VERSIONS
+    box_sizes = range(5, 21) if args.full else QUICK_BOX_SIZES
+    levels = [name.strip() for name in args.levels.split(",") if name.strip()]
+
+    start = time.perf_counter()
+    results = bench_payloads(args.repeat, args.loops)
+    results.update(bench_generate(versions, levels, box_sizes, args.repeat))
+
+    for case, metrics in results.items():
+        print(case, " ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in metrics.items()))
+    print(f"{len(results)} cases in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                         "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+                "results": results,
+            }, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for case, metric, before, after, change in regressions:
+            print(f"REGRESSION {case} {metric}: {before:.3f} -> {after:.3f} (+{change:.0%})")
+        print(f"{len(regressions)} regressions over {args.threshold:.0%} against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""SVG size and render time: qrcode's SvgPathImage factory versus ``write_svg``.
+
+For a full payload of each version 1-40, renders the symbol with the
+factory the SVG renderer used before (one ``M..z`` segment per module, in
+qrcode's millimetre units) and with ``render_svg`` (rectangles merged from
+runs of modules, relative integer moves), and compares the bytes, the
+gzipped bytes as served, and the time. Each new path is also decoded back
+onto the module grid to check it covers exactly the dark modules.
+
+    python benchmarks/svg_writer.py [--repeat N]
+"""
+import argparse
+import gzip
+import io
+import re
+
+from common import payload_for_version, timeit
+
+import numpy as np
+import qrcode.image.svg
+
+from qrgen.core import DEFAULT_QR_CONFIG
+from qrgen.encoding import encode_for_config
+from qrgen.render import render_svg
+
+_COMMAND = re.compile(r"m(-?\d+) (-?\d+)h(\d+)v(\d+)h-\d+z")
+
+
+def factory_svg(matrix, qr_config):
+    image = qrcode.image.svg.SvgPathImage(qr_config["border"], matrix.size, 10, qrcode_modules=matrix.modules)
+    for r, c in matrix.dark_modules():
+        image.module_drawer.drawrect(image.pixel_box(r, c), True)
+    image.process()
+    buffer = io.BytesIO()
+    image.save(buffer)
+    return buffer.getvalue()
+
+
+def decode_path(svg_bytes, size, border):
+    path = re.search(rb' d="([^"]*)"', svg_bytes).group(1).decode("ascii")
+    grid = np.zeros((size + 2 * border,) * 2, dtype=np.int32)
+    x = y = 0
+    for dx, dy, width, height in _COMMAND.findall(path):
+        x, y = x + int(dx), y + int(dy)
+        grid[y:y + int(height), x:x + int(width)] += 1
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    config = dict(DEFAULT_QR_CONFIG)
+    border = config["border"]
+    print(f"{'version':>7} {'factory B':>10} {'gzip':>7} {'ms':>7}   {'writer B':>9} {'gzip':>7} {'ms':>6}"
+          f"   {'size':>5} {'speedup':>7}  exact")
+    for version in range(1, 41):
+        matrix = encode_for_config(payload_for_version(version, config["error_correction"]), config)
+        before_ms, before = timeit(factory_svg, matrix, config, repeat=args.repeat)
+        after_ms, after = timeit(render_svg, matrix, config, repeat=args.repeat)
+        coverage = decode_path(after, matrix.size, border)
+        exact = (coverage.max() == 1
+                 and np.array_equal(coverage[border:-border, border:-border] == 1, matrix.modules))
+        print(f"{version:>7} {len(before):>10} {len(gzip.compress(before)):>7} {before_ms:>7.2f}   "
+              f"{len(after):>9} {len(gzip.compress(after)):>7} {after_ms:>6.2f}   "
+              f"{len(after) / len(before):>5.0%} {before_ms / after_ms:>6.1f}x  {exact}")
+
+
+if __name__ == "__main__":
+    main()
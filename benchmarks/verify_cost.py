@@ -0,0 +1,57 @@
+"""Cost of verifying a rendered PNG against its module matrix, next to the cost of producing it.
+
+For a full payload of each version, times ``encode`` plus ``render_png``
+and then ``verify_png`` on the result, and checks that verification passes
+on good images and catches broken ones: low contrast, inverted colours, a
+wrong box size and a flipped module.
+
+    python benchmarks/verify_cost.py [--repeat N] [--box-size 10]
+"""
+import argparse
+
+from common import payload_for_version, timeit
+
+from qrgen.core import DEFAULT_QR_CONFIG
+from qrgen.encoding import ModuleMatrix, encode_for_config
+from qrgen.render import render
+from qrgen.verify import verify_png
+
+VERSIONS = (1, 5, 10, 20, 30, 40)
+
+
+def generate(data, config):
+    matrix = encode_for_config(data, config)
+    return render(matrix, config, "png"), matrix
+
+
+def broken_cases(config, png_bytes, matrix):
+    modules = matrix.modules.copy()
+    modules[matrix.size // 2, matrix.size // 2] ^= True
+    flipped = ModuleMatrix(matrix.version, matrix.error_correction, modules)
+    yield "low contrast", png_bytes, matrix, {**config, "fill_color": "#bbbbbb"}
+    yield "inverted", png_bytes, matrix, {**config, "fill_color": "#ffffff", "back_color": "#000000"}
+    yield "wrong box size", png_bytes, matrix, {**config, "box_size": config["box_size"] + 1}
+    yield "flipped module", png_bytes, flipped, config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--box-size", type=int, default=DEFAULT_QR_CONFIG["box_size"])
+    args = parser.parse_args()
+
+    config = {**DEFAULT_QR_CONFIG, "box_size": args.box_size}
+    print(f"{'version':>7} {'generate ms':>12} {'verify ms':>10} {'overhead':>9}  passes")
+    for version in VERSIONS:
+        data = payload_for_version(version, config["error_correction"])
+        generated, (png_bytes, matrix) = timeit(generate, data, config, repeat=args.repeat)
+        verified, problem = timeit(verify_png, png_bytes, matrix, config, repeat=args.repeat)
+        print(f"{version:>7} {generated:>12.2f} {verified:>10.2f} {verified / generated:>8.0%}  {problem is None}")
+
+    print()
+    for name, png_bytes, expected, case_config in broken_cases(config, png_bytes, matrix):
+        print(f"{name:<15} {verify_png(png_bytes, expected, case_config)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""QR code generation core used by the Streamlit app and the command line.
+
+Formatting, validation and settings are imported eagerly because they are
+cheap. The encoder, renderers and verifier depend on qrcode and NumPy and are
+loaded on first attribute access.
+"""
+from qrgen.core import (
+    CATEGORIES,
+    CapacityError,
+    DEFAULT_QR_CONFIG,
+    ERROR_CORRECT_LEVELS,
+    MAX_BORDER,
+    MAX_BOX_SIZE,
+    PNG_COMPRESSION_LEVELS,
+    format_column,
+    format_qr_data,
+    generate_qr,
+    validate_column,
+    validate_inputs,
+)
+from qrgen.categories import Category, Check, Field, register_category
+
+_LAZY_ATTRIBUTES = {
+    "ModuleMatrix": "qrgen.encoding",
+    "encode": "qrgen.encoding",
+    "RENDERERS": "qrgen.render",
+    "render": "qrgen.render",
+    "check_colors": "qrgen.verify",
+    "verify_png": "qrgen.verify",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'qrgen' has no attribute {name!r}")
+    import importlib
+    return getattr(importlib.import_module(module_name), name)
@@ -0,0 +1,3 @@
+from qrgen.cli import main
+
+raise SystemExit(main())
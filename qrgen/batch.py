@@ -0,0 +1,566 @@
+"""Headless batch generation: CSV/JSONL rows in, ZIP (or tar) of images out.
+
+Rows are validated and formatted in the calling process with the same
+category registry the form uses, a block of rows and one column per field
+at a time, then rendered on a process pool. Rows stream from the reader through the pool into the
+archive, so large batches run in constant memory. Failed rows are
+collected into an ``errors.csv`` report inside the archive instead of
+aborting the run. With ``verify`` every PNG is also read back and checked
+against its module matrix (see ``qrgen.verify``) before it is written. Rows
+whose payload repeats a recent row's are not rendered again; the earlier
+row's images are written under their file name too. ``run_sheet`` takes the same rows to a print sheet
+instead of an archive.
+"""
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import tee
+
+from qrgen.archive import open_archive
+from qrgen.categories import get_category
+from qrgen.core import DEFAULT_QR_CONFIG
+
+FORMATS = ("png", "svg")
+
+# Chunks queued per worker before reading more rows
+PREFETCH = 2
+# Rows validated and formatted together, column by column
+PREPARE_ROWS = 512
+# Seconds between progress callbacks
+PROGRESS_INTERVAL = 0.25
+# Row errors kept on the report; every error is written to errors.csv
+MAX_REPORTED_ERRORS = 1000
+# Recent distinct payloads remembered to spot rows repeating them
+DEDUP_PAYLOADS = 1024
+# Bytes of images (or matrices) kept for payloads that repeat
+DEDUP_BYTES = 16 * 1024 * 1024
+
+# Columns that describe the row rather than being input fields
+_META_COLUMNS = {"category", "filename", "inputs"}
+
+
+class BatchRow:
+    __slots__ = ("index", "category", "inputs", "filename", "error")
+
+    def __init__(self, index, category, inputs, filename=None, error=None):
+        self.index = index
+        self.category = category
+        self.inputs = inputs
+        self.filename = filename
+        # Set when the row could not be read; it is reported, not rendered
+        self.error = error
+
+
+class BatchReport:
+    def __init__(self, expected=None):
+        self.expected = expected
+        self.total = 0
+        self.processed = 0
+        self.generated = 0
+        self.failed = 0
+        self.unreadable = 0
+        self.unique = 0
+        self.duplicates = 0
+        # Worker CPU seconds spent on the unique payloads
+        self.unique_seconds = 0.0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def add_error(self, index, category, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((index, category, error))
+
+    def add_unreadable(self, index, category, problem, rejected):
+        """Record a code that failed verification; rejected ones also count as failed.
+
+        Returns the message for the error report.
+        """
+        self.unreadable += 1
+        if rejected:
+            error = f"Failed verification: {problem}"
+            self.add_error(index, category, error)
+            return error
+        error = f"Written, but failed verification: {problem}"
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((index, category, error))
+        return error
+
+    @property
+    def codes_per_sec(self):
+        if not self.elapsed:
+            return 0.0
+        return self.generated / self.elapsed
+
+    @property
+    def dedup_ratio(self):
+        """Valid rows per payload rendered; 1.0 when no row repeated another."""
+        if not self.unique:
+            return 1.0
+        return (self.unique + self.duplicates) / self.unique
+
+    @property
+    def saved(self):
+        """Estimated CPU seconds the duplicates would have taken, at the mean per unique payload."""
+        if not self.unique:
+            return 0.0
+        return self.duplicates * self.unique_seconds / self.unique
+
+    @property
+    def fraction(self):
+        """Share of ``expected`` rows processed, or ``None`` when the row count is unknown."""
+        if not self.expected:
+            return None
+        return min(self.processed / self.expected, 1.0)
+
+    @property
+    def eta(self):
+        """Estimated seconds left, or ``None`` before the first rows finish."""
+        if not self.expected or not self.processed:
+            return None
+        return max(self.expected - self.processed, 0) * self.elapsed / self.processed
+
+    def summary(self):
+        return (
+            f"{self.generated}/{self.total} codes in {self.elapsed:.2f}s "
+            f"({self.codes_per_sec:.1f} codes/sec), {self.failed} errors"
+            + (f", {self.unreadable} failed verification" if self.unreadable else "")
+            + (f", {self.duplicates} repeated payloads ({self.dedup_ratio:.2f}x dedup, "
+               f"~{self.saved:.2f}s saved)" if self.duplicates else "")
+        )
+
+
+def _row_from_record(index, record):
+    if not isinstance(record, dict):
+        return BatchRow(index, "", {}, error="Row is not an object")
+    record = {k: v for k, v in record.items() if k is not None}
+    inputs = record.get("inputs")
+    if not isinstance(inputs, dict):
+        inputs = {k: v for k, v in record.items() if k not in _META_COLUMNS}
+    return BatchRow(
+        index,
+        str(record.get("category") or "").strip(),
+        {str(k): "" if v is None else str(v) for k, v in inputs.items()},
+        str(record.get("filename") or "").strip() or None,
+    )
+
+
+def read_rows(source, fmt=None):
+    """Yield ``BatchRow`` objects from a CSV or JSONL file path or text stream.
+
+    ``fmt`` is ``"csv"`` or ``"jsonl"``; when omitted it is taken from the
+    file extension. JSONL records may either carry an ``inputs`` object or
+    list the input fields next to ``category``. Files are read as UTF-8,
+    skipping the byte order mark spreadsheet programs put in front.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if fmt is None:
+            fmt = "jsonl" if str(source).lower().endswith((".jsonl", ".ndjson")) else "csv"
+        with open(source, newline="", encoding="utf-8-sig") as stream:
+            yield from read_rows(stream, fmt)
+        return
+
+    if fmt == "jsonl":
+        for index, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield BatchRow(index, "", {}, error=f"Invalid JSON: {e}")
+                continue
+            yield _row_from_record(index, record)
+    else:
+        for index, record in enumerate(csv.DictReader(source), start=1):
+            yield _row_from_record(index, record)
+
+
+def count_rows(source, fmt=None):
+    """Number of rows ``read_rows`` yields for ``source``, read without keeping them."""
+    return sum(1 for _ in read_rows(source, fmt))
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_") or "qr_code"
+
+
+# Names _file_name makes from row numbers
+_NUMBERED_NAME = re.compile(r"(\d{5,})_[a-z0-9_]+")
+
+
+def _file_name(row, taken):
+    # Archive member name for the row's files, without the extension: the
+    # filename column with path separators and other unsafe characters
+    # replaced, or one made from the row number. ``taken`` holds the
+    # filename-column names used so far; numbered names are unique by row,
+    # so a filename shaped like an earlier row's numbered name is renamed
+    # too. A taken name gets the row number appended
+    name = re.sub(r"[^\w.-]+", "_", row.filename or "").strip("._")
+    if not name:
+        name = f"{row.index:05d}_{_slug(row.category)}"
+        explicit = False
+    else:
+        numbered = _NUMBERED_NAME.fullmatch(name)
+        explicit = True
+        if numbered and int(numbered.group(1)) < row.index:
+            name = f"{name}_{row.index}"
+    unique, suffix = name, 1
+    while unique in taken:
+        unique = f"{name}_{row.index}" if suffix == 1 else f"{name}_{row.index}_{suffix}"
+        suffix += 1
+    if explicit or unique != name:
+        taken.add(unique)
+    return unique
+
+
+def _render_chunk(qr_config, formats, verify, jobs):
+    # Runs in a worker: render a chunk of rows, passing through rows that
+    # already failed validation so results come back in row order. With
+    # ``verify`` the PNG is read back and any problem is returned alongside,
+    # as is the CPU time each row took
+    from qrgen.encoding import encode_for_config
+    from qrgen.render import render
+    from qrgen.verify import verify_png
+
+    results = []
+    for index, category, name, data, error in jobs:
+        images, problem = None, None
+        start = time.process_time()
+        if not error:
+            try:
+                matrix = encode_for_config(data, qr_config)
+                rendered = {fmt: render(matrix, qr_config, fmt) for fmt in formats}
+                images = list(rendered.items())
+                if verify:
+                    png_bytes = rendered.get("png") or render(matrix, qr_config, "png")
+                    problem = verify_png(png_bytes, matrix, qr_config)
+            except Exception as e:
+                error = str(e)
+        results.append((index, category, name, images, error, problem, time.process_time() - start))
+    return results
+
+
+def _prepare(rows, report):
+    # Validate and format PREPARE_ROWS rows at a time, one column pass per
+    # category instead of a registry lookup per row
+    taken = set()
+    for block in _chunks(rows, PREPARE_ROWS):
+        report.total += len(block)
+        prepared = [None] * len(block)
+        groups = {}
+        for position, row in enumerate(block):
+            if row.error:
+                prepared[position] = (None, row.error)
+            else:
+                groups.setdefault(row.category, []).append(position)
+        for category, positions in groups.items():
+            spec = get_category(category)
+            if spec is None:
+                payloads, errors = [None] * len(positions), [None] * len(positions)
+            else:
+                columns = spec.columns([block[position].inputs for position in positions])
+                payloads, errors = spec.prepare_column(columns, len(positions))
+            for position, data, error in zip(positions, payloads, errors):
+                prepared[position] = (data, error)
+
+        for row, (data, error) in zip(block, prepared):
+            if not error and not data:
+                error = "Unknown category or empty input"
+            yield row.index, row.category, _file_name(row, taken), data, error
+
+
+def _result_bytes(result):
+    # Size of what a kept result holds: a row's images or its module matrix
+    output = result[3]
+    if output is None:
+        return 0
+    if isinstance(output, list):
+        return sum(len(image) for _, image in output)
+    return output.modules.nbytes
+
+
+class _Repeats:
+    """Which rows repeat an earlier payload, and the results to copy to them.
+
+    ``plan`` sees each valid row as it is read, ahead of the chunks in
+    flight; ``take`` sees it when its result comes back, in the same
+    order. Only payloads seen more than once keep their result, least
+    recently used first out over ``max_bytes``, except while a planned
+    repeat still needs it. A payload seen again after its result was
+    dropped (or was never kept) is rendered again and kept this time.
+    Recent payloads are remembered by ``hash`` only, up to
+    ``DEDUP_PAYLOADS`` of them, so rows that never repeat cost a few bytes.
+    """
+
+    def __init__(self, max_bytes=DEDUP_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._seen = OrderedDict()
+        # payload -> [result, repeats planned but not taken, keep]; in flight or kept
+        self._entries = {}
+        self._kept = OrderedDict()
+
+    def plan(self, data):
+        """Whether the row with ``data`` can take an earlier row's result."""
+        entry = self._entries.get(data)
+        if entry is not None:
+            entry[1] += 1
+            entry[2] = True
+            return True
+        key = hash(data)
+        repeated = key in self._seen
+        if repeated:
+            self._seen.move_to_end(key)
+        else:
+            self._seen[key] = None
+            if len(self._seen) > DEDUP_PAYLOADS:
+                self._seen.popitem(last=False)
+        self._entries[data] = [None, 0, repeated]
+        return False
+
+    def take(self, data, result=None):
+        """Record a rendered row's ``result``, or return the result for a repeat (``result`` None)."""
+        entry = self._entries[data]
+        if result is None:
+            entry[1] -= 1
+            self._kept.move_to_end(data)
+            return entry[0]
+        if not entry[2]:
+            del self._entries[data]
+            return result
+        entry[0] = result
+        self._kept[data] = size = _result_bytes(result)
+        self.nbytes += size
+        for old in list(self._kept):
+            if self.nbytes <= self.max_bytes:
+                break
+            if self._entries[old][1] == 0:
+                self.nbytes -= self._kept.pop(old)
+                del self._entries[old]
+        return result
+
+
+def _map_deduplicated(pool, func, jobs, chunksize, limit, report, deduplicate=True):
+    # Like _map_bounded over chunks of ``jobs``, but yields each chunk's
+    # ``(job, result)`` pairs. With ``deduplicate`` a row repeating an
+    # earlier payload is not sent to the pool and gets that row's result,
+    # see _Repeats; a result's last field is the CPU seconds the row took.
+    # The settings are the same for every row, so equal payloads make
+    # equal codes
+    repeats = _Repeats()
+    planned = (
+        (job, deduplicate and not job[4] and repeats.plan(job[3]))
+        for job in jobs
+    )
+    planned, chunks = tee(_chunks(planned, chunksize))
+    leaders = ([job for job, repeat in chunk if not repeat] for chunk in chunks)
+    for chunk, results in zip(planned, _map_bounded(pool, func, leaders, limit)):
+        results = iter(results)
+        pairs = []
+        for job, repeat in chunk:
+            if repeat:
+                result = repeats.take(job[3])
+                report.duplicates += 1
+            else:
+                result = next(results)
+                if deduplicate and not job[4]:
+                    repeats.take(job[3], result)
+                    report.unique += 1
+                    report.unique_seconds += result[-1]
+            pairs.append((job, result))
+        yield pairs
+
+
+def _encode_chunk(qr_config, jobs):
+    # Runs in a worker: like _render_chunk, but stops at the module matrix
+    from qrgen.encoding import encode_for_config
+
+    results = []
+    for index, category, caption, data, error in jobs:
+        matrix = None
+        start = time.process_time()
+        if not error:
+            try:
+                matrix = encode_for_config(data, qr_config)
+            except Exception as e:
+                error = str(e)
+        results.append((index, category, caption, matrix, error, time.process_time() - start))
+    return results
+
+
+def _chunks(jobs, size):
+    chunk = []
+    for job in jobs:
+        chunk.append(job)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _map_bounded(pool, func, chunks, limit):
+    # Results of func(chunk) in order, with at most ``limit`` chunks
+    # submitted ahead so rows are only read as fast as they are consumed
+    in_flight = deque()
+    for chunk in chunks:
+        if len(in_flight) >= limit:
+            yield in_flight.popleft().result()
+        in_flight.append(pool.submit(func, chunk))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def _pool(executor, workers):
+    # The caller's executor, left running, or a pool of our own
+    if executor is not None:
+        return nullcontext(executor)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def run_batch(rows, output, qr_config=None, formats=FORMATS, workers=None,
+              chunksize=16, archive=None, expected=None, progress=None,
+              verify=False, reject_unreadable=False, deduplicate=True, executor=None):
+    """Render ``rows`` into an archive streamed to ``output``.
+
+    ``output`` is a path or a binary file object; ``archive`` is ``"zip"``
+    (the default) or ``"tar"``, see ``qrgen.archive``. Rows are read
+    lazily and at most ``PREFETCH`` chunks of ``chunksize`` rows per worker
+    are in flight, so each rendered image is written out and dropped
+    before more rows are read and memory stays flat however many rows
+    there are.
+
+    ``progress`` is called with the ``BatchReport`` at most every
+    ``PROGRESS_INTERVAL`` seconds and once at the end; pass ``expected``
+    (e.g. from ``count_rows``) to get a ``fraction`` and ``eta``. Returns the
+    ``BatchReport``.
+
+    ``verify`` reads every PNG back onto its module grid and counts the
+    codes that do not match or lack contrast in ``unreadable``; they are
+    listed in ``errors.csv`` and still written, unless ``reject_unreadable``
+    (which implies ``verify``) leaves them out as failed rows.
+
+    With ``deduplicate`` a row whose payload equals one of the last
+    ``DEDUP_PAYLOADS`` distinct payloads is not sent to the pool while
+    the earlier row's images are still kept (up to ``DEDUP_BYTES`` of
+    them, for payloads that repeat); its images, error or verification
+    problem are used under the row's own name. The report counts these ``duplicates`` and estimates
+    the render time they ``saved``.
+
+    ``executor`` is a ``concurrent.futures``-style executor to render on,
+    such as a ``RenderExecutor.reserve`` reservation, instead of a new
+    pool of ``workers`` processes.
+    """
+    qr_config = {**DEFAULT_QR_CONFIG, **(qr_config or {})}
+    formats = [f for f in FORMATS if f in formats]
+    workers = workers or os.cpu_count()
+    report = BatchReport(expected)
+    start = time.perf_counter()
+    last_progress = 0.0
+
+    with open_archive(output, archive) as sink, \
+            tempfile.TemporaryFile() as errors_file, \
+            _pool(executor, workers) as pool:
+        errors_text = io.TextIOWrapper(errors_file, encoding="utf-8", newline="")
+        errors_csv = csv.writer(errors_text)
+        errors_csv.writerow(["row", "category", "error"])
+
+        render_chunk = partial(_render_chunk, qr_config, formats, verify or reject_unreadable)
+        chunks = _map_deduplicated(pool, render_chunk, _prepare(rows, report), chunksize,
+                                   workers * PREFETCH, report, deduplicate)
+        for pairs in chunks:
+            # A repeated payload's result is its first row's; the name is the row's own
+            for (index, category, name, _, _), (_, _, _, images, error, problem, _) in pairs:
+                report.processed += 1
+                if problem:
+                    error = report.add_unreadable(index, category, problem, reject_unreadable)
+                    errors_csv.writerow([index, category, error])
+                    if reject_unreadable:
+                        continue
+                elif error:
+                    report.add_error(index, category, error)
+                    errors_csv.writerow([index, category, error])
+                    continue
+                for fmt, image in images:
+                    sink.add(f"{name}.{fmt}", image, compress=fmt == "svg")
+                report.generated += 1
+            report.elapsed = time.perf_counter() - start
+            if progress and report.elapsed - last_progress >= PROGRESS_INTERVAL:
+                last_progress = report.elapsed
+                progress(report)
+
+        errors_text.flush()
+        errors_file.seek(0)
+        sink.add_file("errors.csv", errors_file, compress=True)
+        errors_text.detach()
+
+    report.elapsed = time.perf_counter() - start
+    if progress:
+        progress(report)
+    return report
+
+
+def run_sheet(rows, output, layout="a4-3x4", qr_config=None, fmt=None, dpi=None, caption="data",
+              workers=None, chunksize=64, memmap=None, expected=None, progress=None, deduplicate=True,
+              executor=None):
+    """Tile the codes for ``rows`` onto print sheets, see ``qrgen.sheet.render_sheet``.
+
+    Rows are validated like in ``run_batch`` and encoded to module
+    matrices on a process pool; the sheet is drawn in this process.
+    ``caption`` is ``"data"`` (the encoded text), ``"name"`` (the
+    ``filename`` column or row number) or ``None``. Failed rows are left
+    out of the sheet and recorded on the returned ``BatchReport``. Rows
+    repeating a payload share its matrix, as in ``run_batch``, and
+    ``executor`` replaces the pool as there.
+    """
+    from qrgen.sheet import DEFAULT_DPI, max_symbol_size, render_sheet
+
+    qr_config = {**DEFAULT_QR_CONFIG, **(qr_config or {})}
+    dpi = dpi or DEFAULT_DPI
+    limit = max_symbol_size(layout, qr_config["border"], dpi, caption is not None)
+    workers = workers or os.cpu_count()
+    report = BatchReport(expected)
+    start = time.perf_counter()
+
+    def captioned(jobs):
+        for index, category, name, data, error in jobs:
+            text = data if caption == "data" else name if caption == "name" else None
+            yield index, category, text, data, error
+
+    def matrices(pool):
+        last_progress = 0.0
+        encode_chunk = partial(_encode_chunk, qr_config)
+        chunks = _map_deduplicated(pool, encode_chunk, captioned(_prepare(rows, report)), chunksize,
+                                   workers * PREFETCH, report, deduplicate)
+        for pairs in chunks:
+            for (index, category, text, _, _), (_, _, _, matrix, error, _) in pairs:
+                report.processed += 1
+                if not error and matrix.size > limit:
+                    error = f"Version {matrix.version} code is too large for the sheet's cells at {dpi} dpi"
+                if error:
+                    report.add_error(index, category, error)
+                    continue
+                report.generated += 1
+                yield matrix, text
+            report.elapsed = time.perf_counter() - start
+            if progress and report.elapsed - last_progress >= PROGRESS_INTERVAL:
+                last_progress = report.elapsed
+                progress(report)
+
+    with _pool(executor, workers) as pool:
+        render_sheet(matrices(pool), output, layout, qr_config, fmt, dpi,
+                     captions=caption is not None, memmap=memmap)
+
+    report.elapsed = time.perf_counter() - start
+    if progress:
+        progress(report)
+    return report
@@ -0,0 +1,355 @@
+"""Bounded, content-addressed caches for encoded and rendered QR codes.
+
+Entries are keyed by a SHA-256 of the payload and the canonicalised
+``qr_config``. The memory tier evicts least-recently-used entries once a
+byte budget is exceeded; an optional disk tier keeps entries across
+restarts and is pruned oldest-first against its own budget.
+
+``LayeredCache`` splits generation in two layers. Module matrices are
+cached by payload, version and error correction only; rendered images by
+the settings their restyler cannot change (see ``qrgen.render``). A
+change of colours is then a palette swap of a cached image and a change
+of size a rasterisation of a cached matrix, neither of which re-encodes.
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+
+from qrgen.core import DEFAULT_QR_CONFIG
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MATRIX_BYTES = 16 * 1024 * 1024
+# Share of max_disk_bytes the disk tier is pruned down to, so the directory
+# is walked once per tenth of the budget written rather than on every put
+DISK_LOW_WATER = 0.9
+
+_COLOR_KEYS = ("fill_color", "back_color")
+
+# Settings that change the module matrix
+ENCODE_KEYS = ("version", "fixed_version", "error_correction")
+
+
+def canonical_config(qr_config):
+    """Fill in defaults and normalise values that have several spellings."""
+    config = {**DEFAULT_QR_CONFIG, **qr_config}
+    for key in _COLOR_KEYS:
+        config[key] = str(config[key]).lower()
+    return config
+
+
+def _digest(data, config):
+    blob = json.dumps(
+        {"data": data, "config": config},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def render_key(data, qr_config):
+    return _digest(data, canonical_config(qr_config))
+
+
+def encode_key(data, qr_config):
+    config = canonical_config(qr_config)
+    return _digest(data, {key: config[key] for key in ENCODE_KEYS})
+
+
+def geometry_key(data, qr_config, fmt):
+    """Key of a rendered ``fmt`` image that ``qr_config`` can be restyled from."""
+    from qrgen.render import GEOMETRY_KEYS
+
+    config = canonical_config(qr_config)
+    keys = ENCODE_KEYS + GEOMETRY_KEYS[fmt]
+    return f"{_digest(data, {key: config[key] for key in keys})}.{fmt}"
+
+
+def _pack(parts):
+    header = struct.pack(f">I{len(parts)}Q", len(parts), *(len(p) for p in parts))
+    return header + b"".join(parts)
+
+
+def _unpack(blob):
+    (count,) = struct.unpack_from(">I", blob)
+    sizes = struct.unpack_from(f">{count}Q", blob, 4)
+    parts, offset = [], 4 + 8 * count
+    for size in sizes:
+        parts.append(blob[offset:offset + size])
+        offset += size
+    return tuple(parts)
+
+
+class CacheStats:
+    __slots__ = ("hits", "disk_hits", "misses", "evictions", "disk_evictions")
+
+    def __init__(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class RenderCache:
+    """LRU cache of tuples of ``bytes`` (e.g. ``(png_bytes, svg_bytes)``).
+
+    ``max_bytes`` bounds the memory tier. When ``disk_dir`` is given, misses
+    fall back to files under that directory before rendering, and every
+    rendered entry is written there too; ``max_disk_bytes`` bounds it.
+    Safe to share between Streamlit sessions.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self._pruning = False
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return value
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self.stats.disk_hits += 1
+            self._store(key, value)
+        return value
+
+    @staticmethod
+    def _size(value):
+        return sum(len(part) for part in value)
+
+    @staticmethod
+    def _coerce(value):
+        return tuple(value)
+
+    def put(self, key, value):
+        value = self._coerce(value)
+        with self._lock:
+            self._store(key, value)
+        self._disk_put(key, value)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = self._coerce(compute())
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _store(self, key, value):
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= self._size(old)
+        self._entries[key] = value
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= self._size(evicted)
+            self.stats.evictions += 1
+
+    # Disk tier
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".bin")
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".bin"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = _unpack(f.read())
+        except (OSError, struct.error):
+            return None
+        # Touch so pruning keeps recently used files
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        blob = _pack(value)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            return
+        with self._lock:
+            self._disk_bytes += len(blob)
+            # One thread prunes at a time; the others keep writing meanwhile
+            over = (
+                self.max_disk_bytes is not None
+                and self._disk_bytes > self.max_disk_bytes
+                and not self._pruning
+            )
+            if over:
+                self._pruning = True
+        if over:
+            try:
+                self._prune_disk()
+            finally:
+                with self._lock:
+                    self._pruning = False
+
+    def _prune_disk(self):
+        # Oldest first down to the low-water mark. The walk also picks up
+        # files other processes sharing the directory wrote or removed
+        files = sorted(self._disk_files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * DISK_LOW_WATER
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats.disk_evictions += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    def metrics(self):
+        with self._lock:
+            return {
+                **self.stats.as_dict(),
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+class MatrixCache(RenderCache):
+    """Memory-only LRU cache of ``ModuleMatrix`` objects, bounded by their module bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_MATRIX_BYTES):
+        super().__init__(max_bytes)
+
+    @staticmethod
+    def _size(value):
+        return value.modules.nbytes
+
+    @staticmethod
+    def _coerce(value):
+        return value
+
+
+class LayeredCache:
+    """An encode layer of module matrices under a render layer of restylable images.
+
+    ``render``/``generate`` return the same bytes as rendering from scratch.
+    Safe to share between Streamlit sessions.
+    """
+
+    def __init__(self, renders=None, matrices=None):
+        self.renders = renders if renders is not None else RenderCache()
+        self.matrices = matrices if matrices is not None else MatrixCache()
+
+    @property
+    def disk_dir(self):
+        return self.renders.disk_dir
+
+    def matrix(self, data, qr_config):
+        from qrgen.encoding import encode_for_config
+
+        return self.matrices.get_or_compute(encode_key(data, qr_config), lambda: encode_for_config(data, qr_config))
+
+    def lookup(self, data, qr_config, fmt):
+        """The restyled image if its geometry is cached, else ``None``."""
+        from qrgen.render import restyle
+
+        cached = self.renders.get(geometry_key(data, qr_config, fmt))
+        return None if cached is None else restyle(cached[0], qr_config, fmt)
+
+    def store(self, data, qr_config, fmt, image_bytes, matrix=None):
+        """Add an image rendered elsewhere (e.g. in a worker process) and its matrix."""
+        self.renders.put(geometry_key(data, qr_config, fmt), (image_bytes,))
+        if matrix is not None:
+            self.matrices.put(encode_key(data, qr_config), matrix)
+
+    def render(self, data, qr_config, fmt):
+        from qrgen.render import render, restyle
+
+        qr_config = {**DEFAULT_QR_CONFIG, **qr_config}
+        cached = self.renders.get_or_compute(
+            geometry_key(data, qr_config, fmt),
+            lambda: (render(self.matrix(data, qr_config), qr_config, fmt),)
+        )
+        return restyle(cached[0], qr_config, fmt)
+
+    def generate(self, data, qr_config):
+        """``(png_bytes, svg_bytes)``, like ``generate_qr``."""
+        return self.render(data, qr_config, "png"), self.render(data, qr_config, "svg")
+
+    def clear(self):
+        self.renders.clear()
+        self.matrices.clear()
+
+    def metrics(self):
+        encode = self.matrices.metrics()
+        return {
+            **self.renders.metrics(),
+            "encode_hits": encode["hits"],
+            "encode_misses": encode["misses"],
+            "encode_entries": encode["entries"],
+            "encode_bytes": encode["bytes"],
+        }
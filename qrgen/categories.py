@@ -0,0 +1,321 @@
+"""Registry of QR code categories: their input fields, validators and formatters.
+
+Each ``Category`` declares the input fields it reads, the checks that
+validate them and a ``build`` function that turns the cleaned field values
+into the encoded text. ``validate``/``format`` work on one dict of inputs;
+``validate_column``/``format_column`` take whole columns (a mapping of
+field name to a list or array of values) and return one list of errors or
+payloads, so bulk callers pay the per-category dispatch once per column
+instead of once per row.
+
+New categories are added with ``register_category``; they show up in
+``CATEGORIES`` and are understood by ``format_qr_data``, ``validate_inputs``,
+the batch runner and the HTTP API.
+"""
+import re
+from datetime import datetime
+
+# Name -> Category, in registration order
+REGISTRY = {}
+
+# Category names as shown in the form, kept in step with REGISTRY
+CATEGORIES = []
+
+URL_PATTERN = re.compile(r'^https?://')
+PHONE_PATTERN = re.compile(r'^\+?[\d\s-]+$')
+EMAIL_PATTERN = re.compile(r'^[^@]+@[^@]+\.[^@]+$')
+
+# The text ``datetime.strptime(value, "%Y-%m-%dT%H:%M")`` accepts, without
+# rebuilding the format's regular expression on every call
+_EVENT_TIME = re.compile(
+    r"(\d\d\d\d)-(1[0-2]|0[1-9]|[1-9])-(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])"
+    r"[Tt](2[0-3]|[0-1]\d|\d):([0-5]\d|\d)\Z"
+)
+
+
+def parse_event_time(value):
+    """``datetime`` for a ``YYYY-MM-DDTHH:MM`` string, or ``None`` if it is invalid."""
+    match = _EVENT_TIME.match(value)
+    if match is None:
+        return None
+    try:
+        return datetime(*map(int, match.groups()))
+    except ValueError:
+        # Matches the pattern but is not a real date, e.g. February 30th
+        return None
+
+
+def strip_separators(value):
+    return value.replace(" ", "").replace("-", "")
+
+
+class Field:
+    """One input of a category.
+
+    ``clean`` normalises the raw value before formatting (``None`` keeps it
+    as entered); ``default`` is used when the input is missing.
+    """
+
+    __slots__ = ("name", "label", "default", "clean")
+
+    def __init__(self, name, label=None, default="", clean=str.strip):
+        self.name = name
+        self.label = label or name.replace("_", " ").capitalize()
+        self.default = default
+        self.clean = clean
+
+
+class Check:
+    """A validation rule on the raw value of one field.
+
+    With a ``pattern`` the value must match it; without one it must be
+    non-empty.
+    """
+
+    __slots__ = ("field", "message", "test")
+
+    def __init__(self, field, message, pattern=None, test=None):
+        self.field = field
+        self.message = message
+        if test is None:
+            test = bool if pattern is None else pattern.match
+        self.test = test
+
+
+class Category:
+    """Fields, checks and payload builder of one QR code category.
+
+    ``build`` receives the cleaned values in ``fields`` order and returns the
+    text to encode, or ``""`` when required values are missing.
+    """
+
+    def __init__(self, name, fields, build, checks=()):
+        self.name = name
+        self.fields = tuple(fields)
+        self.build = build
+        self.checks = tuple(checks)
+
+    def validate(self, inputs):
+        """First failing check's message for one row of inputs, or ``None``."""
+        for check in self.checks:
+            if not check.test(inputs.get(check.field, "")):
+                return check.message
+        return None
+
+    def format(self, inputs):
+        values = []
+        for field in self.fields:
+            value = inputs.get(field.name, field.default)
+            values.append(field.clean(value) if field.clean else value)
+        return self.build(*values)
+
+    def _column(self, columns, name, default, size):
+        values = columns.get(name)
+        if values is None:
+            return [default] * size
+        # NumPy string arrays become lists of str; lists are used as they are
+        return values.tolist() if hasattr(values, "tolist") else values
+
+    def validate_column(self, columns, size):
+        """Error message or ``None`` for each of ``size`` rows given as columns."""
+        errors = [None] * size
+        for check in self.checks:
+            passes = map(check.test, self._column(columns, check.field, "", size))
+            message = check.message
+            errors = [
+                message if error is None and not passed else error
+                for error, passed in zip(errors, passes)
+            ]
+        return errors
+
+    def format_column(self, columns, size):
+        """Payload (``""`` when incomplete) for each of ``size`` rows given as columns."""
+        cleaned = []
+        for field in self.fields:
+            values = self._column(columns, field.name, field.default, size)
+            cleaned.append(list(map(field.clean, values)) if field.clean else values)
+        build = self.build
+        return [build(*values) for values in zip(*cleaned)]
+
+    def columns(self, rows):
+        """``{field: values}`` columns for a list of input dicts, with missing inputs defaulted."""
+        defaults = {field.name: field.default for field in self.fields}
+        for check in self.checks:
+            defaults.setdefault(check.field, "")
+        return {name: [inputs.get(name, default) for inputs in rows] for name, default in defaults.items()}
+
+    def prepare_column(self, columns, size):
+        """``(payloads, errors)`` for ``size`` rows; rows that fail validation get no payload."""
+        errors = self.validate_column(columns, size)
+        payloads = self.format_column(columns, size)
+        return [None if error else payload for payload, error in zip(payloads, errors)], errors
+
+
+def register_category(category, replace=False):
+    """Add ``category`` to the registry; the same name is an error unless ``replace``."""
+    if category.name in REGISTRY and not replace:
+        raise ValueError(f"Category {category.name!r} is already registered")
+    if category.name not in REGISTRY:
+        CATEGORIES.append(category.name)
+    REGISTRY[category.name] = category
+    return category
+
+
+def get_category(name):
+    return REGISTRY.get(name)
+
+
+# Built-in categories
+
+def _build_wifi(ssid, password, encryption):
+    if ssid and password:
+        return f"WIFI:S:{ssid};T:{encryption};P:{password};;"
+    return ""
+
+
+def _build_email(email, subject, body):
+    if email:
+        return f"mailto:{email}?subject={subject}&body={body}" if subject or body else f"mailto:{email}"
+    return ""
+
+
+def _build_sms(phone, message):
+    if phone:
+        return f"sms:{phone}?body={message}" if message else f"sms:{phone}"
+    return ""
+
+
+def _build_event(title, start, end, location, description):
+    if not (title and start):
+        return ""
+    start_dt = parse_event_time(start)
+    end_dt = parse_event_time(end or start)
+    if start_dt is None or end_dt is None:
+        return ""
+    return (
+        f"BEGIN:VCALENDAR\n"
+        f"VERSION:2.0\n"
+        f"BEGIN:VEVENT\n"
+        f"SUMMARY:{title}\n"
+        f"DTSTART:{start_dt.strftime('%Y%m%dT%H%M%S')}\n"
+        f"DTEND:{end_dt.strftime('%Y%m%dT%H%M%S')}\n"
+        f"LOCATION:{location}\n"
+        f"DESCRIPTION:{description}\n"
+        f"END:VEVENT\n"
+        f"END:VCALENDAR"
+    )
+
+
+SOCIAL_BASE_URLS = {
+    "twitter": "https://twitter.com/",
+    "instagram": "https://instagram.com/",
+    "facebook": "https://facebook.com/",
+    "linkedin": "https://linkedin.com/in/",
+    "youtube": "https://youtube.com/@",
+    "tiktok": "https://tiktok.com/@",
+    "snapchat": "https://snapchat.com/add/",
+    "pinterest": "https://pinterest.com/"
+}
+
+
+def _build_vcard(name, phone, email):
+    if not name:
+        return ""
+    vcard = [
+        "BEGIN:VCARD",
+        "VERSION:3.0",
+        f"FN:{name}",
+    ]
+    if phone:
+        vcard.append(f"TEL:{phone}")
+    if email:
+        vcard.append(f"EMAIL:{email}")
+    vcard.append("END:VCARD")
+    return "\n".join(vcard)
+
+
+for _category in (
+    Category(
+        "Number",
+        [Field("number")],
+        lambda value: f"number:{value}" if value else "",
+    ),
+    Category(
+        "WiFi Password",
+        [Field("wifi_ssid", "WiFi SSID"), Field("wifi_password", "WiFi Password"),
+         Field("wifi_encryption", "Encryption", default="WPA", clean=None)],
+        _build_wifi,
+        [Check("wifi_ssid", "WiFi SSID is required!"), Check("wifi_password", "WiFi Password is required!")],
+    ),
+    Category(
+        "Link",
+        [Field("link", "URL")],
+        lambda url: url,
+        [Check("link", "URL is required!"),
+         Check("link", "URL should start with http:// or https://", URL_PATTERN)],
+    ),
+    Category(
+        "WhatsApp",
+        [Field("whatsapp_number", "WhatsApp Number", clean=strip_separators)],
+        lambda phone: f"https://wa.me/{phone}" if phone else "",
+        [Check("whatsapp_number", "Phone number is required!"),
+         Check("whatsapp_number", "Invalid phone number format", PHONE_PATTERN)],
+    ),
+    Category(
+        "Text",
+        [Field("text")],
+        lambda value: f"text:{value}" if value else "",
+    ),
+    Category(
+        "Email",
+        [Field("email", "Email Address"), Field("email_subject", "Subject"), Field("email_body", "Body")],
+        _build_email,
+        [Check("email", "Email address is required!"), Check("email", "Invalid email format", EMAIL_PATTERN)],
+    ),
+    Category(
+        "Phone",
+        [Field("phone_number", "Phone Number", clean=strip_separators)],
+        lambda phone: f"tel:{phone}" if phone else "",
+    ),
+    Category(
+        "SMS",
+        [Field("sms_number", "Phone Number", clean=strip_separators), Field("sms_message", "Message")],
+        _build_sms,
+    ),
+    Category(
+        "Location",
+        [Field("manual_location", "Location")],
+        lambda location: f"location:{location}" if location else "",
+    ),
+    Category(
+        "Event",
+        [Field("event_title", "Event Title"), Field("event_start", "Start"), Field("event_end", "End"),
+         Field("event_location", "Location"), Field("event_description", "Description")],
+        _build_event,
+        [Check("event_title", "Event title is required!"),
+         Check("event_start", "Invalid start date/time format (use YYYY-MM-DDTHH:MM)",
+               test=lambda value: parse_event_time(value) is not None)],
+    ),
+    Category(
+        "Social Media",
+        [Field("social_platform", "Platform", default="twitter", clean=None), Field("social_username", "Username")],
+        lambda platform, username: f"{SOCIAL_BASE_URLS.get(platform, 'https://')}{username}" if username else "",
+    ),
+    Category(
+        "vCard",
+        [Field("vcard_name", "Full Name"), Field("vcard_phone", "Phone"), Field("vcard_email", "Email")],
+        _build_vcard,
+    ),
+    Category(
+        "Cryptocurrency",
+        [Field("crypto_type", "Cryptocurrency", default="bitcoin", clean=None), Field("crypto_address", "Address")],
+        lambda crypto_type, address: f"{crypto_type}:{address}" if address else "",
+    ),
+    Category(
+        "2D Barcode",
+        [Field("barcode_text", "Text")],
+        lambda value: value,
+    ),
+):
+    register_category(_category)
+del _category
@@ -0,0 +1,250 @@
+"""Command-line entry point.
+
+    python -m qrgen batch rows.csv -o codes.zip
+    python -m qrgen sheet rows.csv -o labels.pdf --layout avery-l7160
+    python -m qrgen linked notes.txt -o linked.zip --tiled linked.png
+    python -m qrgen serve --port 8000
+"""
+import argparse
+import sys
+
+from qrgen.core import DEFAULT_QR_CONFIG, ERROR_CORRECT_LEVELS, MAX_BORDER, MAX_BOX_SIZE, PNG_COMPRESSION_LEVELS
+
+
+def _int_between(low, high):
+    def parse(text):
+        value = int(text)
+        if not low <= value <= high:
+            raise argparse.ArgumentTypeError(f"must be between {low} and {high}")
+        return value
+    parse.__name__ = "integer"
+    return parse
+
+
+def _add_config_arguments(parser):
+    group = parser.add_argument_group("QR code settings")
+    group.add_argument("--version", type=_int_between(1, 40), default=DEFAULT_QR_CONFIG["version"],
+                       help="minimum QR version (1-40)")
+    group.add_argument("--fixed-version", action="store_true",
+                       help="fail rows that do not fit --version instead of growing the symbol")
+    group.add_argument("--box-size", type=_int_between(1, MAX_BOX_SIZE), default=DEFAULT_QR_CONFIG["box_size"],
+                       help=f"pixels per module (1-{MAX_BOX_SIZE})")
+    group.add_argument("--border", type=_int_between(0, MAX_BORDER), default=DEFAULT_QR_CONFIG["border"],
+                       help=f"quiet zone in modules (0-{MAX_BORDER})")
+    group.add_argument("--error-correction", choices=list(ERROR_CORRECT_LEVELS), default="Medium")
+    group.add_argument("--fill-color", default=DEFAULT_QR_CONFIG["fill_color"])
+    group.add_argument("--back-color", default=DEFAULT_QR_CONFIG["back_color"])
+    group.add_argument("--png-compression", choices=list(PNG_COMPRESSION_LEVELS), default="Balanced")
+
+
+def qr_config_from_args(args):
+    return {
+        "version": args.version,
+        "fixed_version": args.fixed_version,
+        "box_size": args.box_size,
+        "border": args.border,
+        "error_correction": ERROR_CORRECT_LEVELS[args.error_correction],
+        "fill_color": args.fill_color,
+        "back_color": args.back_color,
+        "png_compress_level": PNG_COMPRESSION_LEVELS[args.png_compression],
+    }
+
+
+def _print_progress(report):
+    done = f"{report.processed}/{report.expected}" if report.expected else str(report.processed)
+    eta = f", ETA {report.eta:.0f}s" if report.eta is not None else ""
+    print(f"\r{done} rows, {report.codes_per_sec:.0f} codes/sec{eta}  ", end="", file=sys.stderr, flush=True)
+
+
+def _run_batch(args):
+    from qrgen.batch import count_rows, read_rows, run_batch
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    report = run_batch(
+        read_rows(args.input, args.input_format),
+        args.output,
+        qr_config=qr_config_from_args(args),
+        formats=formats,
+        workers=args.workers,
+        archive=args.archive,
+        expected=count_rows(args.input, args.input_format) if args.progress else None,
+        progress=_print_progress if args.progress else None,
+        verify=args.verify,
+        reject_unreadable=args.reject_unreadable,
+        deduplicate=args.dedupe,
+    )
+    if args.progress:
+        print(file=sys.stderr)
+    print(report.summary())
+    for index, category, error in report.errors[:args.show_errors]:
+        print(f"  row {index} ({category or 'no category'}): {error}", file=sys.stderr)
+    return 1 if (report.failed or report.unreadable) and args.strict else 0
+
+
+def _run_sheet(args):
+    from qrgen.batch import count_rows, read_rows, run_sheet
+    from qrgen.sheet import get_layout
+
+    try:
+        layout = get_layout(args.layout)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    report = run_sheet(
+        read_rows(args.input, args.input_format),
+        args.output,
+        layout=layout,
+        qr_config=qr_config_from_args(args),
+        fmt=args.format,
+        dpi=args.dpi,
+        caption=None if args.caption == "none" else args.caption,
+        workers=args.workers,
+        memmap=args.memmap,
+        expected=count_rows(args.input, args.input_format) if args.progress else None,
+        progress=_print_progress if args.progress else None,
+        deduplicate=args.dedupe,
+    )
+    if args.progress:
+        print(file=sys.stderr)
+    print(report.summary())
+    for index, category, error in report.errors[:args.show_errors]:
+        print(f"  row {index} ({category or 'no category'}): {error}", file=sys.stderr)
+    return 1 if report.failed and args.strict else 0
+
+
+def _run_linked(args):
+    from concurrent.futures import ProcessPoolExecutor
+
+    from qrgen.core import CapacityError
+    from qrgen.render import render
+    from qrgen.structured import render_structured, tile, write_structured
+
+    if args.input == "-":
+        data = sys.stdin.read()
+    else:
+        with open(args.input, encoding="utf-8") as stream:
+            data = stream.read()
+    if not data:
+        print("The input is empty; there is no data to encode", file=sys.stderr)
+        return 1
+    qr_config = qr_config_from_args(args)
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            rendered = render_structured(data, qr_config, formats, args.max_symbols, pool)
+    except CapacityError as e:
+        print(e, file=sys.stderr)
+        return 1
+    tiled = {}
+    if args.tiled:
+        fmt = "svg" if args.tiled.lower().endswith(".svg") else "png"
+        tiled[fmt] = render(tile([matrix for matrix, _, _ in rendered], qr_config["border"]), qr_config, fmt)
+        with open(args.tiled, "wb") as stream:
+            stream.write(tiled[fmt])
+    write_structured(args.output, rendered, qr_config, tiled=tiled)
+    versions = ", ".join(str(matrix.version) for matrix, _, _ in rendered)
+    print(f"{len(rendered)} linked codes (versions {versions}) for {len(data.encode('utf-8'))} bytes")
+    return 0
+
+
+def _run_serve(args):
+    from qrgen.server import serve
+
+    serve(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        timeout=args.timeout,
+        cache_bytes=args.cache_bytes,
+        verbose=args.verbose,
+        metrics=args.metrics,
+        allow_profile=args.allow_profile,
+    )
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="qrgen", description="Generate QR codes without the web UI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="render CSV/JSONL rows into a ZIP archive")
+    batch.add_argument("input", help="CSV or JSONL file with a 'category' column and input fields")
+    batch.add_argument("-o", "--output", required=True, help="ZIP or .tar file to write")
+    batch.add_argument("--archive", choices=["zip", "tar"],
+                       help="archive format (default: tar for a .tar output, otherwise zip)")
+    batch.add_argument("--input-format", choices=["csv", "jsonl"],
+                       help="defaults to the input file extension")
+    batch.add_argument("--formats", default="png,svg", help="comma-separated: png, svg")
+    batch.add_argument("--workers", type=int, help="render processes (default: all cores)")
+    batch.add_argument("--show-errors", type=int, default=20, metavar="N",
+                       help="print the first N row errors")
+    batch.add_argument("--strict", action="store_true", help="exit non-zero if any row failed")
+    batch.add_argument("--progress", action="store_true", help="show progress and ETA on stderr")
+    batch.add_argument("--verify", action="store_true",
+                       help="read every PNG back and check it matches the code and has enough contrast")
+    batch.add_argument("--reject-unreadable", action="store_true",
+                       help="with verification, leave failing codes out of the archive (implies --verify)")
+    batch.add_argument("--dedupe", action=argparse.BooleanOptionalAction, default=True,
+                       help="render rows with the same data once and copy the images (default: on)")
+    _add_config_arguments(batch)
+    batch.set_defaults(func=_run_batch)
+
+    sheet = commands.add_parser("sheet", help="tile CSV/JSONL rows onto printable pages (PDF or PNG)")
+    sheet.add_argument("input", help="CSV or JSONL file with a 'category' column and input fields")
+    sheet.add_argument("-o", "--output", required=True, help="PDF or PNG file to write")
+    sheet.add_argument("--format", choices=["pdf", "png"],
+                       help="default: png for a .png output, otherwise pdf")
+    sheet.add_argument("--layout", default="a4-3x4",
+                       help="page size and label grid: a4-3x4, a4-4x6, letter-3x4, letter-4x5, "
+                            "avery-l7160 or avery-5160")
+    sheet.add_argument("--dpi", type=int, help="resolution of the page images (default: 300)")
+    sheet.add_argument("--caption", choices=["data", "name", "none"], default="data",
+                       help="text under each code: the encoded data, the filename column or nothing")
+    sheet.add_argument("--memmap", action=argparse.BooleanOptionalAction,
+                       help="back the page canvas with a temporary file (default: for very large pages)")
+    sheet.add_argument("--input-format", choices=["csv", "jsonl"],
+                       help="defaults to the input file extension")
+    sheet.add_argument("--workers", type=int, help="encoding processes (default: all cores)")
+    sheet.add_argument("--show-errors", type=int, default=20, metavar="N",
+                       help="print the first N row errors")
+    sheet.add_argument("--strict", action="store_true", help="exit non-zero if any row failed")
+    sheet.add_argument("--progress", action="store_true", help="show progress and ETA on stderr")
+    sheet.add_argument("--dedupe", action=argparse.BooleanOptionalAction, default=True,
+                       help="encode rows with the same data once (default: on)")
+    _add_config_arguments(sheet)
+    sheet.set_defaults(func=_run_sheet)
+
+    linked = commands.add_parser("linked", help="split one long payload into Structured Append codes")
+    linked.add_argument("input", help="text file with the payload, or - for stdin")
+    linked.add_argument("-o", "--output", required=True,
+                        help="ZIP or .tar file to write, with every part and the tiled image")
+    linked.add_argument("--tiled", metavar="PATH", help="also write the tiled image here (.png or .svg)")
+    linked.add_argument("--max-symbols", type=_int_between(2, 16), default=16,
+                        help="most linked codes to use, 2-16 (default: 16, for the smallest codes)")
+    linked.add_argument("--formats", default="png,svg", help="comma-separated: png, svg")
+    linked.add_argument("--workers", type=int, help="render processes (default: all cores)")
+    _add_config_arguments(linked)
+    linked.set_defaults(func=_run_linked)
+
+    server = commands.add_parser("serve", help="serve QR codes over HTTP")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8000)
+    server.add_argument("--workers", type=int, help="render processes (default: all cores)")
+    server.add_argument("--max-pending", type=int,
+                        help="renders in flight before answering 503 (default: 4 per worker)")
+    server.add_argument("--timeout", type=float, default=30.0, help="per-request render timeout in seconds")
+    server.add_argument("--cache-bytes", type=int, help="render cache memory budget")
+    server.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    server.add_argument("--metrics", action="store_true",
+                        help="collect per-stage timing histograms (see /metrics?format=prometheus)")
+    server.add_argument("--allow-profile", action="store_true",
+                        help="answer requests with profile=1 with a cProfile report")
+    server.set_defaults(func=_run_serve)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,59 @@
+"""Settings and the generate_qr entry point shared by the UI and batch tools.
+
+Nothing here imports Streamlit, and the heavy encoding and rendering
+modules (qrcode, NumPy, the SVG factory) are only imported on the first
+call to ``generate_qr``, so worker processes and command-line entry
+points start fast.
+"""
+from qrgen.metrics import METRICS
+from qrgen.payloads import CATEGORIES, format_column, format_qr_data
+from qrgen.validation import validate_column, validate_inputs
+
+class CapacityError(ValueError):
+    """The data does not fit in a QR code with the requested settings."""
+
+
+# Constants
+# Values of qrcode.constants.ERROR_CORRECT_*, spelled out so that reading
+# the settings does not import qrcode
+ERROR_CORRECT_LEVELS = {
+    "Low": 1,
+    "Medium": 0,
+    "High": 3,
+    "Highest": 2
+}
+
+# zlib levels for PNG output, selectable per request
+PNG_COMPRESSION_LEVELS = {
+    "Fastest": 1,
+    "Balanced": 6,
+    "Smallest": 9
+}
+
+# Largest module size in pixels and quiet zone in modules, as on the
+# sidebar sliders; beyond these a single image runs to gigabytes
+MAX_BOX_SIZE = 20
+MAX_BORDER = 10
+
+# Same defaults as the sidebar settings
+DEFAULT_QR_CONFIG = {
+    "version": 1,
+    "fixed_version": False,
+    "box_size": 10,
+    "border": 4,
+    "error_correction": ERROR_CORRECT_LEVELS["Medium"],
+    "fill_color": "#000000",
+    "back_color": "#FFFFFF",
+    "png_compress_level": PNG_COMPRESSION_LEVELS["Balanced"]
+}
+
+
+# Function to generate QR code with customization
+def generate_qr(data, qr_config):
+    from qrgen.encoding import encode_for_config
+    from qrgen.render import render
+
+    with METRICS.stage("generate"):
+        # Encode once; both renderers draw the same module matrix
+        matrix = encode_for_config(data, qr_config)
+        return render(matrix, qr_config, "png"), render(matrix, qr_config, "svg")
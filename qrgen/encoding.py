@@ -0,0 +1,482 @@
+"""Encode a payload once into a module matrix that every renderer consumes.
+
+Version selection looks the payload up in precomputed capacity tables
+instead of growing the version step by step, and the eight mask patterns
+are scored together with NumPy instead of building and scoring each one
+in pure Python. The penalty rules match qrcode's ``util.lost_point``.
+Payloads are split into numeric, alphanumeric and byte segments by
+``qrgen.segmentation`` before encoding.
+
+Function patterns, reserved modules, mask patterns and the data placement
+order depend only on the version, so they are built once per version as a
+``SymbolTemplate``; an encode copies the template and scatters the
+codeword bits in the precomputed order.
+
+Payloads too long for one symbol, or that would need a very large one,
+can be split with ``split_structured`` into up to 16 Structured Append
+symbols that scanners join back together, see ``encode_part``.
+"""
+from bisect import bisect_left
+from functools import lru_cache, reduce
+from operator import xor
+
+import numpy as np
+import qrcode
+from qrcode import LUT, base, util
+from qrcode.exceptions import DataOverflowError
+
+from qrgen.core import CapacityError
+from qrgen.metrics import METRICS
+from qrgen.segmentation import optimal_segments, plan_segments, total_bits
+
+MODES = (util.MODE_NUMBER, util.MODE_ALPHA_NUM, util.MODE_8BIT_BYTE, util.MODE_KANJI)
+
+# Structured Append: mode indicator, symbol position, symbol count - 1 and
+# parity byte in front of each symbol's segments
+MODE_STRUCTURED_APPEND = 0b0011
+STRUCTURED_APPEND_BITS = 4 + 4 + 4 + 8
+MAX_SYMBOLS = 16
+
+
+def _max_characters(mode, bits):
+    # Inverse of segment_bits: the most characters that fit in ``bits``
+    if bits < 0:
+        return -1
+    if mode == util.MODE_NUMBER:
+        full, rest = divmod(bits, 10)
+        return 3 * full + (2 if rest >= 7 else 1 if rest >= 4 else 0)
+    if mode == util.MODE_ALPHA_NUM:
+        full, rest = divmod(bits, 11)
+        return 2 * full + (1 if rest >= 6 else 0)
+    if mode == util.MODE_KANJI:
+        return bits // 13
+    return bits // 8
+
+
+def _character_capacity(error_correction, mode):
+    # Index 0 is a placeholder so the table is indexed by version
+    return [-1] + [
+        _max_characters(
+            mode,
+            util.BIT_LIMIT_TABLE[error_correction][version] - 4 - util.length_in_bits(mode, version)
+        )
+        for version in range(1, 41)
+    ]
+
+
+# CHARACTER_CAPACITY[error_correction][mode][version] -> most characters of a
+# single segment that fit
+CHARACTER_CAPACITY = {
+    error_correction: {mode: _character_capacity(error_correction, mode) for mode in MODES}
+    for error_correction in range(4)
+}
+
+
+@lru_cache(maxsize=None)
+def _mask_patterns(size):
+    rows, cols = np.indices((size, size))
+    patterns = np.stack([
+        (rows + cols) % 2 == 0,
+        rows % 2 == 0,
+        cols % 3 == 0,
+        (rows + cols) % 3 == 0,
+        (rows // 2 + cols // 3) % 2 == 0,
+        (rows * cols) % 2 + (rows * cols) % 3 == 0,
+        ((rows * cols) % 2 + (rows * cols) % 3) % 2 == 0,
+        ((rows * cols) % 3 + (rows + cols) % 2) % 2 == 0,
+    ])
+    patterns.flags.writeable = False
+    return patterns
+
+
+_FINDER_LIKE = (
+    int("10111010000", 2),
+    int("00001011101", 2),
+)
+_WINDOW_WEIGHTS = 1 << np.arange(10, -1, -1)
+
+
+def _run_penalty(lines, count):
+    # Rule 1: every run of 5+ same-coloured modules costs (length - 2).
+    # ``lines`` is (count * size, size); each row is scored independently.
+    n_lines, size = lines.shape
+    edges = np.ones((n_lines, size + 1), dtype=bool)
+    edges[:, 1:-1] = lines[:, 1:] != lines[:, :-1]
+    line_index, position = np.nonzero(edges)
+    lengths = np.diff(position)
+    same_line = line_index[1:] == line_index[:-1]
+    lengths, owner = lengths[same_line], line_index[1:][same_line]
+    long_runs = lengths >= 5
+    return np.bincount(
+        owner[long_runs] // (n_lines // count), weights=lengths[long_runs] - 2, minlength=count
+    )
+
+
+def mask_penalties(candidates):
+    """Penalty score of each matrix in a ``(count, size, size)`` boolean stack."""
+    count, size, _ = candidates.shape
+
+    score = _run_penalty(candidates.reshape(-1, size), count)
+    score += _run_penalty(candidates.transpose(0, 2, 1).reshape(-1, size), count)
+
+    # Rule 2: 2x2 blocks of one colour
+    top, bottom = candidates[:, :-1], candidates[:, 1:]
+    blocks = (
+        (top[:, :, :-1] == top[:, :, 1:])
+        & (top[:, :, :-1] == bottom[:, :, :-1])
+        & (top[:, :, :-1] == bottom[:, :, 1:])
+    )
+    score += 3 * blocks.sum(axis=(1, 2))
+
+    # Rule 3: finder-like 1:1:3:1:1 patterns with four light modules on a side
+    if size >= 11:
+        for lines in (candidates, candidates.transpose(0, 2, 1)):
+            windows = np.lib.stride_tricks.sliding_window_view(lines, 11, axis=2)
+            codes = windows.astype(np.int32) @ _WINDOW_WEIGHTS
+            score += 40 * np.isin(codes, _FINDER_LIKE).sum(axis=(1, 2))
+
+    # Rule 4: distance of the dark proportion from 50%, in 5% steps
+    percent = candidates.sum(axis=(1, 2)) * 100.0 / (size * size)
+    score += 10 * (np.abs(percent - 50) // 5)
+    return score
+
+
+class SymbolTemplate:
+    """The parts of a symbol that depend only on its version, as arrays.
+
+    ``base`` holds the finder, separator, timing and alignment patterns with
+    the format and version information areas light, ``reserved`` marks
+    those modules, ``order`` lists the flat indices of the remaining data
+    modules in qrcode's zig-zag placement order and ``masks`` are the eight
+    mask patterns limited to the data modules.
+    """
+
+    __slots__ = ("version", "size", "base", "reserved", "order", "masks")
+
+    def __init__(self, version):
+        size = version * 4 + 17
+        # Draw the function patterns with qrcode's own routines once, in
+        # test mode like its mask selection does
+        qr = qrcode.QRCode(version=version, border=0)
+        qr.modules_count = size
+        qr.modules = [[None] * size for _ in range(size)]
+        qr.setup_position_probe_pattern(0, 0)
+        qr.setup_position_probe_pattern(size - 7, 0)
+        qr.setup_position_probe_pattern(0, size - 7)
+        qr.setup_position_adjust_pattern()
+        qr.setup_timing_pattern()
+        qr.setup_type_info(True, 0)
+        if version >= 7:
+            qr.setup_type_number(True)
+
+        self.version = version
+        self.size = size
+        self.base = np.array([[bool(m) for m in row] for row in qr.modules])
+        self.reserved = np.array([[m is not None for m in row] for row in qr.modules])
+        self.order = self._placement_order()
+        self.masks = _mask_patterns(size) & ~self.reserved
+        for array in (self.base, self.reserved, self.order, self.masks):
+            array.flags.writeable = False
+
+    def _placement_order(self):
+        # The walk of qrcode's map_data: two-module columns from the right,
+        # alternately upwards and downwards, skipping the vertical timing
+        # pattern and every reserved module
+        size, reserved = self.size, self.reserved
+        order = []
+        upwards = True
+        for col in range(size - 1, 0, -2):
+            if col <= 6:
+                col -= 1
+            rows = range(size - 1, -1, -1) if upwards else range(size)
+            for row in rows:
+                for c in (col, col - 1):
+                    if not reserved[row, c]:
+                        order.append(row * size + c)
+            upwards = not upwards
+        return np.array(order, dtype=np.uint16 if size * size <= 0xFFFF else np.uint32)
+
+    def place(self, codewords):
+        """Unmasked modules with ``codewords`` scattered over the data modules."""
+        bits = np.unpackbits(np.frombuffer(bytes(codewords), dtype=np.uint8)).view(bool)
+        modules = self.base.copy()
+        # Remainder bits past the last codeword stay light
+        modules.ravel()[self.order[:len(bits)]] = bits
+        return modules
+
+
+@lru_cache(maxsize=None)
+def symbol_template(version):
+    return SymbolTemplate(version)
+
+
+@lru_cache(maxsize=None)
+def _type_info(version, error_correction, mask_pattern):
+    # Flat indices and values of the format information, the dark module
+    # and (from version 7) the version information, as qrcode sets them
+    size = version * 4 + 17
+    qr = qrcode.QRCode(version=version, error_correction=error_correction, border=0)
+    qr.modules_count = size
+    qr.modules = [[None] * size for _ in range(size)]
+    qr.setup_type_info(False, mask_pattern)
+    if version >= 7:
+        qr.setup_type_number(False)
+    cells = [(r * size + c, m) for r, row in enumerate(qr.modules) for c, m in enumerate(row) if m is not None]
+    index = np.array([cell for cell, _ in cells])
+    values = np.array([m for _, m in cells], dtype=bool)
+    return index, values
+
+
+@lru_cache(maxsize=None)
+def _generator_logs(ec_count):
+    # Generator polynomial coefficients after the leading 1, as logarithms
+    return np.array([base.glog(c) for c in LUT.rsPoly_LUT[ec_count][1:]])
+
+
+_EXP = np.array(base.EXP_TABLE[:255] * 2, dtype=np.uint8)
+_LOG = np.array([0] + base.LOG_TABLE[1:], dtype=np.int32)
+
+
+def _error_correction(blocks, ec_count):
+    # Reed-Solomon remainders of all blocks at once, by long division one
+    # data byte at a time. Blocks are left-padded with zero bytes to the
+    # same length, which does not change a remainder; unlike qrcode's
+    # Polynomial this also handles an all-zero block.
+    generator = _generator_logs(ec_count)
+    remainders = np.zeros((len(blocks), ec_count), dtype=np.uint8)
+    for column in blocks.T:
+        factor = column ^ remainders[:, 0]
+        remainders[:, :-1] = remainders[:, 1:]
+        remainders[:, -1] = 0
+        terms = _EXP[_LOG[factor][:, None] + generator]
+        remainders ^= np.where(factor[:, None] != 0, terms, 0).astype(np.uint8)
+    return remainders
+
+
+class _BitWriter:
+    # The part of util.BitBuffer that QRData.write uses, collecting the bits
+    # as text instead of one method call per bit
+
+    __slots__ = ("parts", "length")
+
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+
+    def put(self, num, length):
+        if length:
+            self.parts.append(format(num, f"0{length}b"))
+            self.length += length
+
+    def put_bit(self, bit):
+        self.put(1 if bit else 0, 1)
+
+    def __len__(self):
+        return self.length
+
+    def to_bytes(self):
+        """The bits so far, zero-filled to a whole number of bytes."""
+        size = -(-self.length // 8)
+        bits = "".join(self.parts).ljust(size * 8, "0")
+        return int(bits, 2).to_bytes(size, "big") if size else b""
+
+
+def _codewords(version, error_correction, segments, header=()):
+    """Interleaved data and error correction codewords, as ``util.create_data``.
+
+    ``header`` is ``(value, bit length)`` pairs written before the segments.
+    """
+    buffer = _BitWriter()
+    for value, length in header:
+        buffer.put(value, length)
+    for segment in segments:
+        buffer.put(segment.mode, 4)
+        buffer.put(len(segment), util.length_in_bits(segment.mode, version))
+        if segment.mode == util.MODE_8BIT_BYTE:
+            buffer.put(int.from_bytes(segment.data, "big"), 8 * len(segment.data))
+        else:
+            segment.write(buffer)
+
+    rs_blocks = base.rs_blocks(version, error_correction)
+    bit_limit = sum(block.data_count * 8 for block in rs_blocks)
+    if len(buffer) > bit_limit:
+        raise DataOverflowError()
+    # Terminator, then zero bits to a byte boundary, then alternating pad bytes
+    buffer.put(0, min(bit_limit - len(buffer), 4))
+    data = list(buffer.to_bytes())
+    pad = (util.PAD0, util.PAD1)
+    data += [pad[i % 2] for i in range(bit_limit // 8 - len(data))]
+
+    counts = np.array([block.data_count for block in rs_blocks])
+    present = np.arange(counts.max()) < counts[:, None]
+    blocks = np.zeros(present.shape, dtype=np.uint8)
+    blocks[present] = data
+    # Right-aligned copies for the division; leading zeros leave the
+    # remainder unchanged
+    divided = np.zeros_like(blocks)
+    for row, count in enumerate(counts):
+        divided[row, divided.shape[1] - count:] = blocks[row, :count]
+    ec_count = rs_blocks[0].total_count - rs_blocks[0].data_count
+    remainders = _error_correction(divided, ec_count)
+
+    # Interleaved column by column across the blocks, skipping the ends of
+    # the shorter ones
+    interleaved = blocks.T[present.T]
+    return interleaved.tobytes() + remainders.T.tobytes()
+
+
+class ModuleMatrix:
+    """The dark/light modules of one QR symbol, without the quiet zone.
+
+    ``modules`` is a square boolean NumPy array, ``True`` for dark modules.
+    """
+
+    __slots__ = ("version", "error_correction", "modules")
+
+    def __init__(self, version, error_correction, modules):
+        self.version = version
+        self.error_correction = error_correction
+        self.modules = modules
+
+    @property
+    def size(self):
+        return len(self.modules)
+
+    def dark_modules(self):
+        """Yield ``(row, col)`` for every dark module."""
+        for r, c in np.argwhere(self.modules):
+            yield int(r), int(c)
+
+
+def encode(data, version=None, error_correction=qrcode.constants.ERROR_CORRECT_M, fixed=False):
+    """Build the module matrix for ``data``, using the cheapest segmentation.
+
+    ``version`` is the smallest version to use; larger versions are chosen
+    when the data does not fit, as with ``QRCode.make(fit=True)``. With
+    ``fixed=True`` the symbol is exactly ``version`` and ``CapacityError``
+    is raised when the data does not fit.
+    """
+    error_correction = int(error_correction)
+    with METRICS.stage("segment"):
+        plan = plan_segments(data, error_correction, version or 1)
+    if plan.version is None:
+        raise CapacityError("Data is too long for a single QR code at this error correction level")
+    if fixed and version is not None and plan.version > version:
+        raise CapacityError(
+            f"Data needs at least version {plan.version} at this error correction level; "
+            f"version {version} is fixed"
+        )
+
+    return _make(plan.version, error_correction, plan.segments)
+
+
+def _make(version, error_correction, segments, header=()):
+    with METRICS.stage("make"):
+        template = symbol_template(version)
+        unmasked = template.place(_codewords(version, error_correction, segments, header))
+        with METRICS.stage("mask"):
+            # Scored with the format and version areas light, as qrcode does
+            mask_pattern = int(np.argmin(mask_penalties(unmasked ^ template.masks)))
+        modules = unmasked ^ template.masks[mask_pattern]
+        index, values = _type_info(version, error_correction, mask_pattern)
+        modules.ravel()[index] = values
+    modules.flags.writeable = False
+    return ModuleMatrix(version, error_correction, modules)
+
+
+def encode_for_config(data, qr_config):
+    with METRICS.stage("encode"):
+        return encode(
+            data,
+            qr_config["version"],
+            qr_config["error_correction"],
+            fixed=qr_config.get("fixed_version", False),
+        )
+
+
+class StructuredPart:
+    """One symbol's share of a Structured Append payload."""
+
+    __slots__ = ("data", "index", "total", "parity", "version")
+
+    def __init__(self, data, index, total, parity, version):
+        self.data = data
+        self.index = index
+        self.total = total
+        self.parity = parity
+        self.version = version
+
+
+def _fits(chunk, error_correction, version):
+    bits = STRUCTURED_APPEND_BITS + total_bits(optimal_segments(chunk, version), version)
+    return bits <= util.BIT_LIMIT_TABLE[error_correction][version]
+
+
+def _greedy_split(data, error_correction, version, max_symbols):
+    # Character offsets of the fewest parts that each fit ``version``,
+    # filling every part but the last, or None if more than ``max_symbols``
+    # would be needed. Offsets are in characters so multi-byte UTF-8
+    # characters are never split across symbols.
+    bounds, start = [0], 0
+    # No part can hold more characters than a full numeric segment
+    longest = CHARACTER_CAPACITY[error_correction][util.MODE_NUMBER][version]
+    while start < len(data):
+        if len(bounds) > max_symbols:
+            return None
+        low, high = start, min(len(data), start + longest)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _fits(data[start:middle].encode("utf-8"), error_correction, version):
+                low = middle
+            else:
+                high = middle - 1
+        if low == start:
+            return None
+        bounds.append(low)
+        start = low
+    return bounds
+
+
+def split_structured(data, error_correction, start=1, max_symbols=MAX_SYMBOLS, fixed=False):
+    """Split ``data`` into Structured Append parts whose largest version is as small as possible.
+
+    Every part but the last is filled to that version, so for it the
+    fewest symbols are used; each part then gets the smallest version
+    >= ``start`` it fits. With ``fixed=True`` all parts use ``start``.
+    Raises ``CapacityError`` if more than ``max_symbols`` would be needed
+    and ``ValueError`` if ``data`` is empty.
+    """
+    if not data:
+        raise ValueError("No data to split into linked QR codes")
+    error_correction = int(error_correction)
+    max_symbols = min(max_symbols, MAX_SYMBOLS)
+    parity = reduce(xor, data.encode("utf-8"), 0)
+    # The number of parts needed only shrinks as the version grows
+    versions = [start] if fixed else range(start, 41)
+    index = bisect_left(
+        versions, True, key=lambda version: _greedy_split(data, error_correction, version, max_symbols) is not None
+    )
+    if index == len(versions):
+        where = f"version {start}" if fixed else "any version"
+        raise CapacityError(f"Data does not fit in {max_symbols} linked QR codes at {where} at this error correction level")
+    bounds = _greedy_split(data, error_correction, versions[index], max_symbols)
+    parts = []
+    for position, (first, last) in enumerate(zip(bounds, bounds[1:])):
+        chunk = data[first:last].encode("utf-8")
+        version = versions[index] if fixed else plan_segments(
+            chunk, error_correction, start, STRUCTURED_APPEND_BITS
+        ).version
+        parts.append(StructuredPart(chunk, position, len(bounds) - 1, parity, version))
+    return parts
+
+
+def encode_part(part, error_correction):
+    """The ``ModuleMatrix`` of one Structured Append part."""
+    header = (
+        (MODE_STRUCTURED_APPEND, 4),
+        (part.index, 4),
+        (part.total - 1, 4),
+        (part.parity, 8),
+    )
+    with METRICS.stage("encode"):
+        return _make(part.version, int(error_correction), optimal_segments(part.data, part.version), header)
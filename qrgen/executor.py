@@ -0,0 +1,391 @@
+"""A shared process pool for rendering, with admission control.
+
+One ``RenderExecutor`` serves every Streamlit session (or HTTP request
+thread) in a process. Renders run in worker processes, so a version-40
+code for one user does not hold the GIL for everyone else, and at most
+``max_pending`` renders are queued or running at a time: beyond that
+``ServerBusy`` is raised at once instead of queueing without bound. A
+caller waits at most ``timeout`` seconds for its result before
+``RenderTimeout``.
+
+A slot is only released when the worker finishes, not when a caller
+gives up waiting, so timed-out renders still count against the limit.
+
+A worker that dies (killed for memory, a crash) breaks its process pool;
+the pool is replaced and the callers whose calls were lost get
+``ServerBusy`` to retry, instead of every later call failing.
+
+Long jobs such as batches ``reserve`` several slots for their whole run
+and submit through the reservation; reservations together hold at most
+``BATCH_SHARE`` of the slots, so single renders always have the rest.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager, nullcontext
+
+from qrgen.core import DEFAULT_QR_CONFIG
+from qrgen.metrics import METRICS
+
+DEFAULT_TIMEOUT = 30.0
+
+# Queued or running renders per worker before callers are turned away
+PENDING_PER_WORKER = 4
+
+# Share of the slots that reservations may hold between them
+BATCH_SHARE = 0.5
+
+
+class ServerBusy(RuntimeError):
+    """Every render slot is taken; retry later."""
+
+
+class RenderTimeout(TimeoutError):
+    """The render did not finish within the executor's timeout."""
+
+
+def _warm():
+    # Import the encoder and renderers so the first real render is not
+    # also the one that pays for loading qrcode and NumPy
+    import qrgen.encoding  # noqa: F401
+    import qrgen.render  # noqa: F401
+
+
+def render_formats(data, qr_config, formats, matrix=None, instrument=False):
+    """Render ``formats`` of one payload, encoding it first unless ``matrix`` is given.
+
+    Runs in a worker. Returns ``({fmt: bytes}, encoded matrix or None,
+    stage timings)``; the matrix and timings are for the caller's caches
+    and ``METRICS``.
+    """
+    from qrgen.encoding import encode_for_config
+    from qrgen.render import render
+
+    with METRICS.capture() if instrument else nullcontext([]) as events:
+        encoded = None
+        if matrix is None:
+            matrix = encoded = encode_for_config(data, qr_config)
+        images = {fmt: render(matrix, qr_config, fmt) for fmt in formats}
+    return images, encoded, events
+
+
+def verify_render(png_bytes, data, qr_config, matrix=None, instrument=False):
+    """``verify_png`` for the code of ``data``, encoding it first unless ``matrix`` is given.
+
+    Runs in a worker. Returns ``(problem or None, encoded matrix or None,
+    stage timings)``, like ``render_formats``.
+    """
+    from qrgen.encoding import encode_for_config
+    from qrgen.verify import verify_png
+
+    with METRICS.capture() if instrument else nullcontext([]) as events:
+        encoded = None
+        if matrix is None:
+            matrix = encoded = encode_for_config(data, qr_config)
+        problem = verify_png(png_bytes, matrix, qr_config)
+    return problem, encoded, events
+
+
+class Reservation:
+    """Slots of a ``RenderExecutor`` held by one long job, used as its executor.
+
+    ``submit`` returns a future like ``concurrent.futures`` executors do,
+    waiting while every reserved slot has a call in flight. Closing the
+    reservation cancels calls that have not started and returns each slot
+    once it is idle.
+    """
+
+    def __init__(self, executor, count):
+        self._executor = executor
+        # Every call of one job goes to the same pool, see RenderExecutor.reserve
+        self._pool = executor._pool
+        self._count = count
+        self._free = threading.Semaphore(count)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._closed = False
+
+    def submit(self, fn, *args):
+        self._free.acquire()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._free.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+            closed = self._closed
+        if closed:
+            self._executor._release()
+            return
+        with self._executor._lock:
+            self._executor.completed += 1
+        self._free.release()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            pending = list(self._pending)
+            idle = self._count - len(pending)
+        for future in pending:
+            future.cancel()
+        self._executor._unreserve(self._count, idle)
+
+
+def _call_chunk(fn, calls):
+    # Runs in a worker: several calls for one slot, see RenderExecutor.map
+    return [fn(*args) for args in calls]
+
+
+class RenderExecutor:
+    """Process pool plus a bounded number of render slots; safe to share between threads."""
+
+    def __init__(self, workers=None, max_pending=None, timeout=DEFAULT_TIMEOUT, mp_context=None,
+                 prestart=False):
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending or self.workers * PENDING_PER_WORKER
+        self.timeout = timeout
+        self._mp_context = mp_context
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.max_reserved = max(1, int(self.max_pending * BATCH_SHARE))
+        self.reserved = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self._prestart = prestart
+        self._start_workers(self._pool)
+
+    def _start_workers(self, pool):
+        if self._prestart:
+            for _ in range(self.workers):
+                pool.submit(_warm)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _restart(self, pool):
+        # ``pool`` is broken by a dead worker: replace it, once however many
+        # callers notice. Calls lost with it finish with BrokenProcessPool,
+        # which releases their slots as usual.
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._mp_context)
+            self.restarts += 1
+            replacement = self._pool
+        pool.shutdown(wait=False, cancel_futures=True)
+        self._start_workers(replacement)
+
+    def _lost(self, pool):
+        self._restart(pool)
+        return ServerBusy("A render worker stopped, retry later")
+
+    def _acquire(self, count=1):
+        # Take ``count`` slots at once or none at all
+        taken = 0
+        while taken < count and self._slots.acquire(blocking=False):
+            taken += 1
+        if taken < count:
+            for _ in range(taken):
+                self._slots.release()
+            with self._lock:
+                self.rejected += 1
+            raise ServerBusy("Server busy, retry later")
+        with self._lock:
+            self.in_flight += count
+
+    def _release(self, future=None):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def _unreserve(self, count, idle):
+        # A reservation of ``count`` slots closed with ``idle`` of them unused;
+        # the rest are released as their calls finish
+        with self._lock:
+            self.reserved -= count
+            self.in_flight -= idle
+        for _ in range(idle):
+            self._slots.release()
+
+    @contextmanager
+    def slot(self):
+        """Hold a render slot for work done on the calling thread."""
+        self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextmanager
+    def reserve(self, count):
+        """Hold ``count`` slots for a long job and yield a ``Reservation`` to submit it through.
+
+        Raises ``ServerBusy`` when that many slots are not free or would
+        take reservations past ``max_reserved``. Calls through the
+        reservation have no timeout.
+        """
+        count = max(1, min(count, self.max_reserved))
+        with self._lock:
+            if self.reserved + count > self.max_reserved:
+                self.rejected += 1
+                raise ServerBusy("Too many batches running, retry later")
+            self.reserved += count
+        try:
+            self._acquire(count)
+        except BaseException:
+            with self._lock:
+                self.reserved -= count
+            raise
+        reservation = Reservation(self, count)
+        try:
+            yield reservation
+        except BrokenProcessPool:
+            raise self._lost(reservation._pool) from None
+        finally:
+            reservation.close()
+
+    def submit(self, fn, *args):
+        """Run ``fn(*args)`` in a worker and wait for the result.
+
+        Raises ``ServerBusy`` when no slot is free, ``RenderTimeout`` after
+        ``timeout`` seconds and otherwise whatever ``fn`` raised.
+        """
+        self._acquire()
+        pool = self._pool
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            raise self._lost(pool) from None
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            raise self._lost(pool) from None
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise RenderTimeout(f"Rendering took longer than {self.timeout:g}s") from None
+
+    def map(self, fn, *iterables):
+        """``[fn(*args) for args in zip(*iterables)]``, computed across the workers.
+
+        The calls are split into at most one chunk per worker, and each
+        chunk takes one slot, so one request cannot hold every slot. All
+        slots are taken up front: ``ServerBusy`` is raised unless there are
+        enough, and ``RenderTimeout`` if the chunks do not all finish within
+        ``timeout`` seconds.
+        """
+        calls = list(zip(*iterables))
+        count = min(len(calls), self.workers, self.max_pending)
+        if not count:
+            return []
+        chunks = [calls[i::count] for i in range(count)]
+        self._acquire(count)
+
+        pool = self._pool
+        futures = []
+        try:
+            for chunk in chunks:
+                futures.append(pool.submit(_call_chunk, fn, chunk))
+        except BaseException as e:
+            for _ in range(count - len(futures)):
+                self._release()
+            for future in futures:
+                future.cancel()
+                future.add_done_callback(self._release)
+            if isinstance(e, BrokenProcessPool):
+                raise self._lost(pool) from None
+            raise
+        for future in futures:
+            future.add_done_callback(self._release)
+
+        deadline = time.monotonic() + self.timeout
+        try:
+            results = [future.result(timeout=max(deadline - time.monotonic(), 0)) for future in futures]
+        except BrokenProcessPool:
+            raise self._lost(pool) from None
+        except FutureTimeoutError:
+            for future in futures:
+                future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise RenderTimeout(f"Rendering took longer than {self.timeout:g}s") from None
+        # Chunk i holds calls i, i + count, ...; put them back in order
+        ordered = [None] * len(calls)
+        for i, chunk_results in enumerate(results):
+            ordered[i::count] = chunk_results
+        return ordered
+
+    def render_cached(self, cache, data, qr_config, formats=("png", "svg")):
+        """Images for ``formats`` from a ``LayeredCache``, rendering the missing ones in a worker.
+
+        A cached matrix is sent along so the worker does not encode again;
+        whatever the worker renders or encodes is stored in ``cache``.
+        """
+        from qrgen.cache import encode_key
+
+        qr_config = {**DEFAULT_QR_CONFIG, **qr_config}
+        images = {fmt: cache.lookup(data, qr_config, fmt) for fmt in formats}
+        missing = [fmt for fmt, image in images.items() if image is None]
+        if missing:
+            matrix = cache.matrices.get(encode_key(data, qr_config))
+            rendered, encoded, events = self.submit(
+                render_formats, data, qr_config, missing, matrix, METRICS.enabled
+            )
+            METRICS.replay(events)
+            for fmt, image in rendered.items():
+                cache.store(data, qr_config, fmt, image, encoded)
+                images[fmt] = image
+        return tuple(images[fmt] for fmt in formats)
+
+    def verify_cached(self, cache, data, qr_config, png_bytes):
+        """Check ``png_bytes`` will scan (see ``verify_png``) in a worker, sending it a cached matrix.
+
+        A matrix the worker had to encode is stored in ``cache``.
+        """
+        from qrgen.cache import encode_key
+
+        qr_config = {**DEFAULT_QR_CONFIG, **qr_config}
+        key = encode_key(data, qr_config)
+        problem, encoded, events = self.submit(
+            verify_render, png_bytes, data, qr_config, cache.matrices.get(key), METRICS.enabled
+        )
+        METRICS.replay(events)
+        if encoded is not None:
+            cache.matrices.put(key, encoded)
+        return problem
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self.in_flight,
+                "reserved": self.reserved,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+            }
@@ -0,0 +1,455 @@
+"""History of generated codes, per session or persisted in SQLite.
+
+Entries keep the inputs and settings needed to rebuild a code, a content
+hash of the payload and settings and a small thumbnail. ``HistoryStore``
+holds the last few generations of one session; full-size images are
+fetched from the shared ``LayeredCache``, or rendered again, only when an
+entry is reused.
+
+``PersistentHistory`` keeps generations in an SQLite database that
+outlives sessions and restarts, each under an owner (a user or session)
+that ``owned`` scopes reads and writes to. Rendered images and thumbnails
+are stored once per payload and settings pair, as content-addressed blobs,
+and entries are read a page at a time with their thumbnails only. Entries
+past ``max_entries`` or older than ``max_age`` are pruned, along with the
+images no remaining entry uses.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+from qrgen.cache import render_key
+from qrgen.core import PNG_COMPRESSION_LEVELS, format_qr_data
+
+THUMBNAIL_WIDTH = 100
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), ".qrgen", "history.sqlite3")
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_AGE = 90 * 24 * 3600
+# Additions between retention passes
+PRUNE_EVERY = 100
+
+
+def make_thumbnail(data, qr_config, width=THUMBNAIL_WIDTH, matrix=None):
+    from qrgen.encoding import encode_for_config
+    from qrgen.render import render_png
+
+    if matrix is None:
+        matrix = encode_for_config(data, qr_config)
+    box_size = max(1, width // (matrix.size + 2 * qr_config["border"]))
+    return render_png(matrix, {
+        **qr_config,
+        "box_size": box_size,
+        "png_compress_level": PNG_COMPRESSION_LEVELS["Smallest"],
+    })
+
+
+class HistoryEntry:
+    __slots__ = ("id", "category", "inputs", "config", "key", "thumbnail", "timestamp")
+
+    def __init__(self, id, category, inputs, config, key, thumbnail, timestamp):
+        self.id = id
+        self.category = category
+        self.inputs = inputs
+        self.config = config
+        self.key = key
+        self.thumbnail = thumbnail
+        self.timestamp = timestamp
+
+    def assets(self, cache, executor=None):
+        """Return ``(png_bytes, svg_bytes)`` from a ``LayeredCache``, rendering again if evicted.
+
+        With a ``RenderExecutor`` the rendering happens in its worker processes.
+        """
+        data = format_qr_data(self.category, dict(self.inputs))
+        if executor is not None:
+            return executor.render_cached(cache, data, dict(self.config))
+        return cache.generate(data, dict(self.config))
+
+    def nbytes(self):
+        size = sys.getsizeof(self) + sys.getsizeof(self.thumbnail) + sys.getsizeof(self.key)
+        for pairs in (self.inputs, self.config):
+            size += sys.getsizeof(pairs)
+            for key, value in pairs:
+                size += sys.getsizeof(key) + sys.getsizeof(value)
+        return size
+
+
+def _matches(entry, category, search, since, until):
+    if category is not None and entry.category != category:
+        return False
+    if since is not None and entry.timestamp < since:
+        return False
+    if until is not None and entry.timestamp >= until:
+        return False
+    return search is None or search.lower() in format_qr_data(entry.category, dict(entry.inputs)).lower()
+
+
+class HistoryStore:
+    """The last ``maxlen`` generations of one session, oldest first."""
+
+    def __init__(self, maxlen=10):
+        self._entries = deque(maxlen=maxlen)
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def add(self, category, inputs, data, qr_config, cache=None, assets=None):
+        """Record a generation; with a ``LayeredCache`` the thumbnail reuses its matrix.
+
+        ``assets`` is accepted for compatibility with ``PersistentHistory``
+        and ignored: reused entries are served from the cache.
+        """
+        matrix = cache.matrix(data, qr_config) if cache is not None else None
+        entry = HistoryEntry(
+            self._next_id,
+            category,
+            # Only the fields that were filled in; widgets default the rest
+            tuple(sorted((k, v) for k, v in inputs.items() if v)),
+            tuple(sorted(qr_config.items())),
+            render_key(data, qr_config),
+            make_thumbnail(data, qr_config, matrix=matrix),
+            time.time(),
+        )
+        self._next_id += 1
+        self._entries.append(entry)
+        return entry
+
+    def page(self, limit, before=None, category=None, search=None, since=None, until=None):
+        """Up to ``limit`` entries newest first, see ``PersistentHistory.page``."""
+        entries = []
+        for entry in reversed(self._entries):
+            if len(entries) == limit:
+                break
+            if (before is None or entry.id < before) and _matches(entry, category, search, since, until):
+                entries.append(entry)
+        return entries
+
+    def count(self, category=None, search=None, since=None, until=None):
+        return sum(1 for entry in self._entries if _matches(entry, category, search, since, until))
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sum(entry.nbytes() for entry in self._entries)
+
+
+class StoredEntry(HistoryEntry):
+    """A ``PersistentHistory`` entry; its images are read from the database."""
+
+    __slots__ = ("store",)
+
+    def __init__(self, store, *args):
+        super().__init__(*args)
+        self.store = store
+
+    def assets(self, cache, executor=None):
+        stored = self.store.assets(self.key)
+        if stored is not None:
+            return stored
+        return super().assets(cache, executor)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS assets (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    config TEXT NOT NULL,
+    thumbnail TEXT NOT NULL REFERENCES blobs(hash),
+    png TEXT REFERENCES blobs(hash),
+    svg TEXT REFERENCES blobs(hash)
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    category TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    asset INTEGER NOT NULL REFERENCES assets(id),
+    owner TEXT NOT NULL DEFAULT ''
+);
+"""
+
+# Created after the owner column is added to databases that predate it
+_INDEXES = """
+DROP INDEX IF EXISTS history_category;
+CREATE INDEX IF NOT EXISTS history_owner ON history(owner, id);
+CREATE INDEX IF NOT EXISTS history_owner_category ON history(owner, category, id);
+CREATE INDEX IF NOT EXISTS history_created ON history(created);
+CREATE INDEX IF NOT EXISTS history_asset ON history(asset, id);
+"""
+
+# Trigram full-text index over payloads for substring search; SQLite
+# before 3.34 has no trigram tokenizer and falls back to a LIKE scan
+_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS assets_search USING fts5(
+    payload, content='assets', content_rowid='id', tokenize='trigram'
+)
+"""
+
+# Shortest search the trigram index can answer
+_TRIGRAM = 3
+
+
+def _blob_hash(blob):
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _pairs(text):
+    return tuple(map(tuple, json.loads(text)))
+
+
+class PersistentHistory:
+    """Generations, newest first, in the SQLite database at ``path``.
+
+    Safe to share between threads (and Streamlit sessions); several
+    processes may also open the same file. Each entry records its owner,
+    category, inputs and time and points at the asset for its
+    ``render_key``: the payload, settings, thumbnail and rendered PNG and
+    SVG, written once however often the code is generated. Images are
+    content-addressed blobs, so identical images under different keys are
+    also kept once.
+
+    Reads and writes are for one ``owner`` at a time (``""`` unless
+    given); ``owned`` binds one for code that shares a store between users.
+    Every ``PRUNE_EVERY`` additions, and when opened, entries beyond the
+    newest ``max_entries`` or older than ``max_age`` seconds are deleted
+    with the assets and blobs no entry uses any more; ``None`` keeps them.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, max_age=DEFAULT_MAX_AGE):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._added = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(history)")}
+            if "owner" not in columns:
+                self._db.execute("ALTER TABLE history ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+            self._db.executescript(_INDEXES)
+            try:
+                self._db.execute(_SEARCH_SCHEMA)
+                self._trigram = True
+            except sqlite3.OperationalError:
+                self._trigram = False
+        self.prune()
+
+    def owned(self, owner):
+        """A view of this store holding only ``owner``'s entries."""
+        return OwnedHistory(self, owner)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __len__(self):
+        return self.count()
+
+    def __bool__(self):
+        return self.exists()
+
+    def exists(self, owner=""):
+        """Whether ``owner`` has any entries."""
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM history WHERE owner = ? LIMIT 1", (owner,)).fetchone()
+        return row is not None
+
+    def _put_blob(self, blob):
+        digest = _blob_hash(blob)
+        self._db.execute("INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)", (digest, blob))
+        return digest
+
+    def _put_asset(self, key, data, config, qr_config, cache, assets):
+        # Id of the asset row for ``key``, adding it (and rendering the
+        # thumbnail) the first time the code is seen
+        known = self._db.execute("SELECT id, png FROM assets WHERE key = ?", (key,)).fetchone()
+        if known is not None:
+            if known[1] is None and assets:
+                png, svg = (self._put_blob(blob) for blob in assets)
+                self._db.execute("UPDATE assets SET png = ?, svg = ? WHERE id = ?", (png, svg, known[0]))
+            return known[0]
+        matrix = cache.matrix(data, qr_config) if cache is not None else None
+        thumbnail = self._put_blob(make_thumbnail(data, qr_config, matrix=matrix))
+        png, svg = (self._put_blob(blob) for blob in assets) if assets else (None, None)
+        row = self._db.execute(
+            "INSERT INTO assets (key, payload, config, thumbnail, png, svg) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, data, json.dumps(config), thumbnail, png, svg),
+        )
+        if self._trigram:
+            self._db.execute("INSERT INTO assets_search (rowid, payload) VALUES (?, ?)", (row.lastrowid, data))
+        return row.lastrowid
+
+    def add(self, category, inputs, data, qr_config, cache=None, assets=None, owner=""):
+        """Record a generation; ``assets`` is its ``(png_bytes, svg_bytes)`` to keep.
+
+        The thumbnail is only rendered, reusing the ``LayeredCache`` matrix
+        when given, the first time a payload and settings pair is seen.
+        """
+        key = render_key(data, qr_config)
+        inputs = tuple(sorted((k, v) for k, v in inputs.items() if v))
+        config = tuple(sorted(qr_config.items()))
+        timestamp = time.time()
+        with self._lock, self._db:
+            asset = self._put_asset(key, data, config, qr_config, cache, assets)
+            row = self._db.execute(
+                "INSERT INTO history (created, category, inputs, asset, owner) VALUES (?, ?, ?, ?, ?)",
+                (timestamp, category, json.dumps(inputs), asset, owner),
+            )
+            self._added += 1
+        if self._added % PRUNE_EVERY == 0:
+            self.prune()
+        return StoredEntry(self, row.lastrowid, category, inputs, config, key, None, timestamp)
+
+    def prune(self):
+        """Apply ``max_entries`` and ``max_age`` now; returns the number of entries deleted."""
+        with self._lock, self._db:
+            deleted = 0
+            if self.max_entries is not None:
+                deleted += self._db.execute(
+                    "DELETE FROM history WHERE id <= "
+                    "(SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            if self.max_age is not None:
+                deleted += self._db.execute(
+                    "DELETE FROM history WHERE created < ?", (time.time() - self.max_age,)
+                ).rowcount
+            if deleted:
+                self._drop_unused()
+        return deleted
+
+    def _drop_unused(self):
+        # Assets no entry points at, then blobs no asset uses
+        unused = self._db.execute(
+            "SELECT id, payload FROM assets a WHERE NOT EXISTS (SELECT 1 FROM history h WHERE h.asset = a.id)"
+        ).fetchall()
+        if not unused:
+            return
+        if self._trigram:
+            self._db.executemany(
+                "INSERT INTO assets_search (assets_search, rowid, payload) VALUES ('delete', ?, ?)", unused
+            )
+        self._db.executemany("DELETE FROM assets WHERE id = ?", [(id,) for id, _ in unused])
+        self._db.execute(
+            "DELETE FROM blobs WHERE hash NOT IN ("
+            "SELECT thumbnail FROM assets UNION SELECT png FROM assets WHERE png IS NOT NULL "
+            "UNION SELECT svg FROM assets WHERE svg IS NOT NULL)"
+        )
+
+    def _where(self, owner, before, category, search, since, until):
+        clauses, params = ["h.owner = ?"], [owner]
+        if before is not None:
+            clauses.append("h.id < ?")
+            params.append(before)
+        if category is not None:
+            clauses.append("h.category = ?")
+            params.append(category)
+        if since is not None:
+            clauses.append("h.created >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("h.created < ?")
+            params.append(until)
+        if search:
+            # Matched against the distinct payloads, not every entry; the unary
+            # + keeps SQLite on the asset index rather than scanning the owner's
+            clauses[0] = "+h.owner = ?"
+            if self._trigram and len(search) >= _TRIGRAM:
+                clauses.append("h.asset IN (SELECT rowid FROM assets_search WHERE assets_search MATCH ?)")
+                params.append('"' + search.replace('"', '""') + '"')
+            else:
+                escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                clauses.append("h.asset IN (SELECT id FROM assets WHERE payload LIKE ? ESCAPE '\\')")
+                params.append(f"%{escaped}%")
+        return " WHERE " + " AND ".join(clauses), params
+
+    def page(self, limit, before=None, category=None, search=None, since=None, until=None, owner=""):
+        """Up to ``limit`` entries newest first, with their thumbnails.
+
+        Pass the ``id`` of the last entry of a page as ``before`` to get the
+        next one. ``category`` matches exactly, ``search`` is a
+        case-insensitive substring of the payload, and ``since`` and
+        ``until`` bound the timestamp (seconds since the epoch).
+        """
+        where, params = self._where(owner, before, category, search, since, until)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT h.id, h.category, h.inputs, a.config, a.key, b.data, h.created "
+                "FROM history h JOIN assets a ON a.id = h.asset JOIN blobs b ON b.hash = a.thumbnail"
+                f"{where} ORDER BY h.id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [
+            StoredEntry(self, id, category, _pairs(inputs), _pairs(config), key, thumbnail, created)
+            for id, category, inputs, config, key, thumbnail, created in rows
+        ]
+
+    def count(self, category=None, search=None, since=None, until=None, owner=""):
+        where, params = self._where(owner, None, category, search, since, until)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM history h{where}", params).fetchone()[0]
+
+    def assets(self, key):
+        """The stored ``(png_bytes, svg_bytes)`` for ``key``, or ``None`` if they were not kept."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT p.data, s.data FROM assets a "
+                "JOIN blobs p ON p.hash = a.png JOIN blobs s ON s.hash = a.svg WHERE a.key = ?",
+                (key,),
+            ).fetchone()
+
+    def nbytes(self):
+        # Entries live in the database; only the object itself is in memory
+        return sys.getsizeof(self)
+
+    def metrics(self):
+        with self._lock:
+            entries, = self._db.execute("SELECT COUNT(*) FROM history").fetchone()
+            assets, = self._db.execute("SELECT COUNT(*) FROM assets").fetchone()
+            blobs, blob_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+            ).fetchone()
+        return {"entries": entries, "assets": assets, "blobs": blobs, "blob_bytes": blob_bytes}
+
+
+class OwnedHistory:
+    """One owner's entries in a shared ``PersistentHistory``, with the ``HistoryStore`` interface."""
+
+    def __init__(self, store, owner):
+        self.store = store
+        self.owner = owner
+
+    def __len__(self):
+        return self.count()
+
+    def __bool__(self):
+        return self.store.exists(self.owner)
+
+    def add(self, category, inputs, data, qr_config, cache=None, assets=None):
+        return self.store.add(category, inputs, data, qr_config, cache, assets, owner=self.owner)
+
+    def page(self, limit, before=None, category=None, search=None, since=None, until=None):
+        return self.store.page(limit, before, category, search, since, until, owner=self.owner)
+
+    def count(self, category=None, search=None, since=None, until=None):
+        return self.store.count(category, search, since, until, owner=self.owner)
+
+    def nbytes(self):
+        return sys.getsizeof(self)
@@ -0,0 +1,222 @@
+"""Opt-in per-stage timing and output-size histograms, with Prometheus and JSON export.
+
+Instrumentation is off unless ``METRICS.enable()`` is called or the
+``QRGEN_METRICS`` environment variable is set; while it is off an
+instrumented stage costs an attribute check and a no-op context manager. Stages are timed with
+``METRICS.stage(name)``:
+
+    with METRICS.stage("encode"):
+        ...
+
+Work done in another process is recorded with ``METRICS.capture()`` there
+and handed to ``METRICS.replay()`` in the process that owns the
+histograms. Stages may nest: ``encode`` covers ``segment`` and ``make``,
+``make`` includes ``mask``, and ``generate`` covers encoding and both
+renderers. ``profile`` runs one call under cProfile for diagnosing a
+single slow request.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+STAGE_SECONDS = "qrgen_stage_seconds"
+OUTPUT_BYTES = "qrgen_output_bytes"
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(9))
+
+# Metric name -> (label name, bucket upper bounds, help text)
+METRIC_TYPES = {
+    STAGE_SECONDS: ("stage", LATENCY_BUCKETS, "Time spent in each QR generation stage."),
+    OUTPUT_BYTES: ("format", SIZE_BUCKETS, "Size of rendered QR code images."),
+}
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Counts of observations per bucket, Prometheus style, plus their sum."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # The extra last bucket is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def quantile(self, q):
+        """Estimate like Prometheus' ``histogram_quantile``: linear within the bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.bounds, self.counts):
+            if seen + count >= rank and count:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        # Beyond the last finite bucket the best estimate is its bound
+        return self.bounds[-1]
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.cumulative())),
+            **{f"p{round(q * 100)}": self.quantile(q) for q in QUANTILES},
+        }
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(STAGE_SECONDS, self.name, time.perf_counter() - self.start)
+
+
+# Returned by Metrics.stage while nothing is being recorded
+_IDLE = nullcontext()
+
+
+class _Local(threading.local):
+    # A class default keeps the lookup cheap on threads that never capture
+    events = None
+
+
+class Metrics:
+    """Process-wide histograms keyed by metric name and label value."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._local = _Local()
+
+    @property
+    def active(self):
+        """Whether observations are being kept, here or in a ``capture``."""
+        return self.enabled or self._local.events is not None
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def stage(self, name):
+        if not self.enabled and self._local.events is None:
+            return _IDLE
+        return _StageTimer(self, name)
+
+    def observe(self, metric, label, value):
+        events = self._local.events
+        if events is not None:
+            events.append((metric, label, value))
+            return
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get((metric, label))
+            if histogram is None:
+                histogram = self._histograms[(metric, label)] = Histogram(METRIC_TYPES[metric][1])
+            histogram.observe(value)
+
+    def observe_size(self, fmt, nbytes):
+        if self.active:
+            self.observe(OUTPUT_BYTES, fmt, nbytes)
+
+    @contextmanager
+    def capture(self):
+        """Collect this thread's observations in a list instead of the histograms.
+
+        Used in worker processes; the list is picklable and goes to
+        ``replay`` in the parent.
+        """
+        previous = self._local.events
+        self._local.events = events = []
+        try:
+            yield events
+        finally:
+            self._local.events = previous
+
+    def replay(self, events):
+        for metric, label, value in events:
+            self.observe(metric, label, value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        """``{metric: {label: histogram dict}}``, ready for ``json.dumps``."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            result = {}
+            for (metric, label), histogram in items:
+                result.setdefault(metric, {})[label] = histogram.as_dict()
+        return result
+
+    def prometheus(self, counters=None):
+        """Histograms (and optional ``{name: value}`` counters) in Prometheus text format."""
+        lines = []
+        with self._lock:
+            for metric, (label_name, bounds, help_text) in METRIC_TYPES.items():
+                series = sorted((label, h) for (name, label), h in self._histograms.items() if name == metric)
+                if not series:
+                    continue
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for label, histogram in series:
+                    for bound, total in zip([*map(repr, bounds), "+Inf"], histogram.cumulative()):
+                        lines.append(f'{metric}_bucket{{{label_name}="{label}",le="{bound}"}} {total}')
+                    lines.append(f'{metric}_sum{{{label_name}="{label}"}} {histogram.sum!r}')
+                    lines.append(f'{metric}_count{{{label_name}="{label}"}} {histogram.count}')
+        for name, value in (counters or {}).items():
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics(enabled=os.environ.get("QRGEN_METRICS", "") not in ("", "0"))
+
+
+def profile(func, *args, limit=30, **kwargs):
+    """Run ``func`` under cProfile and return ``(result, stats text)``.
+
+    The text lists the ``limit`` most expensive functions by cumulative time.
+    """
+    # Imported here: pstats alone costs more than the rest of ``import qrgen``
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).strip_dirs().sort_stats("cumulative").print_stats(limit)
+    return result, stream.getvalue()
@@ -0,0 +1,20 @@
+"""Turning form inputs into the text that gets encoded."""
+from qrgen.categories import CATEGORIES, get_category
+from qrgen.metrics import METRICS
+
+
+# Function to format data based on category
+def format_qr_data(category, inputs):
+    spec = get_category(category)
+    if spec is None:
+        return ""
+    with METRICS.stage("format"):
+        return spec.format(inputs)
+
+
+def format_column(category, columns, size):
+    """Payloads for ``size`` rows of one category given as ``{field: values}`` columns."""
+    spec = get_category(category)
+    if spec is None:
+        return [""] * size
+    return spec.format_column(columns, size)
@@ -0,0 +1,134 @@
+"""Low-resolution draft previews of a code while its inputs are being edited.
+
+Every edit ``submit``s the formatted payload to a session's
+``DraftPreview``; nothing is encoded then. ``draft`` renders the latest
+payload only once it has gone ``debounce`` seconds without changing, so
+the payloads typed through on the way are never encoded, and a draft
+whose payload was replaced while it was rendering is dropped. A payload
+equal to the last draft's skips encoding and reuses its module matrix,
+so colour and border changes only redraw. Drafts are PNG only, at
+``DRAFT_BOX_SIZE`` pixels a module with the fastest compression; full-size
+images are left to the submit path.
+"""
+import threading
+import time
+
+from qrgen.core import DEFAULT_QR_CONFIG, PNG_COMPRESSION_LEVELS, CapacityError
+from qrgen.metrics import METRICS
+
+DRAFT_BOX_SIZE = 2
+DEFAULT_DEBOUNCE = 0.4
+
+# Settings that change the module matrix, as in qrgen.cache.ENCODE_KEYS
+_ENCODE_KEYS = ("version", "fixed_version", "error_correction")
+
+
+def draft_config(qr_config):
+    """``qr_config`` at draft resolution: small modules, fastest compression."""
+    return {
+        **DEFAULT_QR_CONFIG,
+        **qr_config,
+        "box_size": min(DRAFT_BOX_SIZE, qr_config.get("box_size", DRAFT_BOX_SIZE)),
+        "png_compress_level": PNG_COMPRESSION_LEVELS["Fastest"],
+    }
+
+
+class Draft:
+    """A rendered draft: its payload, PNG (``None`` if it does not fit) and version."""
+
+    __slots__ = ("data", "png", "version", "error")
+
+    def __init__(self, data, png, version, error=None):
+        self.data = data
+        self.png = png
+        self.version = version
+        self.error = error
+
+
+class DraftPreview:
+    """One session's draft previews; see the module docstring.
+
+    ``cache`` is an optional ``LayeredCache`` whose matrices drafts share,
+    so a submitted code does not encode a payload its draft already did.
+    """
+
+    def __init__(self, debounce=DEFAULT_DEBOUNCE, cache=None, clock=time.monotonic):
+        self.debounce = debounce
+        self._cache = cache
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Latest request: a sequence number, payload, draft settings and when it changed
+        self._seq = 0
+        self._request = None
+        self._changed = 0.0
+        self._drafted_seq = 0
+        self._draft = None
+        self._matrix_key = None
+        self._matrix = None
+        self.rendered = self.skipped_encodes = self.dropped = 0
+
+    def submit(self, data, qr_config):
+        """Record the payload being edited; returns ``True`` if it differs from the last one."""
+        request = (data, draft_config(qr_config)) if data else None
+        with self._lock:
+            if request == self._request:
+                return False
+            self._seq += 1
+            self._request = request
+            self._changed = self._clock()
+            return True
+
+    @property
+    def pending(self):
+        """Whether the latest payload has no draft yet."""
+        return self._drafted_seq != self._seq
+
+    def settles_in(self):
+        """Seconds until the latest payload has been unchanged for ``debounce``."""
+        return max(0.0, self._changed + self.debounce - self._clock())
+
+    def draft(self):
+        """The draft of the latest settled payload, rendering it if it has none yet.
+
+        Until the latest payload settles this is the previous draft (or
+        ``None``); ``pending`` tells whether a newer one is on its way.
+        """
+        with self._lock:
+            seq, request = self._seq, self._request
+            if seq == self._drafted_seq or self.settles_in() > 0:
+                return self._draft
+        if request is None:
+            draft = None
+        else:
+            draft = self._render(*request)
+        with self._lock:
+            if seq != self._seq:
+                # Edited again while rendering: keep showing the last current draft
+                self.dropped += 1
+                return self._draft
+            self._drafted_seq, self._draft = seq, draft
+            return draft
+
+    def _render(self, data, qr_config):
+        from qrgen.render import render_png
+
+        key = (data,) + tuple(qr_config[key] for key in _ENCODE_KEYS)
+        with METRICS.stage("draft"):
+            if key == self._matrix_key:
+                self.skipped_encodes += 1
+                matrix = self._matrix
+            else:
+                try:
+                    matrix = self._encode(data, qr_config)
+                except CapacityError as e:
+                    return Draft(data, None, None, str(e))
+                self._matrix_key, self._matrix = key, matrix
+            self.rendered += 1
+            return Draft(data, render_png(matrix, qr_config), matrix.version)
+
+    def _encode(self, data, qr_config):
+        if self._cache is not None:
+            return self._cache.matrix(data, qr_config)
+        from qrgen.encoding import encode_for_config
+
+        return encode_for_config(data, qr_config)
@@ -0,0 +1,220 @@
+"""Renderers that turn a ``ModuleMatrix`` into image bytes.
+
+Each renderer takes the matrix and the ``qr_config`` styling options
+(``box_size``, ``border``, ``fill_color``, ``back_color``) and returns bytes,
+so new output formats only need another entry in ``RENDERERS``.
+
+``RESTYLERS`` change the styling of an already rendered image without
+drawing it again: a PNG gets a new palette and an SVG new colour and size
+attributes. ``GEOMETRY_KEYS`` lists the settings a restyler cannot
+change, which must match between the rendered image and the new config.
+"""
+import io
+import re
+import struct
+import zlib
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from qrgen.core import PNG_COMPRESSION_LEVELS
+from qrgen.metrics import METRICS
+
+_HEX_COLOR = re.compile(r"^#([0-9a-fA-F]{3}|[0-9a-fA-F]{6})$")
+
+
+def parse_color(color):
+    """Return ``(r, g, b)`` for a ``#rgb``/``#rrggbb`` string or a CSS colour name."""
+    match = _HEX_COLOR.match(color)
+    if match:
+        digits = match.group(1)
+        if len(digits) == 3:
+            digits = "".join(d * 2 for d in digits)
+        return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+    # Named colours are rare; only they need Pillow's colour table
+    from PIL import ImageColor
+    return ImageColor.getrgb(color)[:3]
+
+
+def rasterize(matrix, box_size, border):
+    """Scale the module matrix up to a boolean pixel array, quiet zone included."""
+    pixels = np.repeat(np.repeat(matrix.modules, box_size, axis=0), box_size, axis=1)
+    return np.pad(pixels, border * box_size, constant_values=False)
+
+
+def png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+
+def _palette(qr_config):
+    back = parse_color(qr_config["back_color"])
+    fill = parse_color(qr_config["fill_color"])
+    return bytes(back + fill)
+
+
+def render_png(matrix, qr_config):
+    """Write a 1-bit, two-colour palette PNG without going through Pillow.
+
+    Each module row is expanded and bit-packed once. Its ``box_size - 1``
+    repeats are emitted with the PNG "Up" filter, which turns them into
+    zero bytes that zlib compresses almost for free.
+    """
+    box_size = qr_config["box_size"]
+    padded = np.pad(matrix.modules, qr_config["border"], constant_values=False)
+    lines = np.packbits(np.repeat(padded, box_size, axis=1), axis=1)
+    count, line_bytes = lines.shape
+
+    # Scanlines as (module row, repeat, filter byte + packed pixels)
+    scanlines = np.zeros((count, box_size, line_bytes + 1), dtype=np.uint8)
+    scanlines[:, 0, 1:] = lines
+    scanlines[:, 1:, 0] = 2
+
+    size = count * box_size
+    level = qr_config.get("png_compress_level", PNG_COMPRESSION_LEVELS["Balanced"])
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        png_chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 1, 3, 0, 0, 0)),
+        png_chunk(b"PLTE", _palette(qr_config)),
+        png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), level)),
+        png_chunk(b"IEND", b""),
+    ))
+
+
+def _svg_rectangles(modules):
+    # (row, col, width, height) rectangles that exactly cover the dark
+    # modules: each row's horizontal runs, extended downwards while the
+    # next row has a run with the same start and length
+    size = len(modules)
+    padded = np.zeros((size, size + 2), dtype=np.int8)
+    padded[:, 1:-1] = modules
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+
+    rectangles = []
+    above, current, current_row = {}, {}, -1
+    for row, start, width in zip(rows.tolist(), starts.tolist(), (ends - starts).tolist()):
+        if row != current_row:
+            above = current if row == current_row + 1 else {}
+            current, current_row = {}, row
+        rectangle = above.pop((start, width), None)
+        if rectangle is None:
+            rectangle = [row, start, width, 0]
+            rectangles.append(rectangle)
+        rectangle[3] += 1
+        current[start, width] = rectangle
+    return rectangles
+
+
+# Rectangles per write when streaming the path
+_SVG_CHUNK = 1024
+
+
+def write_svg(matrix, qr_config, stream):
+    """Write the symbol to a binary ``stream`` as an SVG of one path in module units.
+
+    Dark modules are merged into rectangles (see ``_svg_rectangles``), each
+    a closed subpath with integer coordinates relative to the one before.
+    The ``viewBox`` is the symbol plus its quiet zone, one unit per module;
+    ``box_size`` only sets the physical ``width`` and ``height``, at 1mm
+    per module for box size 10.
+    """
+    border = qr_config["border"]
+    side = matrix.size + 2 * border
+    length = _svg_length(side * qr_config["box_size"])
+    stream.write(
+        b"<?xml version='1.0' encoding='UTF-8'?>\n"
+        b'<svg width="' + length + b'" height="' + length + b'" version="1.1" '
+        b'viewBox="0 0 %d %d" xmlns="http://www.w3.org/2000/svg" shape-rendering="crispEdges">' % (side, side)
+        + b'<rect fill="' + _svg_attribute(qr_config["back_color"]) + b'" x="0" y="0" width="100%" height="100%"/>'
+        + b'<path id="qr-path" fill="' + _svg_attribute(qr_config["fill_color"]) + b'" d="'
+    )
+    # A subpath starts where the previous one was closed, i.e. at the
+    # previous rectangle's top-left corner
+    x = y = -border
+    rectangles = _svg_rectangles(matrix.modules)
+    for first in range(0, len(rectangles), _SVG_CHUNK):
+        parts = []
+        for row, col, width, height in rectangles[first:first + _SVG_CHUNK]:
+            parts.append(f"m{col - x} {row - y}h{width}v{height}h-{width}z")
+            x, y = col, row
+        stream.write("".join(parts).encode("ascii"))
+    stream.write(b'"/></svg>')
+
+
+def render_svg(matrix, qr_config):
+    """The SVG from ``write_svg`` as bytes."""
+    buffer = io.BytesIO()
+    write_svg(matrix, qr_config, buffer)
+    return buffer.getvalue()
+
+
+def recolor_png(png_bytes, qr_config):
+    """Swap the palette of a PNG from ``render_png``; the pixel data is reused as is."""
+    # PLTE precedes IDAT, so the first match is the chunk type
+    start = png_bytes.index(b"PLTE") - 4
+    (length,) = struct.unpack_from(">I", png_bytes, start)
+    end = start + length + 12
+    return png_bytes[:start] + png_chunk(b"PLTE", _palette(qr_config)) + png_bytes[end:]
+
+
+_SVG_SIZE = re.compile(rb'^(<svg width=")[^"]*(" height=")[^"]*"', re.MULTILINE)
+_SVG_BACKGROUND = re.compile(rb'(<rect fill=")[^"]*"')
+_SVG_FILL = re.compile(rb'(id="qr-path" fill=")[^"]*"')
+_SVG_VIEWBOX = re.compile(rb'viewBox="0 0 (\d+) ')
+
+
+def _svg_length(pixels):
+    # Same text as qrcode's SvgFragmentImage.units(): box_size 10 is 1mm
+    units = (Decimal(pixels) / 10).quantize(Decimal("0.001")).normalize()
+    return f"{units:f}mm".encode("ascii")
+
+
+def _svg_attribute(value):
+    return escape(value, {'"': "&quot;"}).encode("utf-8")
+
+
+def _resize_svg(svg_bytes, box_size):
+    # The viewBox side is the symbol size plus the quiet zone, in modules
+    side = int(_SVG_VIEWBOX.search(svg_bytes).group(1))
+    length = _svg_length(side * box_size)
+    return _SVG_SIZE.sub(lambda m: m.group(1) + length + m.group(2) + length + b'"', svg_bytes, count=1)
+
+
+def restyle_svg(svg_bytes, qr_config):
+    """Set the size and colours of an SVG from ``render_svg`` with the same border."""
+    svg_bytes = _resize_svg(svg_bytes, qr_config["box_size"])
+    back = _svg_attribute(qr_config["back_color"])
+    svg_bytes = _SVG_BACKGROUND.sub(lambda m: m.group(1) + back + b'"', svg_bytes, count=1)
+    fill = _svg_attribute(qr_config["fill_color"])
+    return _SVG_FILL.sub(lambda m: m.group(1) + fill + b'"', svg_bytes, count=1)
+
+
+RENDERERS = {
+    "png": render_png,
+    "svg": render_svg,
+}
+
+RESTYLERS = {
+    "png": recolor_png,
+    "svg": restyle_svg,
+}
+
+# Settings baked into a rendered image that its restyler cannot change
+GEOMETRY_KEYS = {
+    "png": ("box_size", "border", "png_compress_level"),
+    "svg": ("border",),
+}
+
+
+def render(matrix, qr_config, fmt):
+    with METRICS.stage(fmt):
+        image_bytes = RENDERERS[fmt](matrix, qr_config)
+    METRICS.observe_size(fmt, len(image_bytes))
+    return image_bytes
+
+
+def restyle(image_bytes, qr_config, fmt):
+    with METRICS.stage("restyle"):
+        return RESTYLERS[fmt](image_bytes, qr_config)
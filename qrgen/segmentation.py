@@ -0,0 +1,143 @@
+"""Split a payload into the cheapest mix of numeric, alphanumeric and byte segments.
+
+Phone numbers, ``tel:``/``sms:`` digits, crypto addresses and upper-case
+URLs often contain long runs that numeric or alphanumeric mode store far
+more compactly than byte mode. ``plan_segments`` runs a dynamic program
+over the payload's UTF-8 character runs for each group of versions that share
+character-count field widths, and keeps the plan with the smallest
+version.
+"""
+import re
+from bisect import bisect_left
+
+from qrcode import util
+
+_MODES = (util.MODE_NUMBER, util.MODE_ALPHA_NUM, util.MODE_8BIT_BYTE)
+
+# Maximal runs of digits, of other alphanumeric-mode characters, and of
+# everything else; the group that matched is the narrowest usable mode
+_RUNS = re.compile(rb"([0-9]+)|([A-Z $%*+\-./:]+)|([^0-9A-Z $%*+\-./:]+)")
+_RUN_MODES = {1: util.MODE_NUMBER, 2: util.MODE_ALPHA_NUM, 3: util.MODE_8BIT_BYTE}
+_INFINITY = float("inf")
+
+# Per-character cost in sixths of a bit: numeric packs 3 digits in 10
+# bits, alphanumeric 2 characters in 11, byte mode one byte in 8
+_CHAR_COST = {
+    util.MODE_NUMBER: 20,
+    util.MODE_ALPHA_NUM: 33,
+    util.MODE_8BIT_BYTE: 48,
+}
+
+# Versions sharing the same character-count field widths
+VERSION_CLASSES = ((1, 9), (10, 26), (27, 40))
+
+MODE_NAMES = {
+    util.MODE_NUMBER: "numeric",
+    util.MODE_ALPHA_NUM: "alphanumeric",
+    util.MODE_8BIT_BYTE: "byte",
+    util.MODE_KANJI: "kanji",
+}
+
+
+def segment_bits(mode, length):
+    """Bits taken by ``length`` characters in ``mode``, excluding the headers."""
+    if mode == util.MODE_NUMBER:
+        return 10 * (length // 3) + (0, 4, 7)[length % 3]
+    if mode == util.MODE_ALPHA_NUM:
+        return 11 * (length // 2) + 6 * (length % 2)
+    if mode == util.MODE_KANJI:
+        return 13 * length
+    return 8 * length
+
+
+def total_bits(segments, version):
+    return sum(
+        4 + util.length_in_bits(segment.mode, version) + segment_bits(segment.mode, len(segment))
+        for segment in segments
+    )
+
+
+def _optimal_runs(data, version):
+    # Within a run of one character class the per-character costs are
+    # linear, so an optimal encoding never switches mode inside a run and
+    # the dynamic program only has to choose a mode per run.
+    headers = {mode: (4 + util.length_in_bits(mode, version)) * 6 for mode in _MODES}
+    runs = [(m.start(), m.end(), _RUN_MODES[m.lastindex]) for m in _RUNS.finditer(data)]
+
+    cost = dict(headers)
+    back = []
+    for start, end, narrowest in runs:
+        length = end - start
+        new_cost, step = {}, {}
+        for mode in _MODES:
+            if mode < narrowest:
+                new_cost[mode] = _INFINITY
+                continue
+            best_prev, best = mode, cost[mode]
+            for prev in _MODES:
+                switched = cost[prev] + headers[mode]
+                if switched < best:
+                    best_prev, best = prev, switched
+            new_cost[mode] = best + length * _CHAR_COST[mode]
+            step[mode] = best_prev
+        cost = new_cost
+        back.append(step)
+
+    modes = [min(_MODES, key=cost.__getitem__)]
+    for step in reversed(back[1:]):
+        modes.append(step[modes[-1]])
+    modes.reverse()
+    return [(start, end, mode) for (start, end, _), mode in zip(runs, modes)]
+
+
+def optimal_segments(data, version):
+    """Cheapest list of ``QRData`` segments for ``data`` at ``version``'s field widths."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if not data:
+        return []
+    segments = []
+    seg_start, seg_mode = 0, None
+    for start, end, mode in _optimal_runs(data, version):
+        if mode != seg_mode and seg_mode is not None:
+            segments.append(util.QRData(data[seg_start:start], mode=seg_mode, check_data=False))
+            seg_start = start
+        seg_mode = mode
+    segments.append(util.QRData(data[seg_start:], mode=seg_mode, check_data=False))
+    return segments
+
+
+class SegmentPlan:
+    """Segments chosen for a payload, the version they fit and their bit count."""
+
+    __slots__ = ("segments", "version", "bits")
+
+    def __init__(self, segments, version, bits):
+        self.segments = segments
+        self.version = version
+        self.bits = bits
+
+    def summary(self):
+        """``[(mode name, character count), ...]`` in payload order."""
+        return [(MODE_NAMES[segment.mode], len(segment)) for segment in self.segments]
+
+
+def plan_segments(data, error_correction, start=1, header_bits=0):
+    """Segment ``data`` for the smallest version >= ``start`` that holds it.
+
+    ``header_bits`` are taken by a header in front of the segments, such as
+    a Structured Append header. ``version`` is ``None`` when even version 40
+    is too small; the plan then describes the version-40 segmentation.
+    """
+    limits = util.BIT_LIMIT_TABLE[error_correction]
+    plan = None
+    for first, last in VERSION_CLASSES:
+        if last < start:
+            continue
+        segments = optimal_segments(data, first)
+        bits = header_bits + total_bits(segments, first)
+        version = bisect_left(limits, bits, max(start, first), last + 1)
+        plan = SegmentPlan(segments, version if version <= last else None, bits)
+        if plan.version is not None:
+            break
+    return plan
@@ -0,0 +1,283 @@
+"""Local HTTP API for generating QR codes.
+
+    GET  /qr?category=Link&link=https://example.com&format=svg&box_size=8
+    POST /qr  {"category": "Link", "inputs": {"link": "..."}, "config": {...}, "format": "png"}
+    GET  /metrics                      (JSON; ?format=prometheus for text)
+
+Input fields are the ones ``format_qr_data`` understands; settings are the
+``qr_config`` keys, with ``error_correction`` and ``png_compression`` also
+accepted by name ("Medium", "Fastest", ...). Responses carry a strong ETag
+derived from the payload and settings hash, so a matching
+``If-None-Match`` is answered with 304 before anything is rendered.
+Rendering runs on a bounded process pool; when it is saturated the
+server answers 503.
+
+With ``--metrics`` per-stage timings from the workers are collected into
+the histograms of ``qrgen.metrics``. With ``--allow-profile`` a request
+carrying ``profile=1`` is rendered once under cProfile and answered with
+the profile text instead of the image.
+"""
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from qrgen.cache import LayeredCache, RenderCache, canonical_config, encode_key, render_key
+from qrgen.core import (
+    DEFAULT_QR_CONFIG,
+    ERROR_CORRECT_LEVELS,
+    MAX_BORDER,
+    MAX_BOX_SIZE,
+    PNG_COMPRESSION_LEVELS,
+    format_qr_data,
+    validate_inputs,
+)
+from qrgen.executor import DEFAULT_TIMEOUT, RenderExecutor, RenderTimeout, ServerBusy, render_formats
+from qrgen.metrics import METRICS, profile
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+_INT_SETTINGS = ("version", "box_size", "border", "png_compress_level")
+_NAMED_SETTINGS = {
+    "error_correction": ERROR_CORRECT_LEVELS,
+    "png_compression": PNG_COMPRESSION_LEVELS,
+}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_config(values):
+    """Build a ``qr_config`` from request values, ignoring unrelated keys."""
+    config = dict(DEFAULT_QR_CONFIG)
+    try:
+        for key in _INT_SETTINGS:
+            if key in values:
+                config[key] = int(values[key])
+        for key in ("fill_color", "back_color"):
+            if key in values:
+                config[key] = str(values[key])
+        if "fixed_version" in values:
+            value = values["fixed_version"]
+            config["fixed_version"] = value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+        for key, names in _NAMED_SETTINGS.items():
+            if key in values:
+                value = values[key]
+                target = "png_compress_level" if key == "png_compression" else key
+                config[target] = names[value] if value in names else int(value)
+    except (KeyError, ValueError, TypeError) as e:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid setting: {e}")
+    if not 1 <= config["version"] <= 40:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "version must be between 1 and 40")
+    if not 1 <= config["box_size"] <= MAX_BOX_SIZE:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"box_size must be between 1 and {MAX_BOX_SIZE}")
+    if not 0 <= config["border"] <= MAX_BORDER:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"border must be between 0 and {MAX_BORDER}")
+    return config
+
+
+class QRService:
+    """Validation, ETags, caching and the bounded render pool behind the handler."""
+
+    def __init__(self, workers=None, max_pending=None, timeout=DEFAULT_TIMEOUT, cache=None):
+        self.cache = cache if cache is not None else LayeredCache()
+        self.executor = RenderExecutor(workers, max_pending, timeout)
+        self.workers = self.executor.workers
+
+    def close(self):
+        self.executor.close()
+
+    def prepare(self, request):
+        category = str(request.get("category", ""))
+        inputs = request.get("inputs") or {}
+        if not isinstance(inputs, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "inputs must be an object")
+        inputs = {str(k): "" if v is None else str(v) for k, v in inputs.items()}
+        fmt = str(request.get("format", "png")).lower()
+        if fmt not in CONTENT_TYPES:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"format must be one of {', '.join(CONTENT_TYPES)}")
+        error = validate_inputs(category, inputs)
+        data = None if error else format_qr_data(category, inputs)
+        if error or not data:
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, error or "Unknown category or empty input")
+        qr_config = parse_config(request.get("config") or {})
+        key = f"{render_key(data, qr_config)}.{fmt}"
+        return data, qr_config, fmt, key
+
+    def render(self, data, qr_config, fmt, key):
+        qr_config = canonical_config(qr_config)
+        # Restyling a cached image of the same geometry needs no worker
+        try:
+            body = self.cache.lookup(data, qr_config, fmt)
+        except ValueError as e:
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, str(e))
+        if body is not None:
+            return body
+        matrix = self.cache.matrices.get(encode_key(data, qr_config))
+        try:
+            images, encoded, events = self.executor.submit(
+                render_formats, data, qr_config, [fmt], matrix, METRICS.enabled
+            )
+        except ServerBusy as e:
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, str(e))
+        except RenderTimeout as e:
+            raise RequestError(HTTPStatus.GATEWAY_TIMEOUT, str(e))
+        except Exception as e:
+            # Data overflow and bad colours surface here
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, str(e) or type(e).__name__)
+        METRICS.replay(events)
+        body = images[fmt]
+        self.cache.store(data, qr_config, fmt, body, encoded)
+        return body
+
+    def profile(self, data, qr_config, fmt):
+        """cProfile text for one uncached render, run on the calling thread."""
+        try:
+            with self.executor.slot():
+                _, text = profile(render_formats, data, canonical_config(qr_config), [fmt])
+        except ServerBusy as e:
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, str(e))
+        except Exception as e:
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, str(e) or type(e).__name__)
+        return text
+
+    def metrics(self):
+        return {
+            "cache": self.cache.metrics(),
+            "executor": self.executor.metrics(),
+            "stages": METRICS.snapshot(),
+        }
+
+    def prometheus(self):
+        cache = self.cache.metrics()
+        counters = {f"qrgen_cache_{name}_total": cache[name] for name in ("hits", "misses", "evictions")}
+        counters["qrgen_encode_cache_hits_total"] = cache["encode_hits"]
+        executor = self.executor.metrics()
+        counters["qrgen_rejected_total"] = executor["rejected"]
+        counters["qrgen_timeouts_total"] = executor["timeouts"]
+        return METRICS.prometheus(counters)
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in header.split(","))
+
+
+class QRRequestHandler(BaseHTTPRequestHandler):
+    server_version = "qrgen"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body=b"", content_type="application/json", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and status != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode("utf-8"))
+
+    def _handle_qr(self, request):
+        try:
+            data, qr_config, fmt, key = self.service.prepare(request)
+            if str(request.get("profile", "")).lower() in ("1", "true", "yes"):
+                if not self.server.allow_profile:
+                    raise RequestError(HTTPStatus.FORBIDDEN, "Profiling is disabled; start the server with --allow-profile")
+                text = self.service.profile(data, qr_config, fmt)
+                self._send(HTTPStatus.OK, text.encode("utf-8"), "text/plain; charset=utf-8")
+                return
+            etag = f'"{key}"'
+            headers = [("ETag", etag), ("Cache-Control", "public, max-age=86400")]
+            if _etag_matches(self.headers.get("If-None-Match"), etag):
+                self._send(HTTPStatus.NOT_MODIFIED, headers=headers)
+                return
+            body = self.service.render(data, qr_config, fmt, key)
+        except RequestError as e:
+            headers = [("Retry-After", "1")] if e.status == HTTPStatus.SERVICE_UNAVAILABLE else []
+            self._send(e.status, json.dumps({"error": str(e)}).encode("utf-8"), headers=headers)
+            return
+        self._send(HTTPStatus.OK, body, CONTENT_TYPES[fmt], headers)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            if dict(parse_qsl(url.query)).get("format") == "prometheus":
+                body = self.service.prometheus().encode("utf-8")
+                self._send(HTTPStatus.OK, body, "text/plain; version=0.0.4; charset=utf-8")
+            else:
+                self._send_json(HTTPStatus.OK, self.service.metrics())
+        elif url.path == "/qr":
+            params = dict(parse_qsl(url.query, keep_blank_values=True))
+            config_keys = set(_INT_SETTINGS) | set(_NAMED_SETTINGS) | {"fill_color", "back_color", "fixed_version"}
+            self._handle_qr({
+                "category": params.pop("category", ""),
+                "format": params.pop("format", "png"),
+                "profile": params.pop("profile", ""),
+                "config": {k: params.pop(k) for k in list(params) if k in config_keys},
+                "inputs": params,
+            })
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/qr":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("body must be a JSON object")
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": f"Invalid JSON: {e}"})
+            return
+        self._handle_qr(request)
+
+
+class QRServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False, allow_profile=False):
+        super().__init__(address, QRRequestHandler)
+        self.service = service
+        self.verbose = verbose
+        self.allow_profile = allow_profile
+
+
+def serve(host="127.0.0.1", port=8000, workers=None, max_pending=None, timeout=30.0,
+          cache_bytes=None, verbose=False, metrics=False, allow_profile=False):
+    if metrics:
+        METRICS.enable()
+    cache = LayeredCache(RenderCache(max_bytes=cache_bytes)) if cache_bytes else None
+    service = QRService(workers=workers, max_pending=max_pending, timeout=timeout, cache=cache)
+    server = QRServer((host, port), service, verbose=verbose, allow_profile=allow_profile)
+    print(f"Serving QR codes on http://{host}:{server.server_port}/qr "
+          f"({service.workers} render workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,353 @@
+"""Print sheets: many codes tiled onto page-sized canvases.
+
+A ``SheetLayout`` is a page size in millimetres divided into a grid of
+equal cells by margins and gutters, e.g. A4 with 3 x 7 labels. Each code
+is drawn from its ``ModuleMatrix`` straight onto a one-byte-per-pixel
+canvas at a whole number of pixels per module, centred in its cell with
+an optional caption underneath, so no per-code PNG is encoded or decoded.
+
+Pages go out as a multi-page PDF with one 1-bit image per page, or as a
+single PNG with the pages one below the other. Either way one page canvas
+is drawn, compressed into the output a band of rows at a time and reused
+for the next page, so a job of thousands of labels needs memory for one
+page only. A page canvas larger than ``MEMMAP_BYTES`` (a poster-sized
+layout at a high resolution) is backed by a memory-mapped temporary file.
+"""
+import os
+import struct
+import tempfile
+import zlib
+from contextlib import ExitStack
+
+import numpy as np
+
+from qrgen.core import DEFAULT_QR_CONFIG
+from qrgen.render import parse_color, png_chunk
+
+# Page width and height in millimetres
+PAGE_SIZES = {
+    "A4": (210.0, 297.0),
+    "Letter": (215.9, 279.4),
+}
+
+DEFAULT_DPI = 300
+
+# Page canvases above this many bytes live in a memory-mapped file
+MEMMAP_BYTES = 256 * 1024 * 1024
+
+# Canvas rows compressed at a time
+_BAND_ROWS = 1024
+
+_MM_PER_INCH = 25.4
+_PT_PER_INCH = 72
+
+
+class SheetLayout:
+    """A grid of ``columns`` x ``rows`` cells on a page.
+
+    ``margin`` and ``gutter`` are millimetres, either one value or
+    ``(horizontal, vertical)``; the grid is centred on the page, so for
+    label sheets they are the distance to the first label and between
+    labels. ``padding`` keeps codes away from the cell edges and
+    ``caption_size`` is the caption font size in points.
+    """
+
+    def __init__(self, page="A4", columns=3, rows=4, margin=10.0, gutter=5.0, padding=2.0,
+                 caption_size=8.0):
+        width, height = PAGE_SIZES[page] if isinstance(page, str) else page
+        margin_x, margin_y = margin if isinstance(margin, (tuple, list)) else (margin, margin)
+        gutter_x, gutter_y = gutter if isinstance(gutter, (tuple, list)) else (gutter, gutter)
+        self.page = (width, height)
+        self.columns = columns
+        self.rows = rows
+        self.padding = padding
+        self.caption_size = caption_size
+        self.cell = (
+            (width - 2 * margin_x - (columns - 1) * gutter_x) / columns,
+            (height - 2 * margin_y - (rows - 1) * gutter_y) / rows,
+        )
+        self.pitch = (self.cell[0] + gutter_x, self.cell[1] + gutter_y)
+        self.origin = (
+            (width - columns * self.cell[0] - (columns - 1) * gutter_x) / 2,
+            (height - rows * self.cell[1] - (rows - 1) * gutter_y) / 2,
+        )
+        if self.cell[0] <= 2 * padding or self.cell[1] <= 2 * padding:
+            raise ValueError("Margins and gutters leave no room for the cells")
+
+    @property
+    def per_page(self):
+        return self.columns * self.rows
+
+
+LAYOUTS = {
+    "a4-3x4": SheetLayout("A4", 3, 4),
+    "a4-4x6": SheetLayout("A4", 4, 6, margin=8.0, gutter=4.0),
+    "letter-3x4": SheetLayout("Letter", 3, 4),
+    "letter-4x5": SheetLayout("Letter", 4, 5, margin=8.0, gutter=4.0),
+    # 63.5 x 38.1 mm labels, 21 per A4 sheet
+    "avery-l7160": SheetLayout("A4", 3, 7, margin=(7.25, 15.15), gutter=(2.5, 0.0), padding=1.5,
+                               caption_size=6.0),
+    # 1 x 2 5/8 inch address labels, 30 per Letter sheet
+    "avery-5160": SheetLayout("Letter", 3, 10, margin=(4.7625, 12.7), gutter=(3.175, 0.0), padding=1.0,
+                              caption_size=5.0),
+}
+
+
+def get_layout(layout):
+    """A ``SheetLayout`` for a ``LAYOUTS`` name, or ``layout`` itself."""
+    if isinstance(layout, SheetLayout):
+        return layout
+    try:
+        return LAYOUTS[layout]
+    except KeyError:
+        raise ValueError(f"Unknown sheet layout {layout!r}; choose from {', '.join(LAYOUTS)}") from None
+
+
+def _new_canvas(height, width, memmap=None):
+    # True is a dark pixel; both zero-filled arrays start out blank
+    if memmap is None:
+        memmap = height * width > MEMMAP_BYTES
+    if not memmap:
+        return np.zeros((height, width), dtype=bool)
+    backing = tempfile.TemporaryFile()
+    backing.truncate(height * width)
+    canvas = np.memmap(backing, dtype=bool, mode="r+", shape=(height, width))
+    # The mapping stays valid after the file object is gone
+    backing.close()
+    return canvas
+
+
+class _Grid:
+    # Layout converted to pixels at one resolution
+    def __init__(self, layout, dpi, captions):
+        px = dpi / _MM_PER_INCH
+        self.layout = layout
+        self.width = round(layout.page[0] * px)
+        self.height = round(layout.page[1] * px)
+        self.cell_width = int(layout.cell[0] * px)
+        self.cell_height = int(layout.cell[1] * px)
+        self.padding = round(layout.padding * px)
+        self.cells = [
+            (round((layout.origin[0] + column * layout.pitch[0]) * px),
+             round((layout.origin[1] + row * layout.pitch[1]) * px))
+            for row in range(layout.rows) for column in range(layout.columns)
+        ]
+        self.font = None
+        self.caption_height = 0
+        if captions:
+            from PIL import ImageFont
+
+            font_px = max(round(layout.caption_size * dpi / _PT_PER_INCH), 6)
+            self.font = ImageFont.load_default(size=font_px)
+            self.caption_height = round(font_px * 1.3)
+            self._glyphs = {}
+
+    def code_area(self):
+        return min(self.cell_width, self.cell_height - self.caption_height) - 2 * self.padding
+
+    def _glyph(self, char):
+        # Each character is rasterised once; captions are composed from the
+        # cached bitmaps, which skips kerning but costs no FreeType calls
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            from PIL import Image, ImageDraw
+
+            advance = self.font.getlength(char)
+            image = Image.new("L", (int(advance) + self.font.size // 2 + 1, self.caption_height))
+            ImageDraw.Draw(image).text((0, 0), char, fill=255, font=self.font)
+            glyph = self._glyphs[char] = (np.asarray(image) > 127, advance)
+        return glyph
+
+    def caption_mask(self, text, width):
+        glyphs = [self._glyph(char) for char in " ".join(text.split())]
+        ellipsis, ellipsis_advance = self._glyph("…")
+        if sum(advance for _, advance in glyphs) > width:
+            room, total = width - ellipsis_advance, 0.0
+            for count, (_, advance) in enumerate(glyphs):
+                total += advance
+                if total > room:
+                    break
+            glyphs = glyphs[:count] + [(ellipsis, ellipsis_advance)]
+        mask = np.zeros((self.caption_height, width), dtype=bool)
+        x = 0.0
+        for bitmap, advance in glyphs:
+            left = round(x)
+            if left >= width:
+                break
+            part = bitmap[:, :width - left]
+            mask[:, left:left + part.shape[1]] |= part
+            x += advance
+        return mask[:, :min(int(x) + 1, width)]
+
+    def draw(self, canvas, slot, matrix, caption, border):
+        """Draw one code and its caption into cell ``slot`` of a page canvas."""
+        x, y = self.cells[slot]
+        modules = matrix.modules
+        count = len(modules)
+        box = self.code_area() // (count + 2 * border)
+        if box < 1:
+            raise ValueError(
+                f"A version {matrix.version} code does not fit a "
+                f"{self.layout.cell[0]:.1f} x {self.layout.cell[1]:.1f} mm cell at this resolution"
+            )
+        side = (count + 2 * border) * box
+        block = side + (self.caption_height if self.font else 0)
+        left = x + (self.cell_width - side) // 2 + border * box
+        upper = y + (self.cell_height - block) // 2 + border * box
+        # Splitting each axis of the target region into (module, pixel)
+        # makes the scale-up a broadcast assignment, with no temporary copy
+        region = canvas[upper:upper + count * box, left:left + count * box]
+        region.reshape(count, box, count, box)[...] = modules[:, None, :, None]
+
+        if self.font and caption:
+            width = self.cell_width - 2 * self.padding
+            mask = self.caption_mask(caption, width)
+            height, text_width = mask.shape
+            caption_left = x + (self.cell_width - text_width) // 2
+            caption_top = y + (self.cell_height - block) // 2 + side
+            canvas[caption_top:caption_top + height, caption_left:caption_left + text_width] |= mask
+
+
+def max_symbol_size(layout, border, dpi=DEFAULT_DPI, captions=True):
+    """Largest ``ModuleMatrix.size`` that fits a cell of ``layout`` with at least one pixel per module."""
+    grid = _Grid(get_layout(layout), dpi, captions)
+    return grid.code_area() - 2 * border
+
+
+def _bands(canvas):
+    # Bit-packed rows, _BAND_ROWS at a time; each row is padded to whole
+    # bytes, as both PNG and PDF expect
+    for start in range(0, len(canvas), _BAND_ROWS):
+        yield np.packbits(canvas[start:start + _BAND_ROWS], axis=1)
+
+
+def _pages(grid, items, canvas, border):
+    # The canvas after each page is drawn, then cleared for the next one;
+    # always at least one page
+    slot = 0
+    for matrix, caption in items:
+        if slot == grid.layout.per_page:
+            yield canvas
+            canvas[...] = False
+            slot = 0
+        grid.draw(canvas, slot, matrix, caption, border)
+        slot += 1
+    yield canvas
+
+
+def _write_png(stream, width, height, bands, palette, level):
+    stream.write(b"\x89PNG\r\n\x1a\n")
+    stream.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 1, 3, 0, 0, 0)))
+    stream.write(png_chunk(b"PLTE", palette))
+    compressor = zlib.compressobj(level)
+    for band in bands:
+        # Filter type 0 (None) in front of every scanline
+        rows = np.zeros((len(band), band.shape[1] + 1), dtype=np.uint8)
+        rows[:, 1:] = band
+        data = compressor.compress(rows.tobytes())
+        if data:
+            stream.write(png_chunk(b"IDAT", data))
+    stream.write(png_chunk(b"IDAT", compressor.flush()))
+    stream.write(png_chunk(b"IEND", b""))
+
+
+class _PdfWriter:
+    """Pages of one full-page 1-bit image each, written as they are added."""
+
+    def __init__(self, stream, page_size, palette):
+        self.stream = stream
+        self.offset = 0
+        self.offsets = {}
+        self.pages = []
+        self.page_size = [round(mm / _MM_PER_INCH * _PT_PER_INCH, 2) for mm in page_size]
+        self.colorspace = f"[/Indexed /DeviceRGB 1 <{palette.hex()}>]"
+        # Objects 1 and 2 are the catalog and page tree, written last
+        self.next_id = 3
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.offset += len(data)
+
+    def _object(self, obj_id, body, stream=None):
+        self.offsets[obj_id] = self.offset
+        self._write(f"{obj_id} 0 obj\n".encode("ascii") + body)
+        if stream is not None:
+            self._write(b"\nstream\n")
+            self._write(stream)
+            self._write(b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_page(self, canvas, level):
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        height, width = canvas.shape
+        compressor = zlib.compressobj(level)
+        data = b"".join(compressor.compress(band.tobytes()) for band in _bands(canvas)) + compressor.flush()
+        self._object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace {self.colorspace} /BitsPerComponent 1 /Filter /FlateDecode "
+            f"/Length {len(data)} >>"
+        ).encode("ascii"), data)
+        page_width, page_height = self.page_size
+        content = f"q {page_width} 0 0 {page_height} 0 0 cm /Im0 Do Q".encode("ascii")
+        self._object(content_id, f"<< /Length {len(content)} >>".encode("ascii"), content)
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode("ascii"))
+        self.pages.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.pages)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode("ascii"))
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self.offset
+        lines = [f"xref\n0 {self.next_id}\n", "0000000000 65535 f \n"]
+        lines.extend(f"{self.offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, self.next_id))
+        lines.append(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self._write("".join(lines).encode("ascii"))
+
+
+def render_sheet(items, output, layout="a4-3x4", qr_config=None, fmt=None, dpi=DEFAULT_DPI,
+                 captions=True, memmap=None):
+    """Tile ``(matrix, caption)`` pairs onto pages and write them to ``output``.
+
+    ``output`` is a path or a binary file object; ``fmt`` is ``"pdf"`` or
+    ``"png"`` and defaults to the path's extension, else PDF. ``layout`` is
+    a ``LAYOUTS`` name or a ``SheetLayout``. Colours, quiet zone and PNG
+    compression come from ``qr_config``; ``box_size`` does not apply, as
+    each code is scaled to fill its cell. For PNG the items are collected
+    first, as the image height depends on their number. ``memmap`` forces
+    the page canvas into (``True``) or out of (``False``) a memory-mapped
+    file. Returns the number of pages.
+    """
+    qr_config = {**DEFAULT_QR_CONFIG, **(qr_config or {})}
+    if fmt is None:
+        fmt = "png" if isinstance(output, (str, os.PathLike)) and str(output).lower().endswith(".png") else "pdf"
+    if fmt not in ("pdf", "png"):
+        raise ValueError(f"Unknown sheet format {fmt!r}")
+    grid = _Grid(get_layout(layout), dpi, captions)
+    palette = bytes(parse_color(qr_config["back_color"]) + parse_color(qr_config["fill_color"]))
+    level = qr_config["png_compress_level"]
+    border = qr_config["border"]
+
+    with ExitStack() as stack:
+        stream = output
+        if isinstance(output, (str, os.PathLike)):
+            stream = stack.enter_context(open(output, "wb"))
+
+        canvas = _new_canvas(grid.height, grid.width, memmap)
+        if fmt == "png":
+            # The image height depends on the number of codes
+            items = list(items)
+            pages = max(-(-len(items) // grid.layout.per_page), 1)
+            bands = (band for page in _pages(grid, items, canvas, border) for band in _bands(page))
+            _write_png(stream, grid.width, pages * grid.height, bands, palette, level)
+            return pages
+
+        writer = _PdfWriter(stream, grid.layout.page, palette)
+        for page in _pages(grid, items, canvas, border):
+            writer.add_page(page, level)
+        writer.close()
+        return len(writer.pages)
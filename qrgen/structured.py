@@ -0,0 +1,100 @@
+"""One payload as a set of linked Structured Append QR codes.
+
+``render_structured`` splits a payload with ``split_structured`` and
+encodes and renders the parts on an executor, so the symbols of a long
+payload are drawn (and, if asked, verified) in parallel. ``tile`` lays the symbols out on one module
+grid that the ordinary renderers draw as a single image, and
+``write_structured`` puts the parts and the tiled image in an archive.
+"""
+import math
+
+import numpy as np
+
+from qrgen.archive import open_archive
+from qrgen.core import DEFAULT_QR_CONFIG
+from qrgen.encoding import MAX_SYMBOLS, ModuleMatrix, encode_part, split_structured
+from qrgen.render import render
+
+FORMATS = ("png", "svg")
+
+
+def render_part(part, qr_config, formats, verify=False):
+    """Encode and render one ``StructuredPart``; returns ``(matrix, {fmt: bytes}, problem)``.
+
+    ``problem`` is ``verify_png``'s verdict on the PNG with ``verify``, else ``None``.
+    """
+    matrix = encode_part(part, qr_config["error_correction"])
+    images = {fmt: render(matrix, qr_config, fmt) for fmt in formats}
+    problem = None
+    if verify and "png" in images:
+        from qrgen.verify import verify_png
+
+        problem = verify_png(images["png"], matrix, qr_config)
+    return matrix, images, problem
+
+
+def render_structured(data, qr_config, formats=FORMATS, max_symbols=MAX_SYMBOLS, executor=None,
+                      verify=False):
+    """Split ``data`` into at most ``max_symbols`` linked codes and render each one.
+
+    ``version`` and ``fixed_version`` in ``qr_config`` bound the parts'
+    versions as for a single code. ``executor`` is anything with a
+    ``map(fn, *iterables)`` method, such as a ``RenderExecutor`` or a
+    ``concurrent.futures`` executor; without one the parts are rendered in
+    turn. Returns ``[(matrix, {fmt: bytes}, problem), ...]`` in symbol
+    order; with ``verify`` each part's PNG is read back where it was
+    rendered and ``problem`` says why it may not scan, see ``render_part``.
+    """
+    qr_config = {**DEFAULT_QR_CONFIG, **qr_config}
+    parts = split_structured(
+        data,
+        qr_config["error_correction"],
+        qr_config["version"],
+        max_symbols,
+        fixed=qr_config.get("fixed_version", False),
+    )
+    mapper = map if executor is None else executor.map
+    count = len(parts)
+    return list(mapper(render_part, parts, [qr_config] * count, [tuple(formats)] * count, [verify] * count))
+
+
+def tile(matrices, border):
+    """One square ``ModuleMatrix`` with ``matrices`` left to right, top to bottom.
+
+    Symbols sit in equal cells, centred, ``border`` modules apart, which is
+    the quiet zone each one needs; the renderers add the outer one.
+    """
+    columns = math.ceil(math.sqrt(len(matrices)))
+    cell = max(matrix.size for matrix in matrices)
+    side = columns * (cell + border) - border
+    grid = np.zeros((side, side), dtype=bool)
+    for position, matrix in enumerate(matrices):
+        row, column = divmod(position, columns)
+        top = row * (cell + border) + (cell - matrix.size) // 2
+        left = column * (cell + border) + (cell - matrix.size) // 2
+        grid[top:top + matrix.size, left:left + matrix.size] = matrix.modules
+    grid.flags.writeable = False
+    return ModuleMatrix(None, matrices[0].error_correction, grid)
+
+
+def write_structured(output, rendered, qr_config, archive=None, tiled=None):
+    """Write the parts from ``render_structured`` and their tiled image to an archive.
+
+    Entries are ``part_01_of_NN.<fmt>`` for each part and format, in
+    scanning order, and ``tiled.<fmt>`` with all of them. ``tiled`` holds
+    tiled images already rendered, ``{fmt: bytes}``; the others are drawn here.
+    """
+    qr_config = {**DEFAULT_QR_CONFIG, **qr_config}
+    total = len(rendered)
+    tiled = dict(tiled or {})
+    grid = None
+    with open_archive(output, archive) as sink:
+        for index, (_, images, _) in enumerate(rendered, start=1):
+            for fmt, data in images.items():
+                sink.add(f"part_{index:02d}_of_{total:02d}.{fmt}", data, compress=fmt == "svg")
+        for fmt in rendered[0][1]:
+            if fmt not in tiled:
+                if grid is None:
+                    grid = tile([matrix for matrix, _, _ in rendered], qr_config["border"])
+                tiled[fmt] = render(grid, qr_config, fmt)
+            sink.add(f"tiled.{fmt}", tiled[fmt], compress=fmt == "svg")
@@ -0,0 +1,20 @@
+"""Per-category input validation."""
+from qrgen.categories import get_category
+from qrgen.metrics import METRICS
+
+
+# Function to validate inputs
+def validate_inputs(category, inputs):
+    spec = get_category(category)
+    if spec is None:
+        return None
+    with METRICS.stage("validate"):
+        return spec.validate(inputs)
+
+
+def validate_column(category, columns, size):
+    """Error message or ``None`` for ``size`` rows of one category given as columns."""
+    spec = get_category(category)
+    if spec is None:
+        return [None] * size
+    return spec.validate_column(columns, size)
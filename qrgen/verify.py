@@ -0,0 +1,146 @@
+"""Check that a rendered code will scan: colour contrast and a raster round trip.
+
+``check_colors`` rejects colour pairs scanners struggle with: a QR colour
+that is not darker than the background, or too little contrast between
+them. ``verify_png`` also reads a PNG back, samples the centre pixel of
+every module (quiet zone included) on the grid given by ``box_size`` and
+``border``, and compares the result with the encoded ``ModuleMatrix``, so
+a broken renderer, restyler or setting is caught before the image ships.
+
+Both return an error message or ``None``, like ``validate_inputs``. PNGs
+from ``render_png`` are decoded with NumPy and only the sampled rows are
+unpacked, so verifying costs a fraction of rendering.
+"""
+import io
+import struct
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from qrgen.metrics import METRICS
+from qrgen.render import parse_color
+
+# Lowest WCAG contrast ratio between QR colour and background that is
+# accepted; black on white is 21:1
+MIN_CONTRAST = 3.0
+
+
+def relative_luminance(rgb):
+    """WCAG relative luminance of an ``(r, g, b)`` colour with 0-255 channels."""
+    channels = [c / 255 for c in rgb]
+    r, g, b = [c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4 for c in channels]
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+
+def contrast_ratio(fill_color, back_color):
+    """WCAG contrast ratio of two colours, from 1 (none) to 21."""
+    fill = relative_luminance(parse_color(fill_color))
+    back = relative_luminance(parse_color(back_color))
+    return (max(fill, back) + 0.05) / (min(fill, back) + 0.05)
+
+
+@lru_cache(maxsize=256)
+def _color_problem(fill_color, back_color):
+    if relative_luminance(parse_color(fill_color)) >= relative_luminance(parse_color(back_color)):
+        return "QR colour is not darker than the background; most scanners need dark modules on a light background"
+    ratio = contrast_ratio(fill_color, back_color)
+    if ratio < MIN_CONTRAST:
+        return f"Contrast between QR colour and background is {ratio:.1f}:1; at least {MIN_CONTRAST:g}:1 is needed"
+    return None
+
+
+def check_colors(qr_config):
+    """Error message if the QR and background colours are unlikely to scan, else ``None``."""
+    return _color_problem(qr_config["fill_color"], qr_config["back_color"])
+
+
+def _read_chunks(png_bytes):
+    position = 8
+    while position < len(png_bytes):
+        length, tag = struct.unpack_from(">I4s", png_bytes, position)
+        yield tag, png_bytes[position + 8:position + 8 + length]
+        position += length + 12
+
+
+def _palette_rows(png_bytes, rows):
+    # Palette indices of the given pixel rows of a 1-bit palette PNG as
+    # written by render_png (filter types None and Up only), or None for
+    # any other kind of PNG
+    header, palette, data = None, None, []
+    for tag, body in _read_chunks(png_bytes):
+        if tag == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif tag == b"PLTE":
+            palette = [tuple(body[i:i + 3]) for i in range(0, len(body), 3)]
+        elif tag == b"IDAT":
+            data.append(body)
+    width, height, depth, color_type, _, _, interlace = header
+    if (depth, color_type, interlace) != (1, 3, 0):
+        return None
+    line_bytes = (width + 7) // 8
+    lines = np.frombuffer(zlib.decompress(b"".join(data)), dtype=np.uint8).reshape(height, line_bytes + 1)
+    filters = lines[:, 0]
+    if not np.isin(filters, (0, 2)).all():
+        return None
+    # An Up line adds the line above (mod 256); rebuild each sampled row as
+    # the sum since the last unfiltered line
+    sums = np.cumsum(lines[:, 1:], axis=0, dtype=np.uint8)
+    last_plain = np.maximum.accumulate(np.where(filters == 0, np.arange(height), 0))[rows]
+    before = np.where(last_plain[:, None] > 0, sums[np.maximum(last_plain - 1, 0)], 0)
+    packed = sums[rows] - before.astype(np.uint8)
+    return np.unpackbits(packed, axis=1)[:, :width], palette
+
+
+def _luminance_rows(png_bytes, rows):
+    # Any other PNG: decode it fully with Pillow
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(png_bytes)).convert("RGB")
+    pixels = np.asarray(image, dtype=np.float64)[rows] / 255
+    linear = np.where(pixels <= 0.04045, pixels / 12.92, ((pixels + 0.055) / 1.055) ** 2.4)
+    return linear @ [0.2126, 0.7152, 0.0722]
+
+
+def sample_modules(png_bytes, qr_config, size):
+    """Dark/light of every module of a ``size``-module symbol plus its quiet zone, read from a PNG.
+
+    Returns the boolean grid, or an error message if the image does not
+    have the dimensions ``box_size`` and ``border`` imply.
+    """
+    box_size, border = qr_config["box_size"], qr_config["border"]
+    pixels = (size + 2 * border) * box_size
+    # IHDR is always the first chunk
+    width, height = struct.unpack_from(">II", png_bytes, 16)
+    if (width, height) != (pixels, pixels):
+        return f"Image is {width}x{height} pixels; expected {pixels} square"
+    centres = np.arange(size + 2 * border) * box_size + box_size // 2
+    decoded = _palette_rows(png_bytes, centres)
+    if decoded is not None:
+        indices, palette = decoded
+        luminance = np.array([relative_luminance(color) for color in palette])
+        samples = luminance[indices[:, centres]]
+    else:
+        samples = _luminance_rows(png_bytes, centres)[:, centres]
+    # Dark is anything nearer the darkest sample than the lightest
+    return samples < (samples.min() + samples.max()) / 2
+
+
+def verify_png(png_bytes, matrix, qr_config):
+    """Error message if ``png_bytes`` will not scan as ``matrix``, else ``None``."""
+    with METRICS.stage("verify"):
+        problem = check_colors(qr_config)
+        if problem:
+            return problem
+        sampled = sample_modules(png_bytes, qr_config, matrix.size)
+        if isinstance(sampled, str):
+            return sampled
+        expected = np.pad(matrix.modules, qr_config["border"], constant_values=False)
+        wrong = np.argwhere(sampled != expected)
+        if len(wrong):
+            row, col = wrong[0] - qr_config["border"]
+            return (
+                f"{len(wrong)} of {expected.size} modules read back wrong "
+                f"(first at row {row}, column {col})"
+            )
+        return None
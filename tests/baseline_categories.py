@@ -0,0 +1,175 @@
+"""The category if/elif chains the registry replaced, kept as the reference it is tested against.
+
+Copied unchanged from ``qrgen/payloads.py`` and ``qrgen/validation.py``
+before ``qrgen.categories``.
+"""
+import re
+from datetime import datetime
+
+CATEGORIES = [
+    "Number", "WiFi Password", "Link", "WhatsApp", "Text",
+    "Email", "Phone", "SMS", "Location", "Event",
+    "Social Media", "vCard", "Cryptocurrency", "2D Barcode"
+]
+
+
+# Function to format data based on category
+def format_qr_data(category, inputs):
+    if category == "Number":
+        value = inputs.get("number", "").strip()
+        if value:
+            return f"number:{value}"
+        return ""
+    elif category == "WiFi Password":
+        ssid = inputs.get("wifi_ssid", "").strip()
+        password = inputs.get("wifi_password", "").strip()
+        encryption = inputs.get("wifi_encryption", "WPA")
+        if ssid and password:
+            return f"WIFI:S:{ssid};T:{encryption};P:{password};;"
+        return ""
+    elif category == "Link":
+        url = inputs.get("link", "").strip()
+        if url:
+            return url
+        return ""
+    elif category == "WhatsApp":
+        phone = inputs.get("whatsapp_number", "").replace(" ", "").replace("-", "")
+        if phone:
+            return f"https://wa.me/{phone}"
+        return ""
+    elif category == "Text":
+        value = inputs.get("text", "").strip()
+        if value:
+            return f"text:{value}"
+        return ""
+    elif category == "Email":
+        email = inputs.get("email", "").strip()
+        subject = inputs.get("email_subject", "").strip()
+        body = inputs.get("email_body", "").strip()
+        if email:
+            formatted = f"mailto:{email}?subject={subject}&body={body}" if subject or body else f"mailto:{email}"
+            return formatted
+        return ""
+    elif category == "Phone":
+        phone = inputs.get("phone_number", "").replace(" ", "").replace("-", "")
+        if phone:
+            return f"tel:{phone}"
+        return ""
+    elif category == "SMS":
+        phone = inputs.get("sms_number", "").replace(" ", "").replace("-", "")
+        message = inputs.get("sms_message", "").strip()
+        if phone:
+            formatted = f"sms:{phone}?body={message}" if message else f"sms:{phone}"
+            return formatted
+        return ""
+    elif category == "Location":
+        location = inputs.get("manual_location", "").strip()
+        if location:
+            return f"location:{location}"
+        return ""
+    elif category == "Event":
+        title = inputs.get("event_title", "").strip()
+        start = inputs.get("event_start", "").strip()
+        end = inputs.get("event_end", "").strip() or start
+        location = inputs.get("event_location", "").strip()
+        description = inputs.get("event_description", "").strip()
+        if title and start:
+            try:
+                start_dt = datetime.strptime(start, "%Y-%m-%dT%H:%M")
+                end_dt = datetime.strptime(end, "%Y-%m-%dT%H:%M")
+                ical = (
+                    f"BEGIN:VCALENDAR\n"
+                    f"VERSION:2.0\n"
+                    f"BEGIN:VEVENT\n"
+                    f"SUMMARY:{title}\n"
+                    f"DTSTART:{start_dt.strftime('%Y%m%dT%H%M%S')}\n"
+                    f"DTEND:{end_dt.strftime('%Y%m%dT%H%M%S')}\n"
+                    f"LOCATION:{location}\n"
+                    f"DESCRIPTION:{description}\n"
+                    f"END:VEVENT\n"
+                    f"END:VCALENDAR"
+                )
+                return ical
+            except ValueError:
+                return ""
+        return ""
+    elif category == "Social Media":
+        platform = inputs.get("social_platform", "twitter")
+        username = inputs.get("social_username", "").strip()
+        if username:
+            base_urls = {
+                "twitter": "https://twitter.com/",
+                "instagram": "https://instagram.com/",
+                "facebook": "https://facebook.com/",
+                "linkedin": "https://linkedin.com/in/",
+                "youtube": "https://youtube.com/@",
+                "tiktok": "https://tiktok.com/@",
+                "snapchat": "https://snapchat.com/add/",
+                "pinterest": "https://pinterest.com/"
+            }
+            return f"{base_urls.get(platform, 'https://')}{username}"
+        return ""
+    elif category == "vCard":
+        name = inputs.get("vcard_name", "").strip()
+        phone = inputs.get("vcard_phone", "").strip()
+        email = inputs.get("vcard_email", "").strip()
+        if name:
+            vcard = [
+                "BEGIN:VCARD",
+                "VERSION:3.0",
+                f"FN:{name}",
+            ]
+            if phone:
+                vcard.append(f"TEL:{phone}")
+            if email:
+                vcard.append(f"EMAIL:{email}")
+            vcard.append("END:VCARD")
+            return "\n".join(vcard)
+        return ""
+    elif category == "Cryptocurrency":
+        crypto_type = inputs.get("crypto_type", "bitcoin")
+        address = inputs.get("crypto_address", "").strip()
+        if address:
+            return f"{crypto_type}:{address}"
+        return ""
+    elif category == "2D Barcode":
+        value = inputs.get("barcode_text", "").strip()
+        if value:
+            return value
+        return ""
+    return ""
+
+
+# Function to validate inputs
+def validate_inputs(category, inputs):
+    if category == "WiFi Password":
+        if not inputs.get("wifi_ssid"):
+            return "WiFi SSID is required!"
+        if not inputs.get("wifi_password"):
+            return "WiFi Password is required!"
+    elif category == "Link":
+        url = inputs.get("link", "")
+        if not url:
+            return "URL is required!"
+        if not re.match(r'^https?://', url):
+            return "URL should start with http:// or https://"
+    elif category == "WhatsApp":
+        phone = inputs.get("whatsapp_number", "")
+        if not phone:
+            return "Phone number is required!"
+        if not re.match(r'^\+?[\d\s-]+$', phone):
+            return "Invalid phone number format"
+    elif category == "Email":
+        email = inputs.get("email", "")
+        if not email:
+            return "Email address is required!"
+        if not re.match(r'^[^@]+@[^@]+\.[^@]+$', email):
+            return "Invalid email format"
+    elif category == "Event":
+        if not inputs.get("event_title"):
+            return "Event title is required!"
+        try:
+            datetime.strptime(inputs.get("event_start", ""), "%Y-%m-%dT%H:%M")
+        except ValueError:
+            return "Invalid start date/time format (use YYYY-MM-DDTHH:MM)"
+    return None
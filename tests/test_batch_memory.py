@@ -0,0 +1,70 @@
+"""Streaming batch export keeps the calling process's memory flat as the batch grows.
+
+The same check as ``benchmarks/streaming_memory.py``, at sizes small
+enough for the test suite. Row blocks are shrunk so both batch sizes are
+past them, as the benchmark's are with the real ones. Between the two
+sizes the deduplication window fills up with payload hashes, which
+``ALLOWED_GROWTH`` covers along with the noise of a small peak; keeping
+images of payloads that do not repeat, or any per-row state, exceeds it.
+"""
+import io
+import multiprocessing
+import tracemalloc
+
+import pytest
+
+from qrgen import batch
+from qrgen.batch import BatchRow, run_batch
+
+# Allowed peak growth from the small to the large batch, in KiB
+ALLOWED_GROWTH = 384
+
+
+def unique_rows(count):
+    for index in range(1, count + 1):
+        yield BatchRow(index, "Link", {"link": f"https://example.com/tickets/{index:08d}"})
+
+
+def repeating_rows(count):
+    for index in range(1, count + 1):
+        yield BatchRow(index, "Link", {"link": f"https://example.com/events/{index % 7}"}, f"guest_{index}")
+
+
+class _Discard(io.RawIOBase):
+    """A write-only sink, so the archive itself is not counted."""
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return len(data)
+
+
+def peak_kib(rows, archive):
+    tracemalloc.start()
+    try:
+        report = run_batch(rows, _Discard(), archive=archive, workers=1, formats=["png"])
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+    assert report.failed == 0
+    return peak
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(batch, "PREPARE_ROWS", 32)
+    # Forked workers would inherit tracemalloc and render several times slower
+    method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method("spawn", force=True)
+    yield
+    multiprocessing.set_start_method(method, force=True)
+
+
+@pytest.mark.parametrize("archive", ["zip", "tar"])
+@pytest.mark.parametrize("rows", [unique_rows, repeating_rows])
+def test_peak_memory_is_flat(small_blocks, rows, archive):
+    peak_kib(rows(100), archive)
+    small = peak_kib(rows(300), archive)
+    large = peak_kib(rows(2400), archive)
+    assert large - small <= ALLOWED_GROWTH, f"peak grew from {small:.0f} KiB to {large:.0f} KiB"
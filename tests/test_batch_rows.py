@@ -0,0 +1,25 @@
+"""Rows files as spreadsheet programs save them."""
+import io
+import zipfile
+
+import pytest
+
+from qrgen.batch import read_rows, run_batch
+
+CSV = "category,link,filename\nLink,https://example.com/a,first\n"
+JSONL = '{"category": "Link", "link": "https://example.com/a", "filename": "first"}\n'
+
+
+@pytest.mark.parametrize("name,text", [("rows.csv", CSV), ("rows.jsonl", JSONL)])
+def test_byte_order_mark_is_skipped(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_bytes(b"\xef\xbb\xbf" + text.encode("utf-8"))
+
+    (row,) = read_rows(path)
+    assert row.error is None
+    assert (row.category, row.inputs["link"], row.filename) == ("Link", "https://example.com/a", "first")
+
+    output = io.BytesIO()
+    report = run_batch(read_rows(path), output, formats=["png"], workers=1)
+    assert (report.generated, report.failed) == (1, 0)
+    assert "first.png" in zipfile.ZipFile(output).namelist()
@@ -0,0 +1,119 @@
+"""The category registry formats and validates exactly like the if/elif chains it replaced.
+
+Random rows built from awkward values are run through ``format_qr_data``,
+``validate_inputs`` and the column APIs and compared with the chains in
+``baseline_categories``; ``parse_event_time`` is compared with the
+``strptime`` call it stands in for.
+"""
+import random
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import baseline_categories as baseline
+from qrgen.categories import CATEGORIES, get_category, parse_event_time
+from qrgen.payloads import format_column, format_qr_data
+from qrgen.validation import validate_column, validate_inputs
+
+ROWS = 400
+
+# Every input the baseline chains read, per category
+FIELDS = {
+    "Number": ["number"],
+    "WiFi Password": ["wifi_ssid", "wifi_password", "wifi_encryption"],
+    "Link": ["link"],
+    "WhatsApp": ["whatsapp_number"],
+    "Text": ["text"],
+    "Email": ["email", "email_subject", "email_body"],
+    "Phone": ["phone_number"],
+    "SMS": ["sms_number", "sms_message"],
+    "Location": ["manual_location"],
+    "Event": ["event_title", "event_start", "event_end", "event_location", "event_description"],
+    "Social Media": ["social_platform", "social_username"],
+    "vCard": ["vcard_name", "vcard_phone", "vcard_email"],
+    "Cryptocurrency": ["crypto_type", "crypto_address"],
+    "2D Barcode": ["barcode_text"],
+}
+
+# Accepted and rejected alike by strptime(value, "%Y-%m-%dT%H:%M"), and
+# the near misses between
+EVENT_TIMES = [
+    "2024-01-05T09:30", "2024-1-5T9:30", "2024-01-05t09:30", "2024-01- 5T09:30",
+    "2024-01-05T09:3", "2024-02-29T10:00", "2023-02-29T10:00", "2024-02-30T10:00",
+    "2024-04-31T10:00", "2024-13-01T10:00", "2024-00-01T10:00", "2024-01-00T10:00",
+    "2024-01-05T24:00", "2024-01-05T23:59", "2024-01-05T09:60", "0000-01-01T00:00",
+    "0001-01-01T00:00", "9999-12-31T23:59", "99999-01-05T09:30", "202-01-05T09:30",
+    "2024-001-05T09:30", "2024-01-005T09:30", "2024-01-05T009:30", "2024-01-05T09:030",
+    " 2024-01-05T09:30", "2024-01-05T09:30 ", "2024-01-05T09:30\n", "2024-01-05 09:30",
+    "2024/01/05T09:30", "2024-01-05T09:30:00", "2024-1-05T09:30", "2024-01-5T09:30",
+    "2024-01-05T9:05", "2024-01-05T09:5", "2024-01-  5T09:30", "2024-01- 05T09:30",
+    "２０２４-01-05T09:30", "2024-01-05T0９:30", "", "T", "-", "2024-01-05T",
+]
+
+VALUES = [
+    "", " ", "  padded  ", "abc", "Ünïcødé €", "line\nbreak", "a;b:c",
+    "+1 555-0100", "555 0100", "--", "+", "+44 (20) 7946", "12-34 56",
+    "a@b.co", "a@b", "@b.co", "a@@b.co", " a@b.co ",
+    "http://example.com", "https://example.com/x?y=1", "HTTP://example.com", "ftp://x", " https://x",
+    "twitter", "instagram", "linkedin", "tiktok", "mastodon",
+    "WPA", "WEP", "nopass", "bitcoin", "ethereum",
+] + EVENT_TIMES
+
+
+def random_row(rng, category):
+    inputs = {}
+    for field in FIELDS[category]:
+        # Sometimes leave the input out so defaults are exercised
+        if rng.random() < 0.15:
+            continue
+        inputs[field] = rng.choice(EVENT_TIMES if field in ("event_start", "event_end") and rng.random() < 0.7
+                                   else VALUES)
+    return inputs
+
+
+def rows_for(category):
+    rng = random.Random(category)
+    return [random_row(rng, category) for _ in range(ROWS)]
+
+
+def test_categories_match_baseline():
+    assert CATEGORIES[:len(baseline.CATEGORIES)] == baseline.CATEGORIES
+
+
+@pytest.mark.parametrize("category", baseline.CATEGORIES)
+def test_rows_match_baseline(category):
+    for inputs in rows_for(category):
+        assert format_qr_data(category, inputs) == baseline.format_qr_data(category, inputs), inputs
+        assert validate_inputs(category, inputs) == baseline.validate_inputs(category, inputs), inputs
+
+
+@pytest.mark.parametrize("category", baseline.CATEGORIES)
+@pytest.mark.parametrize("as_array", [False, True])
+def test_columns_match_baseline(category, as_array):
+    rows = rows_for(category)
+    columns = get_category(category).columns(rows)
+    if as_array:
+        columns = {name: np.array(values) for name, values in columns.items()}
+    assert format_column(category, columns, len(rows)) == [
+        baseline.format_qr_data(category, inputs) for inputs in rows
+    ]
+    assert validate_column(category, columns, len(rows)) == [
+        baseline.validate_inputs(category, inputs) for inputs in rows
+    ]
+
+
+def test_unknown_category():
+    assert format_qr_data("Nope", {"text": "x"}) == baseline.format_qr_data("Nope", {"text": "x"})
+    assert validate_inputs("Nope", {}) is None
+    assert format_column("Nope", {}, 3) == [""] * 3
+    assert validate_column("Nope", {}, 3) == [None] * 3
+
+
+@pytest.mark.parametrize("value", EVENT_TIMES)
+def test_parse_event_time_matches_strptime(value):
+    try:
+        expected = datetime.strptime(value, "%Y-%m-%dT%H:%M")
+    except ValueError:
+        expected = None
+    assert parse_event_time(value) == expected
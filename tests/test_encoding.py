@@ -0,0 +1,88 @@
+"""``encode`` builds the same symbol as stock qrcode given the same segments.
+
+qrcode is handed the segments and version ``plan_segments`` chose and
+picks its own mask, so this covers codeword construction, error
+correction, placement, mask scoring and format information together.
+
+Stock qrcode cannot divide an all-zero block of data codewords by the
+generator polynomial (``glog(0)`` raises), as with ``"0" * 501``; its
+remainder is zero, which ``zero_blocks`` patches in so that case is
+compared too.
+"""
+import random
+import string
+
+import numpy as np
+import pytest
+import qrcode
+from qrcode import base
+
+from qrgen.encoding import encode
+from qrgen.segmentation import plan_segments
+
+PAYLOADS = 300
+
+# A run of zeros long enough that whole blocks of data codewords are zero
+EDGE_CASES = ["0" * 501, "0", "A", "", "0" * 7089]
+
+
+@pytest.fixture(autouse=True)
+def zero_blocks(monkeypatch):
+    stock_mod = base.Polynomial.__mod__
+
+    def mod(self, other):
+        # A leading zero is only left when every coefficient is zero
+        if len(self) >= len(other) and self[0] == 0:
+            return self
+        return stock_mod(self, other)
+
+    monkeypatch.setattr(base.Polynomial, "__mod__", mod)
+
+
+def stock_modules(data, error_correction):
+    plan = plan_segments(data, error_correction)
+    qr = qrcode.QRCode(version=plan.version, error_correction=error_correction, border=0)
+    for segment in plan.segments:
+        qr.add_data(segment)
+    qr.make(fit=False)
+    return np.array(qr.modules, dtype=bool)
+
+
+def random_payload(rng):
+    alphabet = rng.choice([
+        string.digits,
+        string.digits + string.ascii_uppercase + " $%*+-./:",
+        string.ascii_letters + string.digits + string.punctuation + " ",
+        "0123456789ABCDEFGH://example.comé€",
+    ])
+    length = rng.choice([rng.randint(1, 40), rng.randint(40, 400), rng.randint(400, 1500)])
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def payloads():
+    rng = random.Random(0)
+    cases = []
+    while len(cases) < PAYLOADS:
+        data, error_correction = random_payload(rng), rng.randrange(4)
+        if plan_segments(data, error_correction).version is not None:
+            cases.append((data, error_correction))
+    return cases
+
+
+@pytest.mark.parametrize("error_correction", range(4))
+def test_edge_cases_match_stock(error_correction):
+    for data in EDGE_CASES:
+        if plan_segments(data, error_correction).version is None:
+            continue
+        matrix = encode(data, error_correction=error_correction)
+        assert np.array_equal(matrix.modules, stock_modules(data, error_correction)), data[:20]
+
+
+def test_random_payloads_match_stock():
+    mismatched = [
+        (data[:20], error_correction)
+        for data, error_correction in payloads()
+        if not np.array_equal(encode(data, error_correction=error_correction).modules,
+                              stock_modules(data, error_correction))
+    ]
+    assert not mismatched
@@ -0,0 +1,62 @@
+"""A worker that dies costs its callers a retry, not the executor.
+
+``os._exit`` in a worker breaks the process pool the way a segfault or
+the OOM killer does; the executor has to answer ``ServerBusy`` and then
+keep rendering, with every slot given back.
+"""
+import os
+import time
+
+import pytest
+
+from qrgen.core import DEFAULT_QR_CONFIG
+from qrgen.executor import RenderExecutor, ServerBusy, render_formats
+
+
+@pytest.fixture
+def executor():
+    executor = RenderExecutor(workers=2, timeout=60)
+    yield executor
+    executor.close()
+
+
+def render(executor):
+    images, _, _ = executor.submit(render_formats, "hello", dict(DEFAULT_QR_CONFIG), ["png"])
+    return images["png"]
+
+
+def idle(executor):
+    # Slots are released by done callbacks, which may run just after the caller returns
+    deadline = time.monotonic() + 5
+    while executor.metrics()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    metrics = executor.metrics()
+    return metrics["in_flight"] == 0 and metrics["reserved"] == 0
+
+
+def test_submit_recovers(executor):
+    assert render(executor)
+    with pytest.raises(ServerBusy):
+        executor.submit(os._exit, 1)
+    assert render(executor)
+    assert executor.metrics()["restarts"] == 1
+    assert idle(executor)
+
+
+def test_map_recovers(executor):
+    with pytest.raises(ServerBusy):
+        executor.map(os._exit, [1, 1, 1])
+    assert executor.map(abs, [-1, -2, -3]) == [1, 2, 3]
+    assert idle(executor)
+
+
+def test_reservation_recovers(executor):
+    with pytest.raises(ServerBusy):
+        with executor.reserve(2) as reservation:
+            futures = [reservation.submit(os._exit, 1), reservation.submit(abs, -1)]
+            for future in futures:
+                future.result()
+    with executor.reserve(2) as reservation:
+        assert reservation.submit(abs, -1).result() == 1
+    assert render(executor)
+    assert idle(executor)